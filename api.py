@@ -1,25 +1,55 @@
-from pathlib import Path
-from typing import Dict, Tuple
-
-import requests
-from fastapi import FastAPI, HTTPException, Query
+import hmac
+import os
+import threading
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-
+from starlette.concurrency import run_in_threadpool
+
+from cache import MISSING, TTLCache, make_response_cache, normalize_query
+from genre_index import parse_genre_filter
+from image_cache import ImageCache, ImageFetchError
+from incremental import apply_updates, fill_from_catalog, persist_items
+from index_store import (
+    DATA_DIR,
+    MEDIA_FILES,
+    UNIFIED_MEDIA,
+    available_catalogs,
+    load_or_build,
+    load_or_build_unified,
+    media_catalog,
+)
+from jikan_client import JikanClient
+from metrics import (
+    BRANCH_TOTAL,
+    ENABLED as METRICS_ENABLED,
+    PROFILE_SAMPLE_RATE,
+    REGISTRY,
+    MetricsMiddleware,
+    span,
+)
+from profiles import TasteProfile, profile_weights
+from reload import DATA_WATCH_INTERVAL, Reloader
 from recommender import (
-    load_items,
-    build_tfidf_matrix,
+    Engine,
     resolve_title_to_index,
-    recommend_content,
-    recommend_from_text,
+    rank_batch,
+    rank_content,
+    rank_content_embeddings,
+    rank_cross_media,
+    rank_from_text,
+    rank_text_embeddings,
+)
+from serialization import (
+    render_batch_response,
+    render_cross_media_response,
+    render_response,
 )
-
-DATA_DIR = Path(__file__).parent / "data"
-MEDIA_FILES = {
-    "anime": "anime.csv",
-    "manga": "manga.csv",
-    "manhwa": "manhwa.csv",
-}
 
 app = FastAPI(title="Anime Recommendation API", version="5.1.0")
 
@@ -29,9 +59,71 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if METRICS_ENABLED or PROFILE_SAMPLE_RATE:
+    app.add_middleware(MetricsMiddleware)
+
+# Shared, pooled client for Live Web Mode lookups (created at startup)
+JIKAN: Optional[JikanClient] = None
+
+# On-disk cover thumbnail cache behind /images (created at startup)
+IMAGES: Optional[ImageCache] = None
+
+# Covers are addressed by item, not content: let browsers keep them for a
+# while, then revalidate against the ETag
+IMAGE_CACHE_CONTROL = f"public, max-age={int(os.environ.get('IMAGE_MAX_AGE', '86400'))}"
+
+# (media_type, user_key) -> TasteProfile, so repeat page loads skip the rebuild
+# (only the sparse profile vector is kept, never the dense catalog scores)
+PROFILE_CACHE = TTLCache(maxsize=int(os.environ.get("PROFILE_CACHE_SIZE", "1024")), ttl=3600.0)
+
+# Rendered /recommend responses for repeat queries (None when disabled)
+RESULT_CACHE = make_response_cache()
+
+# /admin routes need ADMIN_TOKEN set and a matching X-Admin-Token header;
+# without it they are disabled
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN") or None
+
+# Serializes engine updates per media type (readers never wait on it)
+UPDATE_LOCKS: Dict[str, threading.Lock] = {media: threading.Lock() for media in MEDIA_FILES}
+
+# media_type -> Engine, filled on first use (see get_engine)
+ENGINE_STATE: Dict[str, Engine] = {}
+
+# Comma-separated media types to load at startup ("all" for every one);
+# the rest load on their first request.
+WARM_MEDIA = os.environ.get("WARM_MEDIA", "")
+
+
+# Guards the first load of the shared-vocabulary engine (ENGINE_STATE["all"])
+UNIFIED_LOCK = threading.Lock()
+
+
+def _invalidate_results(media_type: str):
+    if RESULT_CACHE is None:
+        return
+    # Cross-media answers are cached under their source media type
+    for media in MEDIA_FILES if media_type == UNIFIED_MEDIA else [media_type]:
+        RESULT_CACHE.invalidate(media)
+
 
-# media_type -> (items_df, tfidf_vectorizer, tfidf_matrix)
-ENGINE_STATE: Dict[str, Tuple] = {}
+def _open_engine(media_type: str, path) -> Engine:
+    if media_type == UNIFIED_MEDIA:
+        return load_or_build_unified(available_catalogs(DATA_DIR))
+    return load_or_build(media_type, path)
+
+
+# Catalog file per media type (Parquet, or a legacy CSV), resolved at startup
+CATALOG_PATHS = {media: media_catalog(media, DATA_DIR) for media in MEDIA_FILES}
+
+# Background rebuilds swapped into ENGINE_STATE (POST /admin/reload, data watcher);
+# the shared-vocabulary engine is rebuilt when any catalog changes.
+RELOADER = Reloader(
+    ENGINE_STATE,
+    _open_engine,
+    {**CATALOG_PATHS, UNIFIED_MEDIA: list(CATALOG_PATHS.values())},
+    {**UPDATE_LOCKS, UNIFIED_MEDIA: UNIFIED_LOCK},
+    on_swap=_invalidate_results,
+)
 
 
 class Recommendation(BaseModel):
@@ -50,23 +142,113 @@ class RecommendResponse(BaseModel):
     recommendations: list[Recommendation]
 
 
+class CrossMediaResponse(BaseModel):
+    media_type: str
+    engine_used: str
+    base_title: str
+    topn: int
+    target_media: list[str]
+    results: Dict[str, list[Recommendation]]
+
+
+class ProfileItem(BaseModel):
+    item_id: int
+    weight: float = 1.0
+
+
+class ProfileRequest(BaseModel):
+    media_type: str = "anime"
+    user_key: Optional[str] = None
+    liked: list[ProfileItem] = []
+    disliked: list[ProfileItem] = []
+    topn: int = 5
+
+
+class CatalogItem(BaseModel):
+    item_id: int
+    title: Optional[str] = None
+    genres: Optional[str] = None
+    description: Optional[str] = None
+    image_url: Optional[str] = None
+
+
+class ItemsUpdate(BaseModel):
+    media_type: str = "anime"
+    items: list[CatalogItem]
+    persist: bool = False
+
+
+class BatchRequest(BaseModel):
+    media_type: str = "anime"
+    item_ids: list[int] = []
+    texts: list[str] = []
+    topn: int = 5
+    block_size: int = 256
+
+
+class BatchResult(BaseModel):
+    query: str
+    base_title: Optional[str]
+    error: Optional[str]
+    recommendations: list[Recommendation]
+
+
+class BatchResponse(BaseModel):
+    media_type: str
+    engine_used: str
+    topn: int
+    results: list[BatchResult]
+
+
 @app.on_event("startup")
 def startup_event():
-    print("🚀 Starting up... Loading datasets and TF-IDF matrices...")
-    for media, filename in MEDIA_FILES.items():
-        path = DATA_DIR / filename
-        if not path.exists():
+    global JIKAN, IMAGES
+    JIKAN = JikanClient()
+    IMAGES = ImageCache()
+
+    warm = [m.strip().lower() for m in WARM_MEDIA.split(",") if m.strip()]
+    if "all" in warm:
+        warm = list(MEDIA_FILES)
+
+    print(f"🚀 Starting up... Warming: {', '.join(warm) or 'none (lazy loading)'}")
+    for media in warm:
+        path = CATALOG_PATHS.get(media)
+        if path is None or not path.exists():
             print(f"   ⚠ Skipping {media}, file not found: {path}")
             continue
+        _load_engine(media)
 
-        print(f"   📂 Loading {media} dataset from {path}...")
-        items = load_items(path)
+    RELOADER.start_watching(DATA_WATCH_INTERVAL)
+    print("✅ System Ready!")
 
-        tfidf, tfidf_matrix = build_tfidf_matrix(items)
 
-        ENGINE_STATE[media] = (items, tfidf, tfidf_matrix)
+def _load_engine(media_type: str) -> Engine:
+    # The update lock makes concurrent first requests share one load
+    with UPDATE_LOCKS[media_type]:
+        engine = ENGINE_STATE.get(media_type)
+        if engine is None:
+            path = CATALOG_PATHS[media_type]
+            print(f"   📂 Loading {media_type} index for {path}...")
+            with span("engine_load"):
+                engine = ENGINE_STATE[media_type] = load_or_build(media_type, path)
+        return engine
+
+
+async def get_engine(media_type: str) -> Engine:
+    """Serving engine for `media_type`, loading it on first use."""
+    engine = ENGINE_STATE.get(media_type)
+    if engine is not None:
+        return engine
+    if media_type not in CATALOG_PATHS or not CATALOG_PATHS[media_type].exists():
+        raise HTTPException(status_code=404, detail="Media type not loaded")
+    return await run_in_threadpool(_load_engine, media_type)
 
-    print("✅ System Ready!")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    RELOADER.stop_watching()
+    await JIKAN.aclose()
+    await IMAGES.aclose()
 
 
 @app.get("/health")
@@ -74,23 +256,18 @@ def health_check():
     return {"status": "ok"}
 
 
-def fetch_anime_live(query: str, media_type: str):
+async def fetch_anime_live(query: str, media_type: str):
     """
     Uses Jikan API to fetch a single anime/manga by text query.
     Returns dict with title, content, genres, image_url or None.
     """
     print(f"🌍 Searching internet for: {query}")
-    try:
-        api_type = "manga" if media_type in ["manga", "manhwa"] else "anime"
-        url = f"https://api.jikan.moe/v4/{api_type}?q={query}&limit=1"
-        response = requests.get(url, timeout=20)
-        data = response.json()
-
-        if not data.get("data"):
-            return None
-
-        item = data["data"][0]
+    api_type = "manga" if media_type in ["manga", "manhwa"] else "anime"
+    item = await JIKAN.search(query, api_type)
+    if not item:
+        return None
 
+    try:
         try:
             img = item["images"]["jpg"]["image_url"]
         except Exception:
@@ -108,6 +285,7 @@ def fetch_anime_live(query: str, media_type: str):
             "image_url": img,
         }
     except Exception as e:
+        # Unexpected payload shape (missing title, genre without a name, ...)
         print(f"API Error: {e}")
         return None
 
@@ -143,44 +321,131 @@ def looks_descriptive(query: str) -> bool:
     return any(t in descriptive_markers for t in tokens)
 
 
-@app.get("/recommend", response_model=RecommendResponse)
-def get_recommendations(
+def _respond(media_type, engine_used, base_title, topn, columns, indices, scores):
+    return Response(
+        content=render_response(
+            columns,
+            media_type=media_type,
+            engine_used=engine_used,
+            base_title=base_title,
+            topn=topn,
+            indices=indices,
+            scores=scores,
+        ),
+        media_type="application/json",
+    )
+
+
+ENGINE_LABELS = {"tfidf": "TF-IDF", "embedding": "Embedding"}
+
+
+def _genre_mask(state: Engine, genres):
+    """Boolean row mask for an (include, exclude) genre filter, or None."""
+    if state.genres is None or not any(genres):
+        return None
+    return state.genres.mask(*genres)
+
+
+def _rank_item(state: Engine, engine: str, item_index: int, topn: int, genres=((), ())):
+    allowed = _genre_mask(state, genres)
+    if engine == "embedding":
+        return rank_content_embeddings(
+            state.embeddings, item_index=item_index, topn=topn, allowed=allowed
+        )
+    return rank_content(
+        state.matrix,
+        item_index=item_index,
+        topn=topn,
+        neighbours=state.neighbours,
+        ann=state.ann,
+        allowed=allowed,
+    )
+
+
+def _rank_text(state: Engine, engine: str, text: str, topn: int, genres=((), ())):
+    allowed = _genre_mask(state, genres)
+    if engine == "embedding":
+        return rank_text_embeddings(state.embeddings, text=text, topn=topn, allowed=allowed)
+    return rank_from_text(
+        state.tfidf, state.matrix, text=text, topn=topn, ann=state.ann, allowed=allowed,
+        inverted=state.inverted,
+    )
+
+
+def _parse_targets(target_media) -> list:
+    """Flatten repeated / comma-separated target_media values ("all" = every media)."""
+    targets = []
+    for value in target_media or []:
+        for media in value.split(","):
+            media = media.strip().lower()
+            if media == UNIFIED_MEDIA:
+                targets.extend(m for m in MEDIA_FILES if m not in targets)
+            elif media and media not in targets:
+                targets.append(media)
+    return targets
+
+
+@app.get("/recommend", response_model=Union[RecommendResponse, CrossMediaResponse])
+async def get_recommendations(
     media_type: str = Query("anime"),
     query: str = Query(...),
     topn: int = 5,
     use_smart_search: bool = True,
+    engine: str = Query("tfidf", description="tfidf or embedding"),
+    target_media: Optional[List[str]] = Query(
+        None, description="Recommend from these media types instead (e.g. manga,manhwa)"
+    ),
+    include_genres: Optional[List[str]] = Query(
+        None, description="Only recommend items with every one of these genres (e.g. Action,Drama)"
+    ),
+    exclude_genres: Optional[List[str]] = Query(
+        None, description="Never recommend items with any of these genres"
+    ),
 ):
     media_type = media_type.lower()
-    if media_type not in ENGINE_STATE:
-        raise HTTPException(status_code=404, detail="Media type not loaded")
+    engine = engine.lower()
+    if engine not in ENGINE_LABELS:
+        raise HTTPException(status_code=400, detail=f"Unknown engine: {engine}")
+    targets = _parse_targets(target_media)
+    if targets and engine != "tfidf":
+        raise HTTPException(status_code=400, detail="target_media needs engine=tfidf")
+    genres = (parse_genre_filter(include_genres), parse_genre_filter(exclude_genres))
+    if RESULT_CACHE is None:
+        return await _recommend(media_type, query, topn, use_smart_search, engine, targets, genres)
+
+    # The key is taken before the engine is read, so a response computed
+    # on an engine that gets swapped out is stored under a stale generation.
+    with span("cache"):
+        key = RESULT_CACHE.key(
+            media_type, engine, topn, use_smart_search, ",".join(targets),
+            *(",".join(sorted(g.lower() for g in part)) for part in genres),
+            normalize_query(query),
+        )
+        cached = RESULT_CACHE.get(key) if key else None
+    if cached is not None:
+        return Response(content=cached, media_type="application/json",
+                        headers={"X-Cache": "HIT"})
 
-    items, tfidf, tfidf_matrix = ENGINE_STATE[media_type]
+    response = await _recommend(media_type, query, topn, use_smart_search, engine, targets, genres)
+    if key:
+        RESULT_CACHE.set(key, response.body)
+    response.headers["X-Cache"] = "MISS"
+    return response
 
+
+async def _resolve_query(state: Engine, media_type: str, query: str, use_smart_search: bool):
+    """
+    Work out what to recommend from.
+    Returns (mode, base_title, item_index, text): a local item row, or
+    free text (the query itself, or a Jikan synopsis) when item_index is None.
+    """
     # Try to match the query to an existing title in the dataset
-    idx, matched_title = resolve_title_to_index(items, query)
+    with span("resolve"):
+        idx, matched_title = resolve_title_to_index(state.items, query, state.titles)
 
-    # --- Case 1: Found in local CSV (exact / substring match) ---
+    # --- Case 1: Found in the local catalog (exact / substring match) ---
     if idx is not None:
-        recs_df = recommend_content(items, tfidf_matrix, item_index=idx, topn=topn)
-        engine = "TF-IDF (Local Title Match)"
-        base_title = str(matched_title)
-
-        return RecommendResponse(
-            media_type=media_type,
-            engine_used=engine,
-            base_title=base_title,
-            topn=topn,
-            recommendations=[
-                Recommendation(
-                    item_id=int(row.item_id),
-                    title=str(row.title),
-                    genres=str(row.genres),
-                    image_url=str(row.image_url),
-                    similarity_score=float(row.similarity_score),
-                )
-                for _, row in recs_df.iterrows()
-            ],
-        )
+        return "Local Title Match", str(matched_title), idx, None
 
     # --- Case 2: Not found locally ---
     if not use_smart_search:
@@ -195,65 +460,348 @@ def get_recommendations(
 
     # Decide whether this looks like a descriptive prompt or a title
     if looks_descriptive(query):
-        # ✅ DESCRIPTIVE QUERY MODE (what you just used)
-        # Use the raw text as TF-IDF query, no Jikan involved.
-        engine = "TF-IDF (Semantic Text Mode)"
-        base_title = f"{query} (Semantic Query)"
-
-        recs_df = recommend_from_text(
-            items,
-            tfidf,
-            tfidf_matrix,
-            text=query,
-            topn=topn,
+        # ✅ DESCRIPTIVE QUERY MODE
+        # Use the raw text as the query, no Jikan involved.
+        return "Semantic Text Mode", f"{query} (Semantic Query)", None, query
+
+    # Otherwise treat it like a title → Jikan web lookup
+    with span("jikan"):
+        live_data = await fetch_anime_live(query, media_type)
+    if not live_data:
+        raise HTTPException(status_code=404, detail="Not found via web search.")
+    return "Live Web Mode", f"{query} (Web Search)", None, live_data["content"]
+
+
+async def _recommend(media_type: str, query: str, topn: int, use_smart_search: bool,
+                     engine: str, targets=(), genres=((), ())) -> Response:
+    state = await get_engine(media_type)
+    if engine == "embedding" and state.embeddings is None:
+        raise HTTPException(
+            status_code=404, detail="Embedding engine not built for this media type"
+        )
+
+    mode, base_title, idx, text = await _resolve_query(state, media_type, query, use_smart_search)
+    if idx is None and engine == "embedding" and not state.embeddings.can_encode:
+        # Built with a model this host can't load (see load_index)
+        engine = "tfidf"
+    label = ENGINE_LABELS[engine]
+    BRANCH_TOTAL.inc(mode)
+    if targets:
+        return await _recommend_cross_media(state, media_type, mode, base_title, idx, text,
+                                            targets, topn, genres)
+
+    with span("score"):
+        if idx is not None:
+            indices, scores = await run_in_threadpool(
+                _rank_item, state, engine, idx, topn, genres
+            )
+        else:
+            indices, scores = await run_in_threadpool(
+                _rank_text, state, engine, text, topn, genres
+            )
+    with span("render"):
+        return _respond(
+            media_type, f"{label} ({mode})", base_title, topn, state.columns, indices, scores
         )
 
-        return RecommendResponse(
+
+def _load_unified() -> Engine:
+    with UNIFIED_LOCK:
+        engine = ENGINE_STATE.get(UNIFIED_MEDIA)
+        if engine is None:
+            print("   📂 Loading shared-vocabulary index...")
+            engine = ENGINE_STATE[UNIFIED_MEDIA] = _open_engine(UNIFIED_MEDIA, None)
+        return engine
+
+
+def _rank_cross_media(unified: Engine, source: Engine, source_media: str, idx, text,
+                      targets, topn: int, genres=((), ())):
+    if idx is not None:
+        # The source item's own stacked row is the query; keep it out of
+        # its media's results.
+        start, stop = unified.ranges[source_media]
+        item_id = source.columns.item_ids[idx]
+        exclude = start + np.flatnonzero(unified.columns.item_ids[start:stop] == item_id)
+        if not len(exclude):
+            raise HTTPException(status_code=404, detail="Item not in the shared-vocabulary index yet")
+        query_vec = unified.matrix[int(exclude[0])]
+    else:
+        exclude = None
+        query_vec = unified.tfidf.transform([text])
+    return rank_cross_media(
+        unified.matrix, query_vec, unified.ranges, targets, topn=topn, exclude=exclude,
+        allowed=_genre_mask(unified, genres),
+    )
+
+
+async def _recommend_cross_media(state: Engine, media_type: str, mode: str, base_title: str,
+                                 idx, text, targets, topn: int,
+                                 genres=((), ())) -> Response:
+    unified = ENGINE_STATE.get(UNIFIED_MEDIA) or await run_in_threadpool(_load_unified)
+    missing = [m for m in targets + [media_type] if m not in unified.ranges]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Media type not loaded: {', '.join(missing)}")
+
+    with span("score"):
+        results = await run_in_threadpool(
+            _rank_cross_media, unified, state, media_type, idx, text, targets, topn, genres
+        )
+    with span("render"):
+        content = render_cross_media_response(
+            unified.columns,
             media_type=media_type,
-            engine_used=engine,
+            engine_used=f"TF-IDF Shared Vocabulary ({mode})",
             base_title=base_title,
             topn=topn,
-            recommendations=[
-                Recommendation(
-                    item_id=int(row.item_id),
-                    title=str(row.title),
-                    genres=str(row.genres),
-                    image_url=str(row.image_url),
-                    similarity_score=float(row.similarity_score),
-                )
-                for _, row in recs_df.iterrows()
-            ],
+            results=results,
         )
+    return Response(content=content, media_type="application/json")
 
-    # Otherwise treat it like a title → Jikan web lookup
-    live_data = fetch_anime_live(query, media_type)
-    if not live_data:
-        raise HTTPException(status_code=404, detail="Not found via web search.")
 
-    engine = "TF-IDF (Live Web Mode)"
-    base_title = f"{query} (Web Search)"
+MAX_BATCH_BLOCK = 4096
 
-    recs_df = recommend_from_text(
-        items,
-        tfidf,
-        tfidf_matrix,
-        text=live_data["content"],
-        topn=topn,
-    )
 
-    return RecommendResponse(
-        media_type=media_type,
-        engine_used=engine,
-        base_title=base_title,
-        topn=topn,
-        recommendations=[
-            Recommendation(
-                item_id=int(row.item_id),
-                title=str(row.title),
-                genres=str(row.genres),
-                image_url=str(row.image_url),
-                similarity_score=float(row.similarity_score),
+@app.post("/recommend/batch", response_model=BatchResponse)
+async def get_batch_recommendations(request: BatchRequest):
+    """
+    Score many item ids and/or free-text queries for one media type in a
+    single blocked sparse product. Unknown item ids come back with an
+    `error` and no recommendations instead of failing the whole batch.
+    """
+    media_type = request.media_type.lower()
+    engine = await get_engine(media_type)
+    columns = engine.columns
+    rows = [columns.row_of.get(item_id) for item_id in request.item_ids]
+    found = [row for row in rows if row is not None]
+
+    ranked = await run_in_threadpool(
+        rank_batch,
+        engine.tfidf,
+        engine.matrix,
+        item_indices=found,
+        texts=request.texts,
+        topn=request.topn,
+        block_size=min(max(request.block_size, 1), MAX_BATCH_BLOCK),
+    )
+    ranked_items, ranked_texts = ranked[: len(found)], ranked[len(found) :]
+
+    empty = ((), ())
+    results = []
+    item_results = iter(ranked_items)
+    for item_id, row in zip(request.item_ids, rows):
+        if row is None:
+            results.append((f"item_id:{item_id}", None, *empty, "item_id not found"))
+        else:
+            results.append(
+                (f"item_id:{item_id}", str(columns.titles[row]), *next(item_results), None)
             )
-            for _, row in recs_df.iterrows()
-        ],
+    for text, (indices, scores) in zip(request.texts, ranked_texts):
+        results.append((text, f"{text} (Semantic Query)", indices, scores, None))
+
+    return Response(
+        content=render_batch_response(
+            columns,
+            media_type=media_type,
+            engine_used="TF-IDF (Batch)",
+            topn=request.topn,
+            results=results,
+        ),
+        media_type="application/json",
+    )
+
+
+def _profile_rank(engine: Engine, cache_key, target: dict, topn: int):
+    profile = PROFILE_CACHE.get(cache_key) if cache_key else MISSING
+    if profile is MISSING or profile.matrix is not engine.matrix:
+        profile = TasteProfile(engine.matrix)
+        if cache_key:
+            PROFILE_CACHE.set(cache_key, profile)
+
+    with profile.lock:
+        # An unchanged profile keeps its vector; a changed one is recomputed
+        profile.sync(target)
+        return profile.rank(topn, memoize=False)
+
+
+@app.post("/recommend/profile", response_model=RecommendResponse)
+async def get_profile_recommendations(request: ProfileRequest):
+    """
+    Recommend from a user's liked / disliked items (with optional weights).
+    Pass `user_key` to keep the profile cached between calls; a later call
+    with the same items reuses its vector.
+    """
+    media_type = request.media_type.lower()
+    engine = await get_engine(media_type)
+    row_of = engine.columns.row_of
+
+    def rows(entries):
+        return [(row_of[e.item_id], e.weight) for e in entries if e.item_id in row_of]
+
+    liked, disliked = rows(request.liked), rows(request.disliked)
+    if not liked and not disliked:
+        raise HTTPException(status_code=404, detail="None of the item_ids were found.")
+
+    target = profile_weights(liked, disliked)
+    cache_key = (media_type, request.user_key) if request.user_key else None
+    indices, scores = await run_in_threadpool(
+        _profile_rank, engine, cache_key, target, request.topn
+    )
+
+    return _respond(
+        media_type,
+        "TF-IDF (Taste Profile)",
+        f"Taste profile ({len(liked)} liked, {len(disliked)} disliked)",
+        request.topn,
+        engine.columns,
+        indices,
+        scores,
     )
+
+
+@app.get("/images/{media_type}/{item_id}")
+async def get_image(
+    media_type: str,
+    item_id: int,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Card-sized cover of a catalog item from the local thumbnail cache
+    (WebP when the client accepts it, JPEG otherwise). When the source
+    can't be fetched, redirects to it so the browser can try itself.
+    """
+    state = await get_engine(media_type.lower())
+    row = state.columns.row_of.get(item_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="item_id not found")
+    url = str(state.columns.image_urls[row])
+
+    fmt = "webp" if accept and "image/webp" in accept else "jpeg"
+    try:
+        image = await IMAGES.get(url, fmt)
+    except ImageFetchError as e:
+        print(f"   ⚠ Image fetch failed: {e}")
+        if not IMAGES.allowed(url):
+            raise HTTPException(status_code=404, detail="item has no usable image")
+        return RedirectResponse(url, status_code=307)
+
+    headers = {
+        "ETag": image.etag,
+        "Cache-Control": IMAGE_CACHE_CONTROL,
+        "Vary": "Accept",
+        # Covers may be SVG (the placeholder); never let one run script here
+        "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if if_none_match and image.etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=image.data, media_type=image.content_type, headers=headers)
+
+
+def _check_admin(token: Optional[str]):
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Admin routes are disabled (no ADMIN_TOKEN)")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _upsert_items(media_type: str, updates: pd.DataFrame, persist: bool) -> Engine:
+    path = CATALOG_PATHS[media_type]
+    with UPDATE_LOCKS[media_type]:
+        # Serving engines don't keep descriptions; take omitted ones from the catalog
+        updates = fill_from_catalog(path, updates)
+        engine = apply_updates(ENGINE_STATE[media_type], updates)
+        if persist:
+            persist_items(path, updates)
+        # Single dict assignment: in-flight requests keep the old snapshot
+        ENGINE_STATE[media_type] = engine
+        _invalidate_results(media_type)
+        return engine
+
+
+@app.post("/admin/items")
+async def upsert_items(request: ItemsUpdate, x_admin_token: Optional[str] = Header(None)):
+    """
+    Add or update titles (matched on item_id) without a full rebuild.
+    With `persist`, the source catalog is rewritten too, so the next index
+    build picks the items up with a full refit.
+    """
+    _check_admin(x_admin_token)
+    media_type = request.media_type.lower()
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items given")
+    await get_engine(media_type)
+
+    updates = pd.DataFrame([item.dict() for item in request.items])
+    engine = await run_in_threadpool(_upsert_items, media_type, updates, request.persist)
+    return {"media_type": media_type, "updated": len(updates), "total_items": len(engine.items)}
+
+
+@app.post("/admin/reload", status_code=202)
+def reload_engines(
+    media_type: Optional[str] = Query(None, description="Defaults to every loaded media type"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Rebuild engines from the current catalogs in the background (by default
+    every loaded one). The old engine keeps serving until the new one is
+    swapped in. Like every /admin route, disabled unless ADMIN_TOKEN is set.
+    """
+    _check_admin(x_admin_token)
+    if media_type is not None:
+        media_type = media_type.lower()
+        if media_type not in RELOADER.paths:
+            raise HTTPException(status_code=404, detail="Unknown media type")
+    targets = [media_type] if media_type else list(ENGINE_STATE)
+    started = [media for media in targets if RELOADER.reload(media)]
+    return {"started": started, "status": RELOADER.status}
+
+
+@app.get("/admin/reload")
+def reload_status(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    return RELOADER.status
+
+
+@app.get("/admin/cache")
+def cache_stats(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    return RESULT_CACHE.stats() if RESULT_CACHE is not None else {"backend": None}
+
+
+@app.delete("/admin/cache")
+def clear_cache(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    for media in MEDIA_FILES:
+        _invalidate_results(media)
+    return {"cleared": RESULT_CACHE is not None}
+
+
+def _collect_state():
+    if RESULT_CACHE is not None:
+        stats = RESULT_CACHE.stats()
+        backend = (("backend", stats["backend"]),)
+        yield "result_cache_lookups_total", "counter", "Result cache lookups.", {
+            backend + (("result", "hit"),): stats["hits"],
+            backend + (("result", "miss"),): stats["misses"],
+        }
+        if "bytes" in stats:
+            yield "result_cache_bytes", "gauge", "Bytes held by the result cache.", {
+                backend: stats["bytes"]
+            }
+    if IMAGES is not None and IMAGES.stats()["bytes"] is not None:
+        yield "image_cache_bytes", "gauge", "Bytes of cover thumbnails on disk.", {
+            (): IMAGES.stats()["bytes"]
+        }
+    yield "engine_items", "gauge", "Items in each loaded engine.", {
+        (("media_type", media),): len(engine.items) for media, engine in list(ENGINE_STATE.items())
+    }
+
+
+REGISTRY.collectors.append(_collect_state)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition of request / stage latencies and counters."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
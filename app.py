@@ -3,7 +3,10 @@ from pathlib import Path
 import pandas as pd
 import streamlit as st
 
+from catalog import catalog_path
+
 from recommender import (
+    TitleIndex,
     load_items,
     build_tfidf_matrix,
     build_embedding_matrix,
@@ -21,13 +24,13 @@ DATA_DIR = Path(__file__).parent / "data"
 
 @st.cache_data
 def get_items(kind: str) -> pd.DataFrame:
-    if kind == "Anime":
-        path = DATA_DIR / "anime.csv"
-    elif kind == "Manga":
-        path = DATA_DIR / "Manga.csv" if (DATA_DIR / "Manga.csv").exists() else DATA_DIR / "manga.csv"
-    else:
-        path = DATA_DIR / "manhwa.csv"
-    return load_items(path)
+    stem = {"Anime": "anime", "Manga": "manga"}.get(kind, "manhwa")
+    return load_items(catalog_path(DATA_DIR, stem))
+
+
+@st.cache_resource
+def get_title_index(kind: str) -> TitleIndex:
+    return TitleIndex(get_items(kind)["title"])
 
 
 @st.cache_resource
@@ -117,7 +120,7 @@ def main():
             idx = matches[0]
             base_title = items.loc[idx, "title"]
         else:
-            idx, matched_title = resolve_title_to_index(items, raw)
+            idx, matched_title = resolve_title_to_index(items, raw, get_title_index(dataset_kind))
             if idx is None:
                 st.error("Could not match that title to anything in the dataset.")
                 return
@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark for the API.
+
+Each run happens in a fresh interpreter (so nothing is already imported or
+cached in-process) and reports:
+
+    import     `import api`
+    startup    FastAPI startup hooks (warm-up loads, Jikan client, watcher)
+    first      first /recommend response, including any lazy engine load
+    second     a second request on the now-loaded engine
+
+    python bench_startup.py                     # lazy vs warmed, anime
+    python bench_startup.py --media manga --runs 5
+
+Build the indexes first (python index_store.py) to measure serving a prebuilt
+index rather than the one-off build.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import api
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+
+timings = {"import": imported - start}
+params = {"media_type": sys.argv[1], "query": sys.argv[2], "topn": 5}
+with TestClient(api.app) as client:
+    started = time.perf_counter()
+    timings["startup"] = started - imported
+    assert client.get("/recommend", params=params).status_code == 200
+    first = time.perf_counter()
+    timings["first"] = first - started
+    client.get("/recommend", params=params)
+    timings["second"] = time.perf_counter() - first
+timings["sklearn_imported"] = any(m.startswith("sklearn") for m in sys.modules)
+print("RESULT " + json.dumps(timings))
+"""
+
+
+def run_once(media: str, query: str, warm: str) -> dict:
+    env = dict(os.environ, WARM_MEDIA=warm, DATA_WATCH_INTERVAL="0")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE, media, query],
+        cwd=Path(__file__).parent,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    line = next(l for l in out.splitlines() if l.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API cold-start time.")
+    parser.add_argument("--media", default="anime")
+    parser.add_argument("--query", default="naruto")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    for label, warm in (("lazy", ""), ("warm", "all")):
+        runs = [run_once(args.media, args.query, warm) for _ in range(args.runs)]
+        median = {
+            key: statistics.median(r[key] for r in runs)
+            for key in ("import", "startup", "first", "second")
+        }
+        total = median["import"] + median["startup"] + median["first"]
+        print(
+            f"{label:>5}: import={median['import'] * 1000:.0f}ms  "
+            f"startup={median['startup'] * 1000:.0f}ms  "
+            f"first={median['first'] * 1000:.0f}ms  "
+            f"second={median['second'] * 1000:.1f}ms  "
+            f"to-first-response={total * 1000:.0f}ms  "
+            f"sklearn={'yes' if any(r['sklearn_imported'] for r in runs) else 'no'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+"""
+Benchmark suite for the recommender hot paths.
+
+    python benchmark.py micro --sizes 3000 30000 300000
+    python benchmark.py load --requests 2000 --concurrency 16
+    python benchmark.py all --baseline benchmarks/previous.json
+
+`micro` times load_items (CSV, and Parquet when pyarrow is installed), build_tfidf_matrix, resolve_title_to_index,
+recommend_content and recommend_from_text on synthetic catalogs of each
+size (deterministic for a given --seed). `load` starts the API under uvicorn
+against a local Jikan stub and replays JSONL traffic (one object of
+/recommend query parameters per line; --traffic, or a generated mix of
+popular titles, descriptive text and unknown titles) at a fixed concurrency.
+
+Every path reports throughput, p50/p95/p99 latency and peak memory
+(tracemalloc peak for library calls, the server's peak RSS for the load
+test). Results are written as JSON (--out) and, with --baseline, compared
+against an earlier run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import catalog
+from catalog import read_catalog, write_catalog
+from index_store import available_catalogs
+from recommender import (
+    build_tfidf_matrix,
+    load_items,
+    recommend_content,
+    recommend_from_text,
+    resolve_title_to_index,
+)
+from title_index import TitleIndex
+
+ROOT = Path(__file__).parent
+RESULTS_DIR = ROOT / "benchmarks"
+GENRES = [
+    "Action", "Adventure", "Comedy", "Drama", "Fantasy", "Horror", "Mystery", "Romance",
+    "Sci-Fi", "Slice of Life", "Sports", "Supernatural", "Thriller", "Shounen", "Seinen",
+    "Isekai", "Mecha", "Music", "School", "Historical",
+]
+
+
+# ----------------------------
+# Synthetic data
+# ----------------------------
+
+def _vocabulary(size: int, rng) -> np.ndarray:
+    syllables = np.array(["ka", "ri", "to", "mi", "sa", "ne", "ru", "yo", "shi", "ha",
+                          "no", "ta", "ko", "re", "mu", "ai", "zen", "do", "ga", "ji"])
+    lengths = rng.integers(2, 5, size)
+    words = {"".join(rng.choice(syllables, n)) for n in lengths}
+    return np.array(sorted(words))
+
+
+def synthetic_catalog(n_items: int, seed: int = 0) -> pd.DataFrame:
+    """Catalog with Zipf-distributed description words, like real synopses."""
+    rng = np.random.default_rng(seed)
+    vocab = _vocabulary(40_000, rng)
+    weights = 1.0 / np.arange(1, len(vocab) + 1) ** 1.1
+    weights /= weights.sum()
+
+    desc_lengths = rng.integers(30, 120, n_items)
+    words = rng.choice(len(vocab), int(desc_lengths.sum()), p=weights)
+    bounds = np.concatenate([[0], np.cumsum(desc_lengths)])
+    descriptions = [" ".join(vocab[words[a:b]]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    title_words = rng.choice(len(vocab), (n_items, 3))
+    title_lengths = rng.integers(1, 4, n_items)
+    titles = [
+        " ".join(w.capitalize() for w in vocab[row[:k]]) + (f" {i % 7 + 2}" if i % 11 == 0 else "")
+        for i, (row, k) in enumerate(zip(title_words, title_lengths))
+    ]
+    genres = ["|".join(rng.choice(GENRES, rng.integers(1, 5), replace=False))
+              for _ in range(n_items)]
+    return pd.DataFrame(
+        {
+            "item_id": np.arange(1, n_items + 1),
+            "title": titles,
+            "genres": genres,
+            "description": descriptions,
+            "image_url": [f"https://example.invalid/{i}.jpg" for i in range(1, n_items + 1)],
+        }
+    )
+
+
+# ----------------------------
+# Measurement helpers
+# ----------------------------
+
+def summarize(latencies, wall: float = None) -> dict:
+    """Throughput and latency percentiles (ms) for a list of per-call seconds."""
+    lat = np.asarray(latencies, dtype=np.float64) * 1000
+    if not len(lat):
+        return {"calls": 0}
+    wall = wall if wall is not None else lat.sum() / 1000
+    return {
+        "calls": int(len(lat)),
+        "throughput_per_s": round(len(lat) / wall, 2) if wall > 0 else None,
+        "mean_ms": round(float(lat.mean()), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 4),
+        "p95_ms": round(float(np.percentile(lat, 95)), 4),
+        "p99_ms": round(float(np.percentile(lat, 99)), 4),
+    }
+
+
+def time_calls(fn, calls) -> list:
+    latencies = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def peak_memory_mb(fn, *args) -> float:
+    """Peak Python/NumPy allocation (MB) during one traced call."""
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 2**20, 2)
+
+
+def bench(fn, calls, *, memory: bool = True) -> dict:
+    result = summarize(time_calls(fn, calls))
+    if memory:
+        result["peak_mb"] = peak_memory_mb(fn, *calls[0])
+    return result
+
+
+# ----------------------------
+# Library micro-benchmarks
+# ----------------------------
+
+def run_micro(sizes, *, queries: int = 200, seed: int = 0, memory: bool = True) -> dict:
+    results = {}
+    rng = np.random.default_rng(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            print(f"📏 {size} items")
+            csv_path = Path(tmp) / f"catalog_{size}.csv"
+            synthetic_catalog(size, seed).to_csv(csv_path, index=False)
+            paths = {}
+
+            paths["load_items"] = bench(load_items, [(csv_path,)] * 3, memory=memory)
+            if catalog.pq is not None:
+                parquet_path = csv_path.with_suffix(".parquet")
+                write_catalog(pd.read_csv(csv_path), parquet_path)
+                paths["load_items_parquet"] = bench(load_items, [(parquet_path,)] * 3, memory=memory)
+                paths["load_titles_parquet"] = bench(
+                    read_catalog, [(parquet_path, ["item_id", "title"])] * 3, memory=memory
+                )
+            items = load_items(csv_path)
+
+            paths["build_tfidf_matrix"] = bench(build_tfidf_matrix, [(items,)], memory=memory)
+            tfidf, matrix = build_tfidf_matrix(items)
+            titles = TitleIndex(items["title"])
+
+            rows = rng.choice(size, queries)
+            title_queries = [
+                items["title"].iat[r] if i % 3 == 0
+                else items["title"].iat[r][:5].lower() if i % 3 == 1
+                else f"zq{i} unknown title"
+                for i, r in enumerate(rows)
+            ]
+            paths["resolve_title_to_index"] = bench(
+                resolve_title_to_index, [(items, q, titles) for q in title_queries], memory=memory
+            )
+            paths["recommend_content"] = bench(
+                lambda r: recommend_content(items, matrix, item_index=int(r), topn=10),
+                [(r,) for r in rows],
+                memory=memory,
+            )
+            texts = [" ".join(items["description"].iat[r].split()[:8]) for r in rows]
+            paths["recommend_from_text"] = bench(
+                lambda t: recommend_from_text(items, tfidf, matrix, text=t, topn=10),
+                [(t,) for t in texts],
+                memory=memory,
+            )
+            for name, stats in paths.items():
+                print(f"   {name:<24} p50={stats['p50_ms']:.3f}ms  p99={stats['p99_ms']:.3f}ms"
+                      + (f"  peak={stats['peak_mb']}MB" if "peak_mb" in stats else ""))
+            results[str(size)] = paths
+    return results
+
+
+# ----------------------------
+# End-to-end load test
+# ----------------------------
+
+class _JikanStub(BaseHTTPRequestHandler):
+    """Answers /v4/anime and /v4/manga searches; queries containing 'zzz' find nothing."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query).get("q", [""])[0]
+        data = [] if "zzz" in query else [
+            {
+                "mal_id": abs(hash(query)) % 10**6,
+                "title": query.title(),
+                "synopsis": f"{query} is a story about friendship, rivals and a long journey.",
+                "genres": [{"name": "Action"}, {"name": "Adventure"}],
+                "images": {"jpg": {"image_url": "https://example.invalid/stub.jpg"}},
+            }
+        ]
+        body = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def synthetic_traffic(n_requests: int, seed: int = 0) -> list:
+    """Skewed replay: popular titles dominate, plus descriptive and unknown queries."""
+    rng = np.random.default_rng(seed)
+    catalogs = {
+        media: read_catalog(path, ["title"])["title"].astype(str).tolist()
+        for media, path in available_catalogs().items()
+    }
+    if not catalogs:
+        raise SystemExit("No catalogs in data/; run get_ultimate_db.py first.")
+    media_types = list(catalogs)
+    descriptive = ["sad story about a pianist", "revenge drama with a dark hero",
+                   "school romance comedy with a rival", "isekai adventure in a game world"]
+
+    traffic = []
+    for i in range(n_requests):
+        media = media_types[i % len(media_types)] if rng.random() < 0.3 else media_types[0]
+        roll = rng.random()
+        if roll < 0.8:
+            titles = catalogs[media]
+            rank = min(int(rng.zipf(1.3)) - 1, len(titles) - 1)
+            query = titles[rank]
+        elif roll < 0.9:
+            query = descriptive[int(rng.integers(len(descriptive)))]
+        else:
+            # Short unknown titles go to the Jikan stub ('zzz' = no web result)
+            query = f"qx{int(rng.integers(200))} " + ("zzz" if rng.random() < 0.2 else "unlisted")
+        traffic.append({"media_type": media, "query": query, "topn": 5})
+    return traffic
+
+
+def _peak_rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+async def _replay(base_url: str, traffic, concurrency: int):
+    import httpx
+
+    latencies, statuses = [], {}
+    queue = iter(traffic)
+
+    async def worker(client):
+        for params in queue:
+            start = time.perf_counter()
+            response = await client.get("/recommend", params=params)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return latencies, statuses, wall
+
+
+def run_load(traffic, *, concurrency: int = 16, result_cache: bool = True,
+             warm: str = "all") -> dict:
+    import httpx
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), _JikanStub)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    port = _free_port()
+    env = dict(
+        os.environ,
+        JIKAN_BASE_URL=f"http://127.0.0.1:{stub.server_port}/v4",
+        JIKAN_RATE="10000",
+        WARM_MEDIA=warm,
+        DATA_WATCH_INTERVAL="0",
+    )
+    if not result_cache:
+        env["RESULT_CACHE_MB"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 300
+        while True:
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("API server did not start")
+            time.sleep(0.2)
+
+        print(f"🔥 Replaying {len(traffic)} requests at concurrency {concurrency}...")
+        latencies, statuses, wall = asyncio.run(_replay(base_url, traffic, concurrency))
+        result = summarize(latencies, wall)
+        result["status_codes"] = {str(k): v for k, v in sorted(statuses.items())}
+        result["server_peak_rss_mb"] = _peak_rss_mb(server.pid)
+        result["concurrency"] = concurrency
+        result["result_cache"] = result_cache
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        stub.shutdown()
+    print(f"   /recommend {result['throughput_per_s']} req/s  p50={result['p50_ms']:.2f}ms  "
+          f"p95={result['p95_ms']:.2f}ms  p99={result['p99_ms']:.2f}ms  "
+          f"rss={result['server_peak_rss_mb']}MB  {result['status_codes']}")
+    return result
+
+
+# ----------------------------
+# Results
+# ----------------------------
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results: dict, prefix: str = ""):
+    for key, value in results.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            yield f"{prefix}{key}", value
+        elif isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}/")
+
+
+def compare(current: dict, baseline: dict):
+    """Print p50 / throughput / memory ratios (current vs baseline) for shared paths."""
+    before = dict(_flatten({k: baseline.get(k, {}) for k in ("micro", "load")}))
+    print(f"\nvs baseline {baseline.get('meta', {}).get('git_revision')}:")
+    for path, stats in _flatten({k: current.get(k, {}) for k in ("micro", "load")}):
+        old = before.get(path)
+        if old is None:
+            continue
+        line = f"   {path:<40} p50 {old['p50_ms']:.3f} -> {stats['p50_ms']:.3f}ms"
+        if old["p50_ms"]:
+            line += f" ({stats['p50_ms'] / old['p50_ms']:.2f}x)"
+        if old.get("peak_mb") and stats.get("peak_mb"):
+            line += f"  peak {old['peak_mb']} -> {stats['peak_mb']}MB"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommender hot paths.")
+    parser.add_argument("suite", choices=["micro", "load", "all"], nargs="?", default="all")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3000, 30000, 300000])
+    parser.add_argument("--queries", type=int, default=200, help="calls per micro path")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc passes")
+    parser.add_argument("--traffic", type=Path, help="JSONL of /recommend query parameters")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--no-result-cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "git_revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        }
+    }
+    if args.suite in ("micro", "all"):
+        results["micro"] = run_micro(
+            args.sizes, queries=args.queries, seed=args.seed, memory=not args.no_memory
+        )
+    if args.suite in ("load", "all"):
+        if args.traffic:
+            with open(args.traffic, encoding="utf-8") as fh:
+                traffic = [json.loads(line) for line in fh if line.strip()]
+        else:
+            traffic = synthetic_traffic(args.requests, args.seed)
+        results["load"] = {
+            "recommend": run_load(
+                traffic, concurrency=args.concurrency, result_cache=not args.no_result_cache
+            )
+        }
+
+    out = args.out or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"\n💾 Saved {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            compare(results, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
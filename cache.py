@@ -0,0 +1,228 @@
+"""
+Small in-process caches shared by the API helpers.
+
+ResponseCache keeps rendered /recommend responses under a byte budget.
+Entries are keyed per media type *generation*: swapping in a new engine
+bumps the generation, so results from the old engine are never served
+again. RedisResponseCache is the same interface on a Redis-protocol server,
+for replicas that should share one cache.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Returned by TTLCache.get on a miss, so None can be cached as a real value.
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Small LRU cache whose entries also expire after `ttl` seconds.
+    Safe to share between threads.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < self.clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive cache key for a user query."""
+    return " ".join(str(query).casefold().split())
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of serialized responses (bytes), bounded by total size.
+    Counters: hits, misses, evictions (LRU or budget), expirations.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_bytes: int = 64 * 2**20, ttl: float = 600.0, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self.nbytes = 0
+        self._data = OrderedDict()  # key -> (expires, media, bytes)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def key(self, media: str, *parts) -> str:
+        """Key for `parts` under the current generation of `media`."""
+        return "|".join([media, str(self._generations.get(media, 0)), *map(str, parts)])
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < self.clock():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: str, value: bytes):
+        media, generation = key.split("|", 2)[:2]
+        size = len(value) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != str(self._generations.get(media, 0)):
+                return  # computed before an invalidate(); nobody can look it up
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (self.clock() + self.ttl, media, value)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        _, _, value = self._data.pop(key)
+        self.nbytes -= len(value) + len(key)
+
+    def invalidate(self, media: str):
+        """Forget every entry for `media` (call after its engine is swapped)."""
+        with self._lock:
+            self._generations[media] = self._generations.get(media, 0) + 1
+            for key in [k for k, entry in self._data.items() if entry[1] == media]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._data),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisResponseCache:
+    """
+    ResponseCache on a Redis-protocol server (Redis, Valkey, KeyDB, ...).
+
+    Generations live on the server, so an invalidation by any replica is
+    seen by all of them; expiry and the memory budget are left to the
+    server (SETEX + its maxmemory policy). Hit/miss counters are per process.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str, ttl: float = 600.0, prefix: str = "recommend:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.client.ping()
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = self.misses = self.errors = 0
+        self._errors = redis.RedisError
+
+    def key(self, media: str, *parts) -> Optional[str]:
+        """None when the server can't be reached (the request skips the cache)."""
+        try:
+            generation = int(self.client.get(f"{self.prefix}gen:{media}") or 0)
+        except self._errors:
+            self.errors += 1
+            return None
+        return "|".join([f"{self.prefix}{media}", str(generation), *map(str, parts)])
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = self.client.get(key)
+        except self._errors:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        try:
+            self.client.setex(key, max(1, int(self.ttl)), value)
+        except self._errors:
+            self.errors += 1
+
+    def invalidate(self, media: str):
+        # Old-generation keys are never read again and expire on their own
+        try:
+            self.client.incr(f"{self.prefix}gen:{media}")
+        except self._errors as e:
+            self.errors += 1
+            print(f"   ⚠ Could not invalidate cached {media} results ({e})")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "errors": self.errors,
+        }
+
+
+def make_response_cache():
+    """
+    Response cache configured from the environment:
+    RESULT_CACHE_URL (redis://... to share between replicas),
+    RESULT_CACHE_MB (in-process budget, 0 disables caching), RESULT_CACHE_TTL.
+    """
+    ttl = float(os.environ.get("RESULT_CACHE_TTL", "600"))
+    max_mb = float(os.environ.get("RESULT_CACHE_MB", "64"))
+    if max_mb <= 0:
+        return None
+
+    url = os.environ.get("RESULT_CACHE_URL")
+    if url:
+        try:
+            return RedisResponseCache(url, ttl=ttl)
+        except Exception as e:
+            print(f"   ⚠ Could not use result cache at {url} ({e}); using in-process cache")
+    return ResponseCache(max_bytes=int(max_mb * 2**20), ttl=ttl)
@@ -0,0 +1,173 @@
+"""
+Catalog files: Parquet as the canonical store, CSV for import / export.
+
+Each media type's catalog is `data/<stem>.parquet`. When only a
+`data/<stem>.csv` exists it is read instead, so older checkouts and
+hand-edited CSVs keep working. Parquet files are written in row groups and
+read with column projection and memory mapping. A consumer that only needs
+titles never decodes the synopsis column, and building an index reads just
+the text columns it vectorizes.
+
+    python catalog.py import                 # data/*.csv -> data/*.parquet
+    python catalog.py import data/anime.csv  # one file
+    python catalog.py export anime           # data/anime.parquet -> data/anime.csv
+
+Parquet support needs pyarrow (`pip install pyarrow`); without it only CSV
+catalogs can be read or written.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # optional, CSV-only without it
+    pa = pa_csv = pq = None
+
+# Columns a catalog row carries (get_ultimate_db.py writes exactly these)
+CATALOG_COLUMNS = ["item_id", "title", "genres", "description", "image_url"]
+
+ROW_GROUP_SIZE = int(os.environ.get("CATALOG_ROW_GROUP", "10000"))
+SUFFIXES = (".parquet", ".csv")
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError("Parquet catalogs need pyarrow: pip install pyarrow")
+
+
+def catalog_path(data_dir: Path, stem: str) -> Path:
+    """
+    The catalog file for `stem`: the Parquet file, else a CSV, else the
+    Parquet path a new catalog should be written to.
+    """
+    data_dir = Path(data_dir)
+    for suffix in SUFFIXES:
+        path = data_dir / f"{stem}{suffix}"
+        if path.exists() and (suffix != ".parquet" or pq is not None):
+            return path
+    return data_dir / f"{stem}{SUFFIXES[0] if pq is not None else '.csv'}"
+
+
+def catalog_columns(path: Path) -> list:
+    """Column names of a catalog, read from its schema / header only."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        _require_pyarrow()
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def read_catalog(path: Path, columns=None) -> pd.DataFrame:
+    """
+    Read a catalog, optionally only `columns` (ones the file lacks are
+    skipped). Parquet is memory-mapped and only the requested columns are
+    decoded.
+    """
+    path = Path(path)
+    if columns is not None:
+        present = set(catalog_columns(path))
+        columns = [c for c in columns if c in present]
+    if path.suffix == ".parquet":
+        _require_pyarrow()
+        table = pq.read_table(path, columns=columns, memory_map=True)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    return pd.read_csv(path, usecols=columns)
+
+
+def iter_catalog(path: Path, columns=None, batch_size: int = ROW_GROUP_SIZE):
+    """Yield the catalog as DataFrames of up to `batch_size` rows."""
+    path = Path(path)
+    if columns is not None:
+        present = set(catalog_columns(path))
+        columns = [c for c in columns if c in present]
+    if path.suffix == ".parquet":
+        _require_pyarrow()
+        parquet = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(path, usecols=columns, chunksize=batch_size)
+
+
+def write_catalog(items: pd.DataFrame, path: Path, *, row_group_size: int = ROW_GROUP_SIZE):
+    """Atomically write `items` as Parquet (in row groups) or CSV, by suffix."""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    if path.suffix == ".parquet":
+        _require_pyarrow()
+        table = pa.Table.from_pandas(items, preserve_index=False)
+        pq.write_table(table, tmp, row_group_size=row_group_size, compression="zstd")
+    else:
+        items.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def convert_catalog(source: Path, target: Path, *, source_format: str = None,
+                    row_group_size: int = ROW_GROUP_SIZE):
+    """
+    Stream `source` into `target` (CSV <-> Parquet) one block at a time, so
+    catalogs larger than memory convert too. Formats follow the file
+    suffixes unless `source_format` ("csv" / "parquet") says otherwise.
+    """
+    source, target = Path(source), Path(target)
+    _require_pyarrow()
+    tmp = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+
+    if (source_format or source.suffix.lstrip(".")) == "csv":
+        # Ids as int64 and every text column as string, however the first block looks
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(block_size=1 << 22),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={c: pa.int64() if c == "item_id" else pa.string()
+                              for c in CATALOG_COLUMNS}
+            ),
+        )
+        batches, schema = iter(reader), reader.schema
+    else:
+        parquet = pq.ParquetFile(source, memory_map=True)
+        batches, schema = parquet.iter_batches(batch_size=row_group_size), parquet.schema_arrow
+
+    if target.suffix == ".parquet":
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            for batch in batches:
+                writer.write_table(pa.Table.from_batches([batch]), row_group_size=row_group_size)
+    else:
+        with pa_csv.CSVWriter(tmp, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    os.replace(tmp, target)
+    return target
+
+
+def main(argv=None):
+    args = list(argv if argv is not None else sys.argv[1:])
+    if not args or args[0] not in ("import", "export"):
+        print(__doc__)
+        return
+
+    command, names = args[0], args[1:]
+    data_dir = Path(__file__).parent / "data"
+    if command == "import":
+        sources = [Path(n) for n in names] or sorted(data_dir.glob("*.csv"))
+        pairs = [(src, src.with_suffix(".parquet")) for src in sources]
+    else:
+        stems = names or sorted(p.stem for p in data_dir.glob("*.parquet"))
+        pairs = [(data_dir / f"{s}.parquet", data_dir / f"{s}.csv") for s in stems]
+
+    for source, target in pairs:
+        if not source.exists():
+            print(f"   ⚠ Skipping {source}, file not found")
+            continue
+        convert_catalog(source, target)
+        print(f"✅ {source} -> {target} ({target.stat().st_size / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Dense embedding engine ("Semantic (Sentence-BERT)" mode).
+
+Items are embedded offline on CPU and stored as a quantized, contiguous
+matrix (int8 with one float32 scale per row, or float16) that can be
+memory-mapped. Queries are scored with blocked NumPy dot products.
+
+The embedding model is Sentence-BERT when `sentence-transformers` and the
+model weights are available; otherwise (or with EMBEDDING_MODEL=hashing) a
+deterministic feature-hashing embedder is used, which needs no downloads.
+"""
+
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+HASHING_MODEL = "hashing-384"
+
+# Function words that would otherwise dominate hashed bag-of-words vectors
+_STOP_WORDS = frozenset(
+    """
+    about after again all also an and any are as at be been before being but by
+    can could did do does for from had has have he her him his how if in into is
+    it its just me more most my no not of on one only or other our out over own
+    she so some such than that the their them then there these they this those
+    through to too under up very was we were what when where which while who why
+    will with would you your
+    """.split()
+)
+
+# Rows scored per NumPy call; bounds the float32 temp for int8 codes.
+SCORE_BLOCK = 65536
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder: unigrams and bigrams are hashed into
+    `dim` signed buckets with log-scaled counts, then L2-normalized.
+    """
+
+    token_pattern = re.compile(r"(?u)\b\w\w+\b")
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    @staticmethod
+    @lru_cache(maxsize=200_000)
+    def _bucket(term: str):
+        h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+        return h >> 1, 1.0 if h & 1 else -1.0
+
+    def encode(self, texts) -> np.ndarray:
+        texts = list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            tokens = [
+                t for t in self.token_pattern.findall(str(text).lower()) if t not in _STOP_WORDS
+            ]
+            counts = {}
+            for term in tokens + [" ".join(p) for p in zip(tokens, tokens[1:])]:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                h, sign = self._bucket(term)
+                out[i, h % self.dim] += sign * (1.0 + np.log(count))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class SentenceTransformerEmbedder:
+    """Sentence-BERT on CPU, returning L2-normalized float32 vectors."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = model_name
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts) -> np.ndarray:
+        return self.model.encode(
+            list(texts),
+            batch_size=64,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(np.float32)
+
+
+def get_embedder(name: str = None):
+    """
+    Embedder by name (default: $EMBEDDING_MODEL or Sentence-BERT).
+    Falls back to the hashing embedder when Sentence-BERT can't be loaded.
+    Each model is loaded once per process and shared.
+    """
+    return _load_embedder(name or os.environ.get("EMBEDDING_MODEL", DEFAULT_MODEL))
+
+
+@lru_cache(maxsize=8)
+def _load_embedder(name: str):
+    if name.startswith("hashing"):
+        dim = int(name.split("-")[1]) if "-" in name else 384
+        return HashingEmbedder(dim)
+    try:
+        return SentenceTransformerEmbedder(name)
+    except Exception as e:
+        print(f"   ⚠ Could not load embedding model {name!r} ({e}); using {HASHING_MODEL}")
+        return HashingEmbedder()
+
+
+def quantize(vectors: np.ndarray, dtype: str = "int8"):
+    """
+    Compress float vectors. Returns (codes, scales):
+    int8 -> symmetric per-row scale so row ~= codes * scale;
+    float16 -> scales is None.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return np.ascontiguousarray(vectors.astype(np.float16)), None
+    if dtype != "int8":
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    max_abs = np.abs(vectors).max(axis=1)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return np.ascontiguousarray(codes), scales
+
+
+class EmbeddingIndex:
+    """
+    Quantized item embeddings plus the model that produced them.
+    load_index() resolves that model up front (load_embedder), so a host
+    without it finds out at startup; item-to-item scoring works either way.
+    """
+
+    def __init__(self, codes, scales=None, *, model_name: str = HASHING_MODEL, embedder=None):
+        self.codes = codes
+        self.scales = scales
+        self.model_name = model_name
+        self._embedder = embedder
+        self._unavailable = False
+
+    @classmethod
+    def from_vectors(cls, vectors, embedder, dtype: str = "int8"):
+        codes, scales = quantize(vectors, dtype)
+        return cls(codes, scales, model_name=embedder.name, embedder=embedder)
+
+    @property
+    def dtype(self) -> str:
+        return str(self.codes.dtype)
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def load_embedder(self) -> bool:
+        """
+        Load the model the embeddings were built with. False when this host
+        can't (another model would put queries in a different space).
+        """
+        if self._embedder is None and not self._unavailable:
+            embedder = get_embedder(self.model_name)
+            if embedder.name == self.model_name:
+                self._embedder = embedder
+            else:
+                self._unavailable = True
+        return self._embedder is not None
+
+    @property
+    def can_encode(self) -> bool:
+        """Whether text can be embedded into this index's space."""
+        return self.load_embedder()
+
+    @property
+    def embedder(self):
+        if not self.load_embedder():
+            raise RuntimeError(
+                f"Embeddings were built with {self.model_name!r}, "
+                f"which is not available here."
+            )
+        return self._embedder
+
+    def with_updates(self, rows, vectors) -> "EmbeddingIndex":
+        """Copy with float `vectors` quantized into `rows` (appending past the end)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        size = max(len(self), int(rows.max()) + 1 if len(rows) else 0)
+        new_codes, new_scales = quantize(vectors, "float16" if self.scales is None else "int8")
+
+        codes = np.zeros((size, self.codes.shape[1]), dtype=self.codes.dtype)
+        codes[: len(self)] = self.codes
+        codes[rows] = new_codes
+        scales = None
+        if self.scales is not None:
+            scales = np.ones(size, dtype=np.float32)
+            scales[: len(self)] = self.scales
+            scales[rows] = new_scales
+        return EmbeddingIndex(codes, scales, model_name=self.model_name, embedder=self._embedder)
+
+    def vector(self, row: int) -> np.ndarray:
+        vec = np.asarray(self.codes[row], dtype=np.float32)
+        return vec * self.scales[row] if self.scales is not None else vec
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.embedder.encode([text])[0]
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Dot product of a float query vector against every item."""
+        query = np.asarray(query, dtype=np.float32)
+        out = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK):
+            block = self.codes[start : start + SCORE_BLOCK]
+            out[start : start + len(block)] = block.astype(np.float32) @ query
+        if self.scales is not None:
+            out *= self.scales
+        return out
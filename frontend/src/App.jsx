@@ -217,8 +217,15 @@ export default function App() {
                     >
                       <div className="w-28 h-40 flex-shrink-0 overflow-hidden relative">
                         <img
-                          src={rec.image_url}
+                          src={`${BACKEND_URL}/images/${results.media_type}/${rec.item_id}`}
+                          onError={(e) => {
+                            // Proxy unavailable: fall back to the original cover
+                            e.currentTarget.onerror = null;
+                            e.currentTarget.src = rec.image_url;
+                          }}
                           alt={rec.title}
+                          loading="lazy"
+                          decoding="async"
                           className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-300"
                         />
                       </div>
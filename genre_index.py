@@ -0,0 +1,115 @@
+"""
+Packed genre bitmap for faceted recommendations.
+
+Every distinct genre in a catalog's pipe-separated `genres` column gets a
+bit; each item's genres are packed into a (n_words, n_items) uint64 array.
+An include / exclude filter is then a couple of vectorized ANDs over the
+whole catalog, giving a boolean mask that is applied to the scores before
+top-k selection instead of filtering (and over-fetching) afterwards.
+"""
+
+import numpy as np
+
+GENRE_SEPARATOR = "|"
+
+
+def split_genres(value) -> list:
+    """'Action|Drama|Shounen' -> ['Action', 'Drama', 'Shounen']."""
+    return [g.strip() for g in str(value).split(GENRE_SEPARATOR) if g.strip()]
+
+
+def parse_genre_filter(values) -> list:
+    """Flatten repeated / comma- or pipe-separated query values."""
+    genres = []
+    for value in values or []:
+        for genre in str(value).replace(GENRE_SEPARATOR, ",").split(","):
+            genre = genre.strip()
+            if genre and genre.lower() not in (g.lower() for g in genres):
+                genres.append(genre)
+    return genres
+
+
+class GenreIndex:
+    """
+    Genre membership of every item as a packed bit array.
+    `bits[w, i]` holds genres 64*w .. 64*w+63 of item i (word-major, so each
+    word is one contiguous row to test); `names[b]` is bit b.
+    Lookups are case-insensitive.
+    """
+
+    def __init__(self, names, bits: np.ndarray):
+        self.names = list(names)
+        self.bits = bits
+        self._bit_of = {name.lower(): b for b, name in enumerate(self.names)}
+
+    @classmethod
+    def build(cls, genres) -> "GenreIndex":
+        index = cls([], np.zeros((1, 0), dtype=np.uint64))
+        return index.with_updates(np.arange(len(genres)), genres)
+
+    def __len__(self):
+        return self.bits.shape[1]
+
+    def with_updates(self, rows, genres) -> "GenreIndex":
+        """
+        Copy with the genre strings `genres` written at `rows`; rows past the
+        end are appended and unseen genres get new bits.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        names = list(self.names)
+        bit_of = dict(self._bit_of)
+
+        item_rows, item_bits = [], []
+        for row, value in zip(rows.tolist(), genres):
+            for genre in split_genres(value):
+                bit = bit_of.get(genre.lower())
+                if bit is None:
+                    bit = bit_of[genre.lower()] = len(names)
+                    names.append(genre)
+                item_rows.append(row)
+                item_bits.append(bit)
+
+        n_items = max(len(self), int(rows.max()) + 1 if len(rows) else 0)
+        n_words = max(self.bits.shape[0], (len(names) + 63) // 64)
+        bits = np.zeros((n_words, n_items), dtype=np.uint64)
+        bits[: self.bits.shape[0], : len(self)] = self.bits
+        bits[:, rows] = 0
+
+        item_bits = np.asarray(item_bits, dtype=np.int64)
+        np.bitwise_or.at(
+            bits,
+            (item_bits // 64, np.asarray(item_rows, dtype=np.int64)),
+            np.left_shift(np.uint64(1), (item_bits % 64).astype(np.uint64)),
+        )
+        return GenreIndex(names, bits)
+
+    def unknown(self, genres) -> list:
+        """The entries of `genres` that no item in this catalog has."""
+        return [g for g in genres if g.lower() not in self._bit_of]
+
+    def _pattern(self, genres) -> np.ndarray:
+        pattern = np.zeros(self.bits.shape[0], dtype=np.uint64)
+        for genre in genres:
+            bit = self._bit_of.get(genre.lower())
+            if bit is not None:
+                pattern[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return pattern
+
+    def mask(self, include=(), exclude=()):
+        """
+        Boolean mask of items having every `include` genre and none of the
+        `exclude` genres, or None when neither filters anything.
+        An unknown include genre matches nothing; unknown excludes are ignored.
+        """
+        if not include and not exclude:
+            return None
+        if self.unknown(include):
+            return np.zeros(len(self), dtype=bool)
+
+        allowed = np.ones(len(self), dtype=bool)
+        for word, wanted, banned in zip(self.bits, self._pattern(include), self._pattern(exclude)):
+            if wanted:
+                allowed &= (word & wanted) == wanted
+            if banned:
+                allowed &= (word & banned) == 0
+        return allowed
@@ -1,84 +1,239 @@
-import requests
-import pandas as pd
-import time
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
 from pathlib import Path
 
+import httpx
+
+from catalog import CATALOG_COLUMNS, catalog_path, convert_catalog
+from jikan_client import JIKAN_BASE_URL, TokenBucket, retry_after_seconds
+
 # --- SETTINGS ---
 TARGET_PER_CATEGORY = 3000
+PAGE_SIZE = 25  # Jikan's maximum page size
+MAX_RETRIES = 5  # network errors / 5xx / bad bodies per page; 429s only slow the limiter down
+MAX_RATE_LIMIT_WAIT = 600.0  # seconds of 429 backoff per page before giving up on it
 DATA_DIR = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
-
-def fetch_category(name, endpoint, file_name, params=None):
-    base_url = f"https://api.jikan.moe/v4/{endpoint}"
-    if params is None: params = {}
-    
-    collected = []
-    page = 1
-    
-    print(f"\n🚀 Starting download for: {name.upper()} (With Images)")
-    print(f"   Target: {TARGET_PER_CATEGORY} items")
 
-    while len(collected) < TARGET_PER_CATEGORY:
+FIELDS = CATALOG_COLUMNS
+
+CATEGORIES = [
+    ("Anime", "top/anime", "anime", {"filter": "bypopularity"}),
+    ("Manga", "top/manga", "manga", {"type": "manga", "filter": "bypopularity"}),
+    ("Manhwa", "top/manga", "manhwa", {"type": "manhwa", "filter": "bypopularity"}),
+]
+
+
+def parse_item(item):
+    # 1. Get Image URL
+    try:
+        img_url = item['images']['jpg']['image_url']
+    except (KeyError, TypeError):
+        img_url = "https://placehold.co/400x600?text=No+Image"
+
+    # 2. Get Genres
+    genres = [g['name'] for g in item.get('genres', []) + item.get('themes', []) + item.get('demographics', [])]
+    genre_str = "|".join(genres) if genres else "General"
+
+    # 3. Description
+    desc = item.get('synopsis', '')
+    if desc:
+        desc = desc.replace('\n', ' ').replace('\r', '').strip()
+    else:
+        desc = ""
+
+    return {
+        "item_id": item['mal_id'],
+        "title": item['title'],
+        "genres": genre_str,
+        "description": desc,
+        "image_url": img_url,
+    }
+
+
+class Checkpoint:
+    """
+    Resumable state for one category.
+
+    Rows are appended to `<file>.partial` (CSV) page by page;
+    `<file>.progress.json` records the next page to fetch. Once the category
+    completes, the partial file is converted into the final catalog (Parquet
+    row groups, or renamed into place as CSV), so readers never see a
+    half-written file.
+    """
+
+    def __init__(self, output_path: Path):
+        self.output_path = output_path
+        self.partial_path = output_path.with_name(output_path.name + ".partial")
+        self.state_path = output_path.with_name(output_path.name + ".progress.json")
+        self.next_page = 1
+        self.seen = set()
+
+        if self.state_path.exists() and self.partial_path.exists():
+            with open(self.state_path, encoding="utf-8") as fh:
+                self.next_page = json.load(fh)["next_page"]
+            with open(self.partial_path, newline="", encoding="utf-8") as fh:
+                self.seen = {int(row["item_id"]) for row in csv.DictReader(fh)}
+        else:
+            with open(self.partial_path, "w", newline="", encoding="utf-8") as fh:
+                csv.DictWriter(fh, fieldnames=FIELDS).writeheader()
+
+    def append_page(self, page: int, rows) -> int:
+        """Append new (unseen) rows, then advance the checkpoint. Returns rows written."""
+        fresh = [r for r in rows if r["item_id"] not in self.seen]
+        with open(self.partial_path, "a", newline="", encoding="utf-8") as fh:
+            csv.DictWriter(fh, fieldnames=FIELDS).writerows(fresh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        self.seen.update(r["item_id"] for r in fresh)
+
+        # A crash between the two writes just refetches this page; the
+        # `seen` set drops its duplicates on resume.
+        self.next_page = page + 1
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"next_page": self.next_page, "rows": len(self.seen)}, fh)
+        os.replace(tmp, self.state_path)
+        return len(fresh)
+
+    def finish(self):
+        if self.output_path.suffix == ".parquet":
+            convert_catalog(self.partial_path, self.output_path, source_format="csv")
+            self.partial_path.unlink()
+        else:
+            os.replace(self.partial_path, self.output_path)
+        self.state_path.unlink(missing_ok=True)
+
+
+async def fetch_page(client, limiter, url, params):
+    """
+    GET one page through the shared limiter.
+    Returns the decoded JSON object, or None once retries (or the 429
+    wait budget) are exhausted.
+    """
+    attempt = 0
+    rate_limited = 0.0
+    while attempt < MAX_RETRIES:
+        await limiter.acquire()
         try:
-            current_params = params.copy()
-            current_params["page"] = page
-            
-            print(f"   📥 Fetching Page {page} (Total: {len(collected)})...")
-            response = requests.get(base_url, params=current_params)
-            
-            if response.status_code == 429:
-                print("   ⏳ Rate limited. Sleeping 5s...")
-                time.sleep(5)
-                continue
-            
-            if response.status_code != 200: break
-            data = response.json().get('data', [])
-            if not data: break
-
-            for item in data:
-                # 1. Get Image URL
-                try:
-                    img_url = item['images']['jpg']['image_url']
-                except:
-                    img_url = "https://placehold.co/400x600?text=No+Image"
-
-                # 2. Get Genres
-                genres = [g['name'] for g in item.get('genres', []) + item.get('themes', []) + item.get('demographics', [])]
-                genre_str = "|".join(genres) if genres else "General"
-                
-                # 3. Description
-                desc = item.get('synopsis', '')
-                if desc:
-                    desc = desc.replace('\n', ' ').replace('\r', '').strip()
-                else:
-                    desc = ""
-
-                collected.append({
-                    "item_id": item['mal_id'],
-                    "title": item['title'],
-                    "genres": genre_str,
-                    "description": desc,
-                    "image_url": img_url  # <--- NEW FIELD
-                })
-
-            page += 1
-            time.sleep(1.5)
-
-        except Exception as e:
-            print(f"   ❌ Crash: {e}")
+            response = await client.get(url, params=params)
+        except httpx.HTTPError as e:
+            print(f"   ❌ Network error ({e}); retrying...")
+            await asyncio.sleep(2 ** attempt)
+            attempt += 1
+            continue
+
+        if response.status_code == 429:
+            # Not a failure: wait as told (seconds or an HTTP-date) and retry,
+            # up to MAX_RATE_LIMIT_WAIT in total for this page
+            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            rate_limited += retry_after
+            if rate_limited > MAX_RATE_LIMIT_WAIT:
+                print(f"   ❌ Still rate limited after {rate_limited - retry_after:.0f}s.")
+                return None
+            print(f"   ⏳ Rate limited. Backing off {retry_after:.0f}s...")
+            limiter.backoff(retry_after)
+            continue
+        if response.status_code >= 500:
+            await asyncio.sleep(2 ** attempt)
+            attempt += 1
+            continue
+        if response.status_code != 200:
+            return None
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            # A truncated body or a proxy's error page; treat it like a 5xx
+            print("   ❌ Unreadable page body; retrying...")
+            await asyncio.sleep(2 ** attempt)
+            attempt += 1
+            continue
+
+        limiter.recover()
+        return body
+    return None
+
+
+def parse_items(name, data):
+    """Catalog rows for a page's items, skipping (and logging) any that don't parse."""
+    rows = []
+    for item in data:
+        try:
+            rows.append(parse_item(item))
+        except (KeyError, TypeError, AttributeError) as e:
+            print(f"   ⚠️ {name}: skipping malformed item ({type(e).__name__}: {e})")
+    return rows
+
+
+async def fetch_category(client, limiter, name, endpoint, stem, params=None,
+                         target=TARGET_PER_CATEGORY, base_url=JIKAN_BASE_URL,
+                         data_dir=DATA_DIR):
+    url = f"{base_url.rstrip('/')}/{endpoint}"
+    params = dict(params or {})
+    # Keeps the format the catalog already has (Parquet for a new one)
+    checkpoint = Checkpoint(catalog_path(data_dir, stem))
+
+    print(f"\n🚀 Starting download for: {name.upper()} (With Images)")
+    print(f"   Target: {target} items (resuming at page {checkpoint.next_page}, "
+          f"{len(checkpoint.seen)} saved)")
+
+    while len(checkpoint.seen) < target:
+        page = checkpoint.next_page
+        body = await fetch_page(client, limiter, url, {**params, "page": page, "limit": PAGE_SIZE})
+        if body is None:
+            print(f"   ❌ {name}: giving up at page {page}; rerun to resume.")
+            return False
+
+        data = body.get("data") or []
+        if not isinstance(data, list):
+            print(f"   ❌ {name}: page {page} has no item list; rerun to resume.")
+            return False
+        written = checkpoint.append_page(page, parse_items(name, data))
+        print(f"   📥 {name} page {page}: +{written} (Total: {len(checkpoint.seen)})")
+
+        if not data or not body.get("pagination", {}).get("has_next_page", True):
             break
 
-    # Save to CSV
-    df = pd.DataFrame(collected)
-    df.drop_duplicates(subset=['item_id'], inplace=True)
-    output_path = DATA_DIR / file_name
-    df.to_csv(output_path, index=False)
-    print(f"🎉 Saved {len(df)} {name} to {output_path}")
+    checkpoint.finish()
+    print(f"🎉 Saved {len(checkpoint.seen)} {name} to {checkpoint.output_path}")
+    return True
+
+
+async def run(target=TARGET_PER_CATEGORY, base_url=JIKAN_BASE_URL, data_dir=DATA_DIR,
+              rate=1.0, burst=3, transport=None):
+    """Download every category concurrently. Returns one True/False per category."""
+    Path(data_dir).mkdir(exist_ok=True)
+    # One limiter and one connection pool shared by every category
+    limiter = TokenBucket(rate=rate, capacity=burst)
+    async with httpx.AsyncClient(timeout=30.0, transport=transport) as client:
+        results = await asyncio.gather(*(
+            fetch_category(client, limiter, name, endpoint, stem, params,
+                           target=target, base_url=base_url, data_dir=data_dir)
+            for name, endpoint, stem, params in CATEGORIES
+        ), return_exceptions=True)
+
+    # One category crashing must not cancel (or hide) the others
+    for (name, *_), result in zip(CATEGORIES, results):
+        if isinstance(result, Exception):
+            print(f"   ❌ {name}: crashed ({type(result).__name__}: {result}); rerun to resume.")
+    return [result is True for result in results]
+
 
 def main():
-    fetch_category("Anime", "top/anime", "anime.csv", params={"filter": "bypopularity"})
-    fetch_category("Manga", "top/manga", "manga.csv", params={"type": "manga", "filter": "bypopularity"})
-    fetch_category("Manhwa", "top/manga", "manhwa.csv", params={"type": "manhwa", "filter": "bypopularity"})
+    parser = argparse.ArgumentParser(description="Download the anime / manga / manhwa catalogs.")
+    parser.add_argument("--target", type=int, default=TARGET_PER_CATEGORY)
+    parser.add_argument("--base-url", default=JIKAN_BASE_URL)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    args = parser.parse_args()
+    results = asyncio.run(run(args.target, args.base_url, args.data_dir))
+    if not all(results):
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
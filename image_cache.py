@@ -0,0 +1,452 @@
+"""
+Local image proxy: cover thumbnails cached on disk.
+
+GET /images/{media_type}/{item_id} serves an item's catalog `image_url`
+through this cache. Each cover is fetched once, shrunk to card size (WebP
+when the browser accepts it, JPEG otherwise) and kept under IMAGE_CACHE_DIR:
+
+    blobs/ab/<sha256>.webp    thumbnail bytes, named by their own hash
+    refs/cd/<sha256>          (of "<variant>|<url>") -> "<sha256>.webp"
+
+Blobs are content-addressed, so a cover shared by many items (the
+placeholder) is stored once and its hash doubles as a strong ETag. Serving
+a blob bumps its mtime; once the blobs pass IMAGE_CACHE_MB the least
+recently served ones are deleted. Without Pillow, or for formats it can't
+decode (SVG placeholders), the original bytes are cached as they are.
+
+    python image_cache.py warm                       # every catalog's covers
+    python image_cache.py warm anime --limit 500 --format both
+
+Only http(s) URLs on IMAGE_HOSTS (default: the MAL CDN and placehold.co)
+are fetched, and only when the host resolves to public addresses; the
+connection then goes to the address that was checked. Redirects are followed
+by hand (at most MAX_REDIRECTS) and every hop is checked the same way, so
+catalog rows can't point the server at internal services.
+
+IMAGE_ORIGIN=http://127.0.0.1:9000 sends every fetch to that host instead
+(paths and query kept), for a local stub origin in tests and benchmarks.
+"""
+
+import asyncio
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from metrics import IMAGE_REQUESTS
+
+try:
+    from PIL import Image, UnidentifiedImageError, features
+except ImportError:  # optional, originals are cached unresized without it
+    Image = None
+
+IMAGE_CACHE_DIR = Path(os.environ.get("IMAGE_CACHE_DIR", Path(__file__).parent / "data" / "images"))
+IMAGE_CACHE_MB = float(os.environ.get("IMAGE_CACHE_MB", "512"))
+# Bounding box of a thumbnail: the frontend's 112x160 card at 2x density
+IMAGE_SIZE = tuple(int(v) for v in os.environ.get("IMAGE_SIZE", "224x320").split("x"))
+IMAGE_ORIGIN = os.environ.get("IMAGE_ORIGIN", "")
+IMAGE_FETCH_CONCURRENCY = int(os.environ.get("IMAGE_FETCH_CONCURRENCY", "8"))
+# Hosts cover images may be fetched from (IMAGE_ORIGIN's host is always allowed)
+IMAGE_HOSTS = frozenset(
+    h.strip().lower()
+    for h in os.environ.get("IMAGE_HOSTS", "cdn.myanimelist.net,placehold.co").split(",")
+    if h.strip()
+)
+MAX_SOURCE_BYTES = 10 * 2**20
+MAX_REDIRECTS = 3
+# Hits refresh a blob's mtime (its LRU position) at most this often
+TOUCH_INTERVAL = 60.0
+
+FORMATS = ("webp", "jpeg")
+CONTENT_TYPES = {
+    "webp": "image/webp",
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "avif": "image/avif",
+    "svg": "image/svg+xml",
+}
+EXTENSIONS = {content_type: ext for ext, content_type in CONTENT_TYPES.items()}
+
+
+class ImageFetchError(Exception):
+    """The source image could not be fetched or is not an image."""
+
+
+class CachedImage(NamedTuple):
+    data: bytes
+    content_type: str
+    etag: str
+
+
+def webp_supported() -> bool:
+    return Image is not None and features.check("webp")
+
+
+def make_thumbnail(data: bytes, content_type: str, fmt: str, size=IMAGE_SIZE):
+    """
+    (bytes, content type) of `data` shrunk to fit `size` as `fmt`, or the
+    original when Pillow is missing or can't decode it. Raises
+    ImageFetchError for decompression bombs (too many pixels to decode).
+    """
+    if Image is None:
+        return data, content_type
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("RGB", size)  # JPEG sources decode straight at reduced scale
+            img = img.convert("RGB")
+            img.thumbnail(size, Image.LANCZOS)
+            out = io.BytesIO()
+            if fmt == "webp":
+                img.save(out, "WEBP", quality=80, method=4)
+            else:
+                img.save(out, "JPEG", quality=82, optimize=True, progressive=True)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        # The warning only arrives as an exception when warnings are escalated
+        raise ImageFetchError(f"refusing to decode: {e}") from e
+    except (UnidentifiedImageError, OSError):
+        return data, content_type
+    return out.getvalue(), f"image/{fmt}"
+
+
+class ImageCache:
+    """
+    Content-addressed thumbnail store with size-bounded LRU eviction.
+    Several processes can share one directory: every write is an atomic
+    rename, and each process evicts from a fresh scan of the disk.
+    """
+
+    def __init__(self, root: Path = IMAGE_CACHE_DIR, *, max_bytes: int = None,
+                 size=IMAGE_SIZE, origin: str = IMAGE_ORIGIN, hosts=IMAGE_HOSTS,
+                 timeout: float = 10.0, concurrency: int = IMAGE_FETCH_CONCURRENCY,
+                 transport=None):
+        self.root = Path(root)
+        self.max_bytes = int(IMAGE_CACHE_MB * 2**20) if max_bytes is None else int(max_bytes)
+        self.size = tuple(size)
+        self.origin = urlsplit(origin) if origin else None
+        self.hosts = frozenset(hosts) | ({self.origin.hostname} if self.origin else set())
+        self._slots = asyncio.Semaphore(concurrency)
+        self._inflight = {}
+        self._evict_lock = threading.Lock()
+        self._bytes = None  # blob bytes on disk, counted on first use
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=False,  # each hop is checked in _fetch
+            limits=httpx.Limits(max_connections=concurrency,
+                                max_keepalive_connections=concurrency),
+            transport=transport,
+        )
+
+    def variant(self, fmt: str) -> str:
+        """Cache variant a request for `fmt` maps to."""
+        if Image is None:
+            return "original"
+        if fmt == "webp" and not webp_supported():
+            fmt = "jpeg"
+        return f"{self.size[0]}x{self.size[1]}.{fmt}"
+
+    def _ref_path(self, url: str, variant: str) -> Path:
+        key = hashlib.sha256(f"{variant}|{url}".encode()).hexdigest()
+        return self.root / "refs" / key[:2] / key
+
+    def _blob_path(self, name: str) -> Path:
+        return self.root / "blobs" / name[:2] / name
+
+    def allowed(self, url: str) -> bool:
+        """Whether `url` is an http(s) URL on an allowed image host."""
+        parts = urlsplit(url)
+        return parts.scheme in ("http", "https") and (parts.hostname or "") in self.hosts
+
+    def _source_url(self, url: str) -> str:
+        if self.origin is None:
+            return url
+        parts = urlsplit(url)
+        return urlunsplit((self.origin.scheme, self.origin.netloc, parts.path, parts.query, ""))
+
+    # --- disk side (run in threads) ---
+
+    def lookup(self, url: str, variant: str):
+        """The cached image for (url, variant), or None."""
+        try:
+            name = self._ref_path(url, variant).read_text().strip()
+            blob = self._blob_path(name)
+            data = blob.read_bytes()
+            stat = blob.stat()
+        except OSError:
+            return None
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(blob)
+            except OSError:
+                pass
+        return _cached(name, data)
+
+    def store(self, url: str, variant: str, data: bytes, content_type: str) -> CachedImage:
+        ext = EXTENSIONS.get(content_type.split(";")[0].strip(), "bin")
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        blob = self._blob_path(name)
+        if not blob.exists():
+            _write_atomic(blob, data)
+            self._account(len(data))
+        _write_atomic(self._ref_path(url, variant), name.encode())
+        return _cached(name, data)
+
+    def disk_bytes(self) -> int:
+        return sum(p.stat().st_size for p in (self.root / "blobs").glob("*/*") if p.is_file())
+
+    def _account(self, added: int):
+        with self._evict_lock:
+            if self._bytes is None:
+                self._bytes = self.disk_bytes()
+            else:
+                self._bytes += added
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self, target: float = 0.9):
+        """Delete least recently served blobs until they fit `target` x the budget."""
+        with self._evict_lock:
+            blobs = []
+            for path in (self.root / "blobs").glob("*/*"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in blobs)
+            # Refs to deleted blobs just become misses and are rewritten on refetch
+            for _, size, path in sorted(blobs):
+                if total <= self.max_bytes * target:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+            self._bytes = total
+
+    # --- network side ---
+
+    async def get(self, url: str, fmt: str = "jpeg") -> CachedImage:
+        """
+        Thumbnail of `url` as `fmt` (webp / jpeg), fetched and cached on a miss.
+        Raises ImageFetchError when the source can't be used.
+        """
+        variant = self.variant(fmt)
+        cached = await asyncio.to_thread(self.lookup, url, variant)
+        if cached is not None:
+            IMAGE_REQUESTS.inc("hit")
+            return cached
+
+        key = (url, variant)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fill(url, variant))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            image = await asyncio.shield(task)
+        except ImageFetchError:
+            IMAGE_REQUESTS.inc("error")
+            raise
+        IMAGE_REQUESTS.inc("miss")
+        return image
+
+    async def _fill(self, url: str, variant: str, source=None) -> CachedImage:
+        data, content_type = source or await self._fetch(url)
+        if variant != "original":
+            data, content_type = await asyncio.to_thread(
+                make_thumbnail, data, content_type, variant.rsplit(".", 1)[1], self.size
+            )
+        return await asyncio.to_thread(self.store, url, variant, data, content_type)
+
+    async def _warm_one(self, url: str, formats):
+        variants = dict.fromkeys(self.variant(fmt) for fmt in formats)
+        missing = [v for v in variants if await asyncio.to_thread(self.lookup, url, v) is None]
+        if missing:
+            # One fetch feeds every missing variant
+            source = await self._fetch(url)
+            for variant in missing:
+                await self._fill(url, variant, source)
+        return len(missing)
+
+    async def _fetch(self, url: str):
+        if not self.allowed(url):
+            raise ImageFetchError(f"{url!r} is not an http(s) URL on an allowed image host")
+        target = self._source_url(url)
+        async with self._slots:
+            try:
+                for _ in range(MAX_REDIRECTS + 1):
+                    # Connect to the address that was checked, so a second DNS
+                    # answer can't swap in an internal one (rebinding)
+                    address = await self._resolve(target)
+                    async with self._client.stream("GET", **_pinned(target, address)) as response:
+                        if response.is_redirect:
+                            location = str(httpx.URL(target).join(response.headers["location"]))
+                            if not self.allowed(location):
+                                raise ImageFetchError(f"{url} redirects off the allowed hosts")
+                            target = self._source_url(location)
+                            continue
+                        response.raise_for_status()
+                        return await _read_image(url, response)
+            except httpx.HTTPError as e:
+                raise ImageFetchError(f"{url}: {e}") from e
+        raise ImageFetchError(f"{url}: more than {MAX_REDIRECTS} redirects")
+
+    async def _resolve(self, url: str):
+        """
+        A public address for `url`'s host to connect to (None for IMAGE_ORIGIN).
+        Refuses hosts that resolve to any loopback, private or link-local address.
+        """
+        parts = urlsplit(url)
+        if self.origin is not None and parts.netloc == self.origin.netloc:
+            return None  # configured explicitly, usually a local stub
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                parts.hostname, port, type=socket.SOCK_STREAM
+            )
+        except OSError as e:
+            raise ImageFetchError(f"{parts.hostname}: {e}") from e
+        addresses = []
+        for *_, sockaddr in infos:
+            address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+            if address.version == 6 and address.ipv4_mapped:
+                address = address.ipv4_mapped
+            if not address.is_global or address.is_multicast:
+                raise ImageFetchError(f"{parts.hostname} resolves to non-public {address}")
+            addresses.append(address)
+        if not addresses:
+            raise ImageFetchError(f"{parts.hostname} has no addresses")
+        return addresses[0]
+
+    async def warm(self, urls, formats=("webp",), *, batch: int = 256):
+        """
+        Make sure every URL in `urls` is cached in every format, fetching
+        each source once. Returns {"fetched": n, "cached": n, "failed": n}
+        (cached: already there).
+        """
+        counts = {"fetched": 0, "cached": 0, "failed": 0}
+        urls = list(dict.fromkeys(urls))
+        for start in range(0, len(urls), batch):
+            results = await asyncio.gather(
+                *(self._warm_one(url, formats) for url in urls[start : start + batch]),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    if not isinstance(result, ImageFetchError):
+                        print(f"   ⚠ Caching an image failed: {result!r}")
+                    counts["failed"] += 1
+                else:
+                    counts["fetched" if result else "cached"] += 1
+        return counts
+
+    def stats(self) -> dict:
+        return {"bytes": self._bytes, "max_bytes": self.max_bytes, "variant": self.variant("webp")}
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def _pinned(url: str, address) -> dict:
+    """
+    Request arguments for GET `url` that connect to `address` while keeping
+    the URL's host for the Host header, TLS SNI and certificate checks.
+    """
+    if address is None:
+        return {"url": url}
+    original = httpx.URL(url)
+    return {
+        "url": original.copy_with(host=str(address)),
+        "headers": {"Host": original.netloc.decode("ascii")},
+        "extensions": {"sni_hostname": original.host} if original.scheme == "https" else {},
+    }
+
+
+def _cached(name: str, data: bytes) -> CachedImage:
+    digest, ext = name.rsplit(".", 1)
+    return CachedImage(data, CONTENT_TYPES.get(ext, "application/octet-stream"), f'"{digest[:32]}"')
+
+
+async def _read_image(url: str, response) -> tuple:
+    """(bytes, content type) of an image response, at most MAX_SOURCE_BYTES."""
+    content_type = response.headers.get("content-type", "")
+    if not content_type.startswith("image/"):
+        raise ImageFetchError(f"{url} is {content_type or 'untyped'}, not an image")
+    length = response.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_SOURCE_BYTES:
+        raise ImageFetchError(f"{url} is larger than {MAX_SOURCE_BYTES} bytes")
+    chunks, total = [], 0
+    async for chunk in response.aiter_bytes():
+        total += len(chunk)
+        if total > MAX_SOURCE_BYTES:
+            raise ImageFetchError(f"{url} is larger than {MAX_SOURCE_BYTES} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks), content_type.split(";")[0].strip()
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    args = list(argv if argv is not None else sys.argv[1:])
+    if not args or args[0] != "warm":
+        print(__doc__)
+        return
+
+    from catalog import read_catalog
+    from index_store import MEDIA_FILES, available_catalogs
+    from recommender import PLACEHOLDER_IMAGE
+
+    args = args[1:]
+    limit = None
+    if "--limit" in args:
+        pos = args.index("--limit")
+        limit = int(args[pos + 1])
+        del args[pos : pos + 2]
+    formats = ("webp",)
+    if "--format" in args:
+        pos = args.index("--format")
+        formats = FORMATS if args[pos + 1] == "both" else (args[pos + 1],)
+        del args[pos : pos + 2]
+
+    catalogs = available_catalogs()
+    urls = []
+    for media in args or list(MEDIA_FILES):
+        if media not in catalogs:
+            print(f"   ⚠ Skipping {media}, file not found")
+            continue
+        column = read_catalog(catalogs[media], ["image_url"])["image_url"]
+        urls.extend(column.fillna(PLACEHOLDER_IMAGE).astype(str).tolist()[:limit])
+
+    async def run():
+        cache = ImageCache()
+        try:
+            return await cache.warm(urls, formats)
+        finally:
+            await cache.aclose()
+
+    start = time.perf_counter()
+    counts = asyncio.run(run())
+    print(f"✅ {counts['fetched']} fetched, {counts['cached']} already cached, "
+          f"{counts['failed']} failed "
+          f"({time.perf_counter() - start:.1f}s) in {IMAGE_CACHE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Incremental engine updates.
+
+New or changed titles (matched on `item_id`) are folded into a loaded Engine
+without refitting TF-IDF: rows are transformed with the engine's frozen
+vectorizer and written into copies of the matrix, title index, response
+columns, embeddings and ANN lists. Only items whose neighbour lists can have
+changed are re-scored. The input Engine is never mutated, so requests that
+already hold it keep a consistent snapshot; the caller swaps the result in.
+
+IDF weights stay as fitted; the periodic `python index_store.py` rebuild
+(a full refit) corrects any drift.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from catalog import CATALOG_COLUMNS, read_catalog, write_catalog
+from inverted_index import InvertedIndex
+from recommender import (
+    Engine,
+    NeighbourTable,
+    compact_matrix,
+    neighbours_for_rows,
+    prepare_items,
+)
+
+def assign_rows(engine: Engine, item_ids) -> np.ndarray:
+    """Existing row for known ids; fresh rows (in order) past the end for new ones."""
+    row_of = engine.columns.row_of
+    next_row = engine.matrix.shape[0]
+    rows = []
+    for item_id in item_ids:
+        row = row_of.get(int(item_id))
+        if row is None:
+            row, next_row = next_row, next_row + 1
+        rows.append(row)
+    return np.asarray(rows, dtype=np.int64)
+
+
+def _update_matrix(matrix, rows, vectors):
+    n_old = matrix.shape[0]
+    stacked = sp.vstack([matrix, vectors.astype(matrix.dtype)], format="csr")
+    if (rows >= n_old).all():
+        return stacked
+
+    # Point each updated row at its freshly transformed copy at the bottom
+    perm = np.arange(max(n_old, int(rows.max()) + 1))
+    perm[rows] = n_old + np.arange(len(rows))
+    updated = stacked[perm]
+    updated.sort_indices()
+    return updated
+
+
+def _update_items(items: pd.DataFrame, rows, updates: pd.DataFrame) -> pd.DataFrame:
+    n_old = len(items)
+    changed = rows < n_old
+    updates = updates.reindex(columns=items.columns)
+
+    result = items.copy()
+    if changed.any():
+        for col in items.columns:
+            result.loc[result.index[rows[changed]], col] = updates.loc[changed, col].to_numpy()
+    if (~changed).any():
+        result = pd.concat([result, updates.loc[~changed]], ignore_index=True)
+    return result
+
+
+def update_neighbours(table: NeighbourTable, matrix, rows, n_old: int,
+                      block_size: int = 512) -> NeighbourTable:
+    """
+    Neighbour table for `matrix` after `rows` were added or changed.
+
+    - updated rows, and rows whose list referenced a changed item, are
+      re-scored in full;
+    - every other row can only gain updated items, so their scores are
+      merged into the existing list when they beat its current K-th entry.
+    """
+    k = table.k
+    n = matrix.shape[0]
+    ids = np.zeros((n, k), dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    ids[:n_old] = table.ids
+    scores[:n_old] = table.scores
+
+    changed = rows[rows < n_old]
+    stale = np.flatnonzero(np.isin(table.ids, changed).any(axis=1)) if len(changed) else []
+    recompute = np.union1d(rows, stale).astype(np.int64)
+
+    # Scores of every row against the updated rows (n x u, u is small)
+    sims = (matrix @ matrix[rows].T).toarray().astype(np.float32)
+    sims[rows, np.arange(len(rows))] = -np.inf
+    merge = np.setdiff1d(np.flatnonzero((sims > scores[:, -1:]).any(axis=1)), recompute)
+    for r in merge:
+        cand_ids = np.concatenate([ids[r], rows.astype(np.int32)])
+        cand_scores = np.concatenate([scores[r], sims[r]])
+        best = np.lexsort((cand_ids, -cand_scores))[:k]
+        ids[r], scores[r] = cand_ids[best], cand_scores[best]
+
+    if len(recompute):
+        ids[recompute], scores[recompute] = neighbours_for_rows(
+            matrix, recompute, k=k, block_size=block_size
+        )
+    return NeighbourTable(ids, scores)
+
+
+def _fill_from_existing(items: pd.DataFrame, updates: pd.DataFrame) -> pd.DataFrame:
+    """For known item_ids, fields left out of an update keep their current values."""
+    updates = updates.copy()
+    known = items.drop_duplicates("item_id").set_index("item_id")
+    for col in CATALOG_COLUMNS[1:]:
+        if col not in known.columns:
+            continue
+        if col not in updates.columns:
+            updates[col] = None
+        missing = updates[col].isna()
+        updates.loc[missing, col] = updates.loc[missing, "item_id"].map(known[col])
+    return updates
+
+
+def apply_updates(engine: Engine, updates: pd.DataFrame) -> Engine:
+    """
+    Return a new Engine with `updates` (rows with item_id, title, genres,
+    description, image_url) upserted by item_id.
+    """
+    updates = updates.drop_duplicates("item_id", keep="last").reset_index(drop=True)
+    updates = prepare_items(_fill_from_existing(engine.items, updates))
+    if updates.empty:
+        return engine
+
+    n_old = engine.matrix.shape[0]
+    rows = assign_rows(engine, updates["item_id"])
+    vectors = compact_matrix(
+        engine.tfidf.transform(updates["content"]),
+        prune_terms=getattr(engine.tfidf, "prune_terms", 0),
+        dtype=engine.matrix.dtype,
+    )
+    matrix = _update_matrix(engine.matrix, rows, vectors)
+
+    neighbours = engine.neighbours
+    if neighbours is not None:
+        neighbours = update_neighbours(neighbours, matrix, rows, n_old)
+
+    embeddings = engine.embeddings
+    if embeddings is not None and not embeddings.can_encode:
+        print(f"   ⚠ Embedding model {embeddings.model_name!r} is not available; "
+              "embedding engine disabled until the index is rebuilt")
+        embeddings = None
+    elif embeddings is not None:
+        embeddings = embeddings.with_updates(
+            rows, embeddings.embedder.encode(updates["content"].tolist())
+        )
+
+    ann = engine.ann.with_updates(rows, vectors) if engine.ann is not None else None
+    genres = engine.genres
+    if genres is not None:
+        genres = genres.with_updates(rows, updates["genres"])
+    # Posting lists are column-major, so an upsert rebuilds them (O(nnz))
+    inverted = InvertedIndex.from_matrix(matrix) if engine.inverted is not None else None
+
+    return Engine(
+        items=_update_items(engine.items, rows, updates),
+        tfidf=engine.tfidf,
+        matrix=matrix,
+        titles=engine.titles.with_updates(dict(zip(rows.tolist(), updates["title"]))),
+        columns=engine.columns.with_updates(rows, updates),
+        neighbours=neighbours,
+        embeddings=embeddings,
+        ann=ann,
+        genres=genres,
+        inverted=inverted,
+    )
+
+
+def fill_from_catalog(path: Path, updates: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fill fields an update leaves out from the item's row in the source catalog
+    (serving engines don't keep descriptions in memory).
+    """
+    path = Path(path)
+    if not path.exists():
+        return updates
+    return _fill_from_existing(read_catalog(path, CATALOG_COLUMNS), updates)
+
+
+def persist_items(path: Path, updates: pd.DataFrame):
+    """
+    Upsert `updates` into the source catalog by item_id and atomically replace
+    it. Its hash changes, so the next index build / startup does a full refit.
+    """
+    path = Path(path)
+    current = read_catalog(path) if path.exists() else pd.DataFrame(columns=CATALOG_COLUMNS)
+    columns = [c for c in CATALOG_COLUMNS if c in current.columns or c in updates.columns]
+    updates = updates.reindex(columns=columns)
+
+    merged = current.reindex(columns=columns).set_index("item_id")
+    fresh = updates.set_index("item_id")
+    known = fresh.index.isin(merged.index)
+    merged.update(fresh[known])
+    merged = pd.concat([merged, fresh[~known]]).reset_index()
+    write_catalog(merged, path)
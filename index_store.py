@@ -0,0 +1,639 @@
+"""
+Persisted TF-IDF engine artifacts.
+
+An offline build step writes, per media type, everything the API needs to
+serve recommendations:
+
+    data/index/<media>/<catalog_sha256[:16]>/
+        manifest.json     format version, source hash, shapes
+        vocabulary.json   feature names ordered by column
+        stop_words.json   stop words used by the analyzer
+        idf.npy           IDF weight per feature
+        data.npy          CSR values (float32, optionally pruned per row)
+        indices.npy       CSR column indices
+        indptr.npy        CSR row pointers
+        postings_*.npy    the same matrix as CSC posting lists (+ per-term max weight)
+                          for inverted-index text queries
+        items.pkl         serving item metadata (no description / content text)
+        fragments.bin     pre-rendered response JSON per item, concatenated
+        fragment_offsets.npy  item i's fragment is fragments.bin[offsets[i]:offsets[i+1]]
+        neighbours.npy    top-K neighbour row ids per item (int32)
+        neighbour_scores.npy  matching cosine scores (float32)
+        embeddings.npy    quantized dense item embeddings (int8 or float16)
+        embedding_scales.npy  per-row int8 scales
+        ann_*.npy         IVF index (large catalogs or --ann only)
+
+The arrays are opened with ``np.load(mmap_mode="r")`` so every uvicorn worker
+on a host shares the same page-cache copy instead of refitting its own
+(serve.py goes further and forks its workers from one loaded process).
+A directory is only reused while the hash of its source catalog and the build
+options (neighbours, embeddings, ANN, pruning) still match; otherwise it is
+rebuilt.
+
+Usage:
+    python index_store.py                # build anime, manga and manhwa
+    python index_store.py anime manga    # build selected media types
+    python index_store.py --neighbours 100   # keep 100 neighbours per item
+    python index_store.py --no-embeddings    # skip the dense embedding engine
+    python index_store.py --ann              # build the IVF ANN index regardless of size
+    python index_store.py --unified          # also build the shared-vocabulary index
+    python index_store.py --prune-terms 64   # keep each item's 64 heaviest terms
+    python index_store.py --stream --workers 4   # out-of-core build, chunk by chunk
+                                                 # (--chunk-size N rows; no ANN index
+                                                 #  unless --ann; see stream_build.py)
+
+The shared-vocabulary index (data/index/all/) stacks every catalog into one
+matrix with per-media row ranges; it serves cross-media `target_media` queries.
+
+ANN_NPROBE overrides the stored number of IVF clusters probed per query.
+"""
+
+import hashlib
+import json
+import mmap as mmap_module
+import os
+import re
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+import ann_index
+from ann_index import IVFIndex, build_tfidf_ann
+from catalog import CATALOG_COLUMNS, catalog_path
+from embeddings import EmbeddingIndex
+from genre_index import GenreIndex
+from inverted_index import InvertedIndex
+from recommender import (
+    Engine,
+    NeighbourTable,
+    build_embedding_matrix,
+    build_neighbour_table,
+    build_tfidf_matrix,
+    compact_matrix,
+    load_items,
+    serving_items,
+)
+from serialization import FragmentTable, ItemColumns
+from title_index import TitleIndex
+
+FORMAT_VERSION = 6
+NEIGHBOURS_K = 50
+
+DATA_DIR = Path(__file__).parent / "data"
+INDEX_DIR = DATA_DIR / "index"
+# Media type -> catalog file stem (data/<stem>.parquet, or a legacy .csv)
+MEDIA_FILES = {
+    "anime": "anime",
+    "manga": "manga",
+    "manhwa": "manhwa",
+}
+# Index name of the cross-media engine (one vocabulary over every MEDIA_FILES catalog)
+UNIFIED_MEDIA = "all"
+
+_ARRAYS = ("data", "indices", "indptr")
+_POSTINGS = ("indptr", "rows", "weights", "max_weight")
+
+
+class FrozenVectorizer:
+    """
+    Query-time replacement for a fitted TfidfVectorizer.
+
+    Rebuilt from the saved vocabulary, IDF weights and stop words, and
+    reproduces the default scikit-learn analyzer (lowercase, word tokens of
+    2+ chars, stop-word removal, word n-grams, raw counts * idf, L2 norm).
+    """
+
+    token_pattern = re.compile(r"(?u)\b\w\w+\b")
+
+    def __init__(self, vocabulary, idf, stop_words=(), ngram_range=(1, 2), prune_terms=0):
+        if isinstance(vocabulary, dict):
+            self.vocabulary_ = vocabulary
+        else:
+            self.vocabulary_ = {term: i for i, term in enumerate(vocabulary)}
+        self.idf_ = np.asarray(idf)
+        self.stop_words = frozenset(stop_words)
+        self.ngram_range = tuple(ngram_range)
+        # Per-row term budget the indexed items were pruned to (0 = none)
+        self.prune_terms = int(prune_terms)
+
+    def analyze(self, text: str) -> list:
+        tokens = [
+            t
+            for t in self.token_pattern.findall(str(text).lower())
+            if t not in self.stop_words
+        ]
+        lo, hi = self.ngram_range
+        terms = []
+        for n in range(lo, hi + 1):
+            terms.extend(" ".join(tokens[i : i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, texts) -> csr_matrix:
+        data, indices, indptr = [], [], [0]
+        vocab = self.vocabulary_
+        for text in texts:
+            counts = {}
+            for term in self.analyze(text):
+                col = vocab.get(term)
+                if col is not None:
+                    counts[col] = counts.get(col, 0) + 1
+
+            cols = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+            vals = np.array([counts[c] for c in cols], dtype=np.float64) * self.idf_[cols]
+            norm = np.sqrt(np.dot(vals, vals))
+            if norm > 0:
+                vals /= norm
+
+            indices.append(cols)
+            data.append(vals)
+            indptr.append(indptr[-1] + len(cols))
+
+        return csr_matrix(
+            (
+                np.concatenate(data) if data else np.zeros(0),
+                np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+                np.asarray(indptr, dtype=np.int32),
+            ),
+            shape=(len(indptr) - 1, len(self.idf_)),
+        )
+
+
+def catalog_fingerprint(path: Path) -> str:
+    """SHA-256 of the raw catalog file bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def index_dir_for(media: str, fingerprint: str, index_dir: Path = INDEX_DIR) -> Path:
+    return Path(index_dir) / media / fingerprint[:16]
+
+
+def build_index(
+    media: str,
+    path: Path,
+    index_dir: Path = INDEX_DIR,
+    *,
+    neighbours_k: int = NEIGHBOURS_K,
+    embeddings: bool = True,
+    embedding_model: str = None,
+    ann: bool = None,
+    prune_terms: int = 0,
+    rebuild: bool = False,
+) -> Path:
+    """
+    Fit TF-IDF on one catalog and write the artifacts for it, including the
+    top-`neighbours_k` neighbour table (0 disables it) and, optionally,
+    quantized dense embeddings. The ANN index is built when `ann` is True,
+    or by default once the catalog reaches ann_index.ANN_MIN_ITEMS.
+    `prune_terms` > 0 keeps only each item's top-weighted terms.
+    A valid index already built for this catalog is kept unless `rebuild`.
+    Returns the directory holding the index.
+    """
+    path = Path(path)
+    fingerprint = catalog_fingerprint(path)
+    target = index_dir_for(media, fingerprint, index_dir)
+    source = {
+        "source": path.name,
+        "source_sha256": fingerprint,
+        "build_options": _build_options(neighbours_k=neighbours_k, embeddings=embeddings,
+                                        embedding_model=embedding_model, ann=ann,
+                                        prune_terms=prune_terms),
+    }
+    if _reuse_existing(target, source, rebuild):
+        return target
+    return _write_index(
+        media,
+        load_items(path, CATALOG_COLUMNS),
+        target,
+        source,
+        neighbours_k=neighbours_k,
+        embeddings=embeddings,
+        embedding_model=embedding_model,
+        ann=ann,
+        prune_terms=prune_terms,
+        rebuild=rebuild,
+    )
+
+
+def media_catalog(media: str, data_dir: Path = DATA_DIR) -> Path:
+    """Catalog file of a MEDIA_FILES media type (Parquet, else CSV)."""
+    return catalog_path(data_dir, MEDIA_FILES[media])
+
+
+def available_catalogs(data_dir: Path = DATA_DIR) -> Dict[str, Path]:
+    """{media: catalog path} for every catalog present on disk, in MEDIA_FILES order."""
+    paths = {media: media_catalog(media, data_dir) for media in MEDIA_FILES}
+    return {media: path for media, path in paths.items() if path.exists()}
+
+
+def unified_fingerprint(paths: Dict[str, Path]) -> str:
+    """Hash over every member catalog's hash, so any changed catalog forces a rebuild."""
+    digest = hashlib.sha256()
+    for media, path in paths.items():
+        digest.update(f"{media}:{catalog_fingerprint(path)}\n".encode())
+    return digest.hexdigest()
+
+
+def build_unified_index(paths: Dict[str, Path], index_dir: Path = INDEX_DIR, *,
+                        ann: bool = None, prune_terms: int = 0, rebuild: bool = False) -> Path:
+    """
+    Fit one TF-IDF over several catalogs (one shared vocabulary) and write
+    them as a single stacked matrix under `data/index/all/`. The manifest's
+    `ranges` maps each media type to its [start, stop) rows, in `paths` order.
+    """
+    fingerprint = unified_fingerprint(paths)
+    target = index_dir_for(UNIFIED_MEDIA, fingerprint, index_dir)
+    source = {
+        "sources": {media: Path(path).name for media, path in paths.items()},
+        "source_sha256": fingerprint,
+        "build_options": _build_options(ann=ann, prune_terms=prune_terms),
+    }
+    if _reuse_existing(target, source, rebuild):
+        return target
+
+    frames, ranges = [], {}
+    start = 0
+    for media, path in paths.items():
+        items = load_items(path, CATALOG_COLUMNS)
+        items["media_type"] = media
+        frames.append(items)
+        ranges[media] = [start, start + len(items)]
+        start += len(items)
+
+    return _write_index(
+        UNIFIED_MEDIA,
+        pd.concat(frames, ignore_index=True),
+        target,
+        {**source, "ranges": ranges},
+        neighbours_k=0,
+        embeddings=False,
+        ann=ann,
+        prune_terms=prune_terms,
+        rebuild=rebuild,
+    )
+
+
+def _build_options(*, neighbours_k: int = 0, embeddings: bool = False,
+                   embedding_model: str = None, ann: bool = None, prune_terms: int = 0) -> dict:
+    """Build settings recorded in the manifest; an index is only reused for the same ones."""
+    return {
+        "neighbours_k": int(neighbours_k),
+        "embeddings": bool(embeddings),
+        "embedding_model": embedding_model if embeddings else None,
+        "ann": ann,
+        "prune_terms": int(prune_terms),
+    }
+
+
+def _reuse_existing(target: Path, source: dict, rebuild: bool = False) -> bool:
+    """
+    Whether `target` already holds a valid index of the same catalog built
+    with the same options (see _build_options). Checked before fitting, and
+    again in _finish_index in case another process finished first.
+    """
+    if rebuild:
+        return False
+    existing = read_manifest(target)
+    if (existing is None or existing.get("source_sha256") != source["source_sha256"]
+            or existing.get("build_options") != source["build_options"]):
+        return False
+    _prune_stale(target)
+    return True
+
+
+def _write_index(media: str, items: pd.DataFrame, target: Path, source: dict, *,
+                 neighbours_k: int, embeddings: bool, embedding_model: str = None,
+                 ann: bool = None, prune_terms: int = 0, rebuild: bool = False) -> Path:
+    tfidf, matrix = build_tfidf_matrix(items)
+    # Everything below (neighbours, ANN) is derived from the matrix as served
+    matrix = compact_matrix(matrix, prune_terms=prune_terms)
+
+    tmp = _staging_dir(target)
+    for name in _ARRAYS:
+        np.save(tmp / f"{name}.npy", getattr(matrix, name))
+    inverted = InvertedIndex.from_matrix(matrix)
+    for name in _POSTINGS:
+        np.save(tmp / f"postings_{name}.npy", getattr(inverted, name))
+    _save_vectorizer(
+        tmp, tfidf.get_feature_names_out().tolist(), tfidf.idf_, tfidf.get_stop_words()
+    )
+
+    embedding_meta = None
+    if embeddings:
+        _, index = build_embedding_matrix(items, model=embedding_model)
+        np.save(tmp / "embeddings.npy", index.codes)
+        if index.scales is not None:
+            np.save(tmp / "embedding_scales.npy", index.scales)
+        embedding_meta = {"model": index.model_name, "dtype": index.dtype}
+
+    return _finish_index(
+        media, tmp, target, source, matrix, serving_items(items),
+        ngram_range=tfidf.ngram_range, neighbours_k=neighbours_k,
+        embedding_meta=embedding_meta, ann=ann, prune_terms=prune_terms, rebuild=rebuild,
+    )
+
+
+def _staging_dir(target: Path) -> Path:
+    """
+    A fresh private temp dir next to `target`. Builds write there and
+    _finish_index renames it into place, so concurrent builders (e.g. several
+    workers booting at once) never see partial files.
+    """
+    tmp = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    return tmp
+
+
+def _save_vectorizer(tmp: Path, vocabulary, idf, stop_words):
+    np.save(tmp / "idf.npy", idf)
+    with open(tmp / "vocabulary.json", "w", encoding="utf-8") as fh:
+        json.dump(list(vocabulary), fh, ensure_ascii=False)
+    with open(tmp / "stop_words.json", "w", encoding="utf-8") as fh:
+        json.dump(sorted(stop_words or ()), fh)
+
+
+def _finish_index(media: str, tmp: Path, target: Path, source: dict, matrix, slim: pd.DataFrame,
+                  *, ngram_range, neighbours_k: int, embedding_meta: dict = None,
+                  ann: bool = None, prune_terms: int = 0, rebuild: bool = False) -> Path:
+    """
+    Write the artifacts derived from the served matrix and item table into
+    `tmp` (which already holds the matrix, postings, vectorizer and
+    embeddings), then the manifest, and move it into place as `target`.
+    If another builder already put a valid index for the same catalog hash
+    and build options there, that one is kept (other processes may be
+    loading it) unless `rebuild` asks to replace it.
+    """
+    slim.to_pickle(tmp / "items.pkl")
+    fragments = FragmentTable.pack(ItemColumns(slim).fragments)
+    (tmp / "fragments.bin").write_bytes(fragments.blob)
+    np.save(tmp / "fragment_offsets.npy", fragments.offsets)
+
+    if neighbours_k > 0:
+        # The posting lists in `tmp` are the transposed matrix; mapping them
+        # keeps neighbour scoring to one bounded block in memory at a time
+        postings = {name: np.load(tmp / f"postings_{name}.npy", mmap_mode="r")
+                    for name in ("indptr", "rows", "weights")}
+        matrix_t = csr_matrix(
+            (postings["weights"], postings["rows"], postings["indptr"]),
+            shape=(matrix.shape[1], matrix.shape[0]), copy=False,
+        )
+        table = build_neighbour_table(matrix, k=neighbours_k, matrix_t=matrix_t)
+        np.save(tmp / "neighbours.npy", table.ids)
+        np.save(tmp / "neighbour_scores.npy", table.scores)
+
+    ann_meta = None
+    if ann or (ann is None and matrix.shape[0] >= ann_index.ANN_MIN_ITEMS):
+        ivf = build_tfidf_ann(matrix)
+        for name in ("centroids", "offsets", "rows", "projection"):
+            np.save(tmp / f"ann_{name}.npy", getattr(ivf, name))
+        ann_meta = {"n_lists": ivf.n_lists, "nprobe": ivf.nprobe}
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "media": media,
+        **source,
+        "n_items": int(matrix.shape[0]),
+        "n_features": int(matrix.shape[1]),
+        "ngram_range": list(ngram_range),
+        "dtype": str(matrix.dtype),
+        "prune_terms": int(prune_terms),
+        "neighbours_k": int(min(neighbours_k, matrix.shape[0] - 1)) if neighbours_k > 0 else 0,
+        "embedding": embedding_meta,
+        "ann": ann_meta,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(tmp / "manifest.json", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+
+    if _reuse_existing(target, source, rebuild):
+        # Another process finished the same build first; keep theirs.
+        shutil.rmtree(tmp, ignore_errors=True)
+        return target
+
+    # An explicit rebuild (or a stale / broken target) replaces what is there;
+    # processes that already mapped the old files keep reading them.
+    retired = target.with_name(f"{target.name}.old-{os.getpid()}")
+    if target.exists():
+        try:
+            target.rename(retired)
+        except OSError:
+            pass
+    try:
+        tmp.rename(target)
+    except OSError:
+        # Another process moved its build in between; keep theirs.
+        shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(retired, ignore_errors=True)
+
+    _prune_stale(target)
+    return target
+
+
+def _prune_stale(keep: Path):
+    for sibling in keep.parent.iterdir():
+        if sibling != keep and ".tmp-" not in sibling.name:
+            shutil.rmtree(sibling, ignore_errors=True)
+
+
+def read_manifest(path: Path):
+    try:
+        with open(Path(path) / "manifest.json", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _read_blob(path: Path, *, mmap: bool = True):
+    """Raw file contents, memory-mapped read-only unless `mmap` is off or the file is empty."""
+    with open(path, "rb") as fh:
+        if mmap and os.fstat(fh.fileno()).st_size:
+            return mmap_module.mmap(fh.fileno(), 0, access=mmap_module.ACCESS_READ)
+        return fh.read()
+
+
+def load_index(path: Path, *, mmap: bool = True):
+    """
+    Open a built index directory.
+    Returns an Engine with the matrix arrays memory-mapped and the
+    title index / response columns built.
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"No valid index at {path}")
+
+    mode = "r" if mmap else None
+    data, indices, indptr = (np.load(path / f"{name}.npy", mmap_mode=mode) for name in _ARRAYS)
+    matrix = csr_matrix(
+        (data, indices, indptr),
+        shape=(manifest["n_items"], manifest["n_features"]),
+        copy=False,
+    )
+    # Written sorted and deduplicated by build_index; saying so up front stops
+    # scipy from trying to canonicalize read-only mapped buffers in place.
+    matrix.has_sorted_indices = True
+    matrix.has_canonical_format = True
+
+    with open(path / "vocabulary.json", encoding="utf-8") as fh:
+        vocabulary = json.load(fh)
+    with open(path / "stop_words.json", encoding="utf-8") as fh:
+        stop_words = json.load(fh)
+    vectorizer = FrozenVectorizer(
+        vocabulary,
+        np.load(path / "idf.npy"),
+        stop_words=stop_words,
+        ngram_range=manifest["ngram_range"],
+        prune_terms=manifest.get("prune_terms", 0),
+    )
+
+    neighbours = None
+    if manifest.get("neighbours_k"):
+        neighbours = NeighbourTable(
+            np.load(path / "neighbours.npy", mmap_mode=mode),
+            np.load(path / "neighbour_scores.npy", mmap_mode=mode),
+        )
+
+    embeddings = None
+    if manifest.get("embedding"):
+        scales_path = path / "embedding_scales.npy"
+        embeddings = EmbeddingIndex(
+            np.load(path / "embeddings.npy", mmap_mode=mode),
+            np.load(scales_path, mmap_mode=mode) if scales_path.exists() else None,
+            model_name=manifest["embedding"]["model"],
+        )
+        if not embeddings.load_embedder():
+            print(f"   ⚠ {path}: embedding model {embeddings.model_name!r} is not available; "
+                  "text queries on the embedding engine fall back to TF-IDF")
+
+    ann = None
+    if manifest.get("ann"):
+        ann = IVFIndex(
+            *(np.load(path / f"ann_{name}.npy", mmap_mode=mode)
+              for name in ("centroids", "offsets", "rows", "projection")),
+            nprobe=int(os.environ.get("ANN_NPROBE", manifest["ann"]["nprobe"])),
+        )
+
+    inverted = InvertedIndex(
+        *(np.load(path / f"postings_{name}.npy", mmap_mode=mode) for name in _POSTINGS),
+        n_rows=manifest["n_items"],
+    )
+
+    ranges = None
+    if manifest.get("ranges"):
+        ranges = {media: tuple(rows) for media, rows in manifest["ranges"].items()}
+
+    items = pd.read_pickle(path / "items.pkl")
+    fragments = FragmentTable(
+        _read_blob(path / "fragments.bin", mmap=mmap),
+        np.load(path / "fragment_offsets.npy", mmap_mode=mode),
+    )
+    return Engine(
+        items,
+        vectorizer,
+        matrix,
+        TitleIndex(items["title"]),
+        ItemColumns(items, fragments),
+        neighbours,
+        embeddings,
+        ann,
+        ranges,
+        GenreIndex.build(items["genres"].tolist()),
+        inverted,
+    )
+
+
+def load_or_build(media: str, path: Path, index_dir: Path = INDEX_DIR):
+    """
+    Load the index for `path`, building it first if it is missing
+    or was built from a different version of the catalog.
+    """
+    target = index_dir_for(media, catalog_fingerprint(path), index_dir)
+    if read_manifest(target) is None:
+        print(f"   🔨 Building {media} index from {path}...")
+        target = build_index(media, path, index_dir)
+    return load_index(target)
+
+
+def load_or_build_unified(paths: Dict[str, Path], index_dir: Path = INDEX_DIR):
+    """Shared-vocabulary engine over `paths` ({media: catalog}), rebuilt when any changed."""
+    target = index_dir_for(UNIFIED_MEDIA, unified_fingerprint(paths), index_dir)
+    if read_manifest(target) is None:
+        print(f"   🔨 Building shared-vocabulary index for {', '.join(paths)}...")
+        target = build_unified_index(paths, index_dir)
+    return load_index(target)
+
+
+def _pop_int(args: list, flag: str, default: int) -> int:
+    """Remove `flag N` from `args` and return N (or `default` when absent)."""
+    if flag not in args:
+        return default
+    pos = args.index(flag)
+    value = int(args[pos + 1])
+    del args[pos : pos + 2]
+    return value
+
+
+def main(argv=None):
+    args = list(argv if argv is not None else sys.argv[1:])
+    neighbours_k = _pop_int(args, "--neighbours", NEIGHBOURS_K)
+    prune_terms = _pop_int(args, "--prune-terms", 0)
+    chunk_size = _pop_int(args, "--chunk-size", 0)
+    workers = _pop_int(args, "--workers", 1)
+    embeddings = "--no-embeddings" not in args
+    ann = True if "--ann" in args else None
+    unified = "--unified" in args
+    stream = "--stream" in args or chunk_size > 0
+    args = [a for a in args if a not in ("--no-embeddings", "--ann", "--unified", "--stream")]
+
+    paths = {}
+    for media in args or list(MEDIA_FILES):
+        if media not in MEDIA_FILES:
+            print(f"Unknown media type: {media}")
+            continue
+        path = media_catalog(media)
+        if not path.exists():
+            print(f"   ⚠ Skipping {media}, file not found: {path}")
+            continue
+        paths[media] = path
+
+    if stream:
+        from stream_build import CHUNK_SIZE, build_indexes_streaming
+
+        build_indexes_streaming(
+            paths, unified_paths=available_catalogs() if unified else None, workers=workers,
+            chunk_size=chunk_size or CHUNK_SIZE, neighbours_k=neighbours_k,
+            embeddings=embeddings, ann=ann, prune_terms=prune_terms, rebuild=True,
+        )
+        return
+
+    for media, path in paths.items():
+        start = time.perf_counter()
+        target = build_index(
+            media, path, neighbours_k=neighbours_k, embeddings=embeddings, ann=ann,
+            prune_terms=prune_terms, rebuild=True,
+        )
+        print(f"✅ {media}: {target} ({time.perf_counter() - start:.1f}s)")
+
+    if unified:
+        start = time.perf_counter()
+        target = build_unified_index(
+            available_catalogs(), ann=ann, prune_terms=prune_terms, rebuild=True
+        )
+        print(f"✅ {UNIFIED_MEDIA}: {target} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
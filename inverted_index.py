@@ -0,0 +1,132 @@
+"""
+Inverted-index top-k scoring for free-text queries.
+
+The TF-IDF matrix's CSC form is a set of posting lists: for every term, the
+rows containing it (ascending) and their weights. A query only has to visit
+the lists of its own terms instead of the whole matrix.
+
+Scoring is term-at-a-time in MaxScore order. Terms are visited by
+decreasing upper bound (query weight x largest posting weight). Once the
+current k-th best score beats the summed bounds of the terms still to come,
+no unseen row can reach the top k. The remaining lists are then only probed
+(binary search) for the surviving candidates, and candidates that can no
+longer reach the top k are dropped along the way. The result is the same
+top-k, with the same lower-row-first tie-breaking, as scoring every row.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+from recommender import top_k_indices
+
+# Slack on the bound comparisons so float rounding in the summation order
+# can never prune a row that exact scoring would have ranked
+_BOUND_SLACK = 1 + 1e-9
+
+
+class InvertedIndex:
+    """
+    Posting lists of a TF-IDF matrix.
+    Term t's rows are `rows[indptr[t]:indptr[t + 1]]` with matching
+    `weights`; `max_weight[t]` is the largest of them.
+    """
+
+    def __init__(self, indptr, rows, weights, max_weight, n_rows: int):
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.max_weight = max_weight
+        self.n_rows = int(n_rows)
+
+    @classmethod
+    def from_matrix(cls, matrix) -> "InvertedIndex":
+        csc = sp.csc_matrix(matrix)
+        csc.sort_indices()
+        return cls(csc.indptr, csc.indices, csc.data, term_max_weights(csc), csc.shape[0])
+
+    def search(self, query_vec, k: int, *, exclude=None, allowed=None):
+        """
+        Top-k (indices, scores) of the 1-row sparse `query_vec` against every
+        row, skipping `exclude` and rows outside the `allowed` mask.
+        """
+        terms = query_vec.indices
+        query_weights = np.asarray(query_vec.data, dtype=np.float64)
+        bounds = query_weights * self.max_weight[terms]
+        order = np.argsort(-bounds, kind="stable")
+        terms, query_weights, bounds = terms[order], query_weights[order], bounds[order]
+        # rest[i]: the most the terms from i onwards can add to any row's score
+        rest = np.append(np.cumsum(bounds[::-1])[::-1], 0.0) * _BOUND_SLACK
+
+        excluded = np.atleast_1d(exclude) if exclude is not None else None
+        cand_rows = np.empty(0, dtype=np.int64)
+        cand_scores = np.empty(0, dtype=np.float64)
+        threshold = -np.inf
+
+        # Essential terms (any of their rows could still reach the top k) are
+        # merged in doubling batches; pruning only needs to happen per batch.
+        i, batch = 0, 1
+        while i < len(terms) and rest[i] >= threshold:
+            stop = min(len(terms), i + batch)
+            rows, contrib = self._postings(terms[i:stop], query_weights[i:stop])
+            keep = None
+            if allowed is not None:
+                keep = allowed[rows]
+            if excluded is not None:
+                outside = ~np.isin(rows, excluded)
+                keep = outside if keep is None else keep & outside
+            if keep is not None:
+                rows, contrib = rows[keep], contrib[keep]
+
+            cand_rows, inverse = np.unique(np.concatenate([cand_rows, rows]), return_inverse=True)
+            cand_scores = np.bincount(
+                inverse, weights=np.concatenate([cand_scores, contrib]), minlength=len(cand_rows)
+            )
+            i, batch = stop, batch * 2
+
+            if len(cand_rows) >= k > 0:
+                threshold = np.partition(cand_scores, len(cand_scores) - k)[len(cand_scores) - k]
+                # Scores only grow, so the final k-th best is >= threshold
+                alive = cand_scores + rest[i] >= threshold
+                cand_rows, cand_scores = cand_rows[alive], cand_scores[alive]
+
+        if i < len(terms):
+            # The rest are non-essential: only add them to surviving candidates
+            rows, contrib = self._postings(terms[i:], query_weights[i:])
+            pos = np.searchsorted(cand_rows, rows)
+            hit = pos < len(cand_rows)
+            hit[hit] = cand_rows[pos[hit]] == rows[hit]
+            cand_scores += np.bincount(pos[hit], weights=contrib[hit], minlength=len(cand_rows))
+
+        # Candidates are in row order, so index ties break like full scoring
+        best = top_k_indices(cand_scores, k)
+        indices, scores = cand_rows[best], cand_scores[best]
+        if len(indices) < k:
+            # Fewer matching rows than k: pad with zero-score rows, lowest first
+            eligible = np.ones(self.n_rows, dtype=bool) if allowed is None else allowed.copy()
+            if excluded is not None:
+                eligible[excluded] = False
+            eligible[cand_rows] = False
+            fill = np.flatnonzero(eligible)[: k - len(indices)]
+            indices = np.concatenate([indices, fill])
+            scores = np.concatenate([scores, np.zeros(len(fill))])
+        return indices.astype(np.intp), scores
+
+
+    def _postings(self, terms, query_weights):
+        """Concatenated (rows, query_weight * weight) of the given terms' lists."""
+        spans = [(self.indptr[t], self.indptr[t + 1]) for t in terms.tolist()]
+        rows = np.concatenate([self.rows[a:b] for a, b in spans] or [np.empty(0, np.int32)])
+        contrib = np.concatenate(
+            [w * self.weights[a:b] for (a, b), w in zip(spans, query_weights)]
+            or [np.empty(0)]
+        )
+        return rows, contrib
+
+
+def term_max_weights(csc) -> np.ndarray:
+    """Largest posting weight of every column of a CSC matrix (0 for empty columns)."""
+    out = np.zeros(csc.shape[1], dtype=csc.data.dtype)
+    nonempty = np.flatnonzero(np.diff(csc.indptr) > 0)
+    if len(nonempty):
+        out[nonempty] = np.maximum.reduceat(csc.data, csc.indptr[nonempty])
+    return out
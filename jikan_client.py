@@ -0,0 +1,200 @@
+"""
+Async client for the Jikan (MyAnimeList) search API used by Live Web Mode.
+
+- one pooled httpx.AsyncClient per process (keep-alive connections)
+- TTL + LRU cache of lookups, including "no result" answers
+- concurrent identical lookups share a single upstream request
+- token-bucket limiter sized to Jikan's public limits (3 req/s, 60 req/min),
+  backing off on HTTP 429; lookups that would queue longer than
+  JIKAN_MAX_WAIT seconds for a token are skipped (None) instead of hanging
+
+Point it at a local stub with JIKAN_BASE_URL=http://127.0.0.1:<port>/v4.
+"""
+
+import asyncio
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+from cache import MISSING, TTLCache
+from metrics import UPSTREAM_ERRORS
+
+JIKAN_BASE_URL = os.environ.get("JIKAN_BASE_URL", "https://api.jikan.moe/v4")
+# Sustained requests/second to Jikan (raise it when pointing at a local stub)
+JIKAN_RATE = float(os.environ.get("JIKAN_RATE", "1.0"))
+# Longest a live lookup waits for a rate-limit token before giving up
+JIKAN_MAX_WAIT = float(os.environ.get("JIKAN_MAX_WAIT", "5.0"))
+
+
+def retry_after_seconds(value: Optional[str], default: float = 5.0) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts of up to `capacity`.
+    The default (1/s, burst 3) stays inside both of Jikan's limits.
+
+    Adaptive: `backoff()` (call on HTTP 429) pauses everyone for the
+    Retry-After period and halves the rate; `recover()` (call on success)
+    creeps it back toward the configured rate.
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: int = 3, clock=time.monotonic,
+                 min_rate: float = 0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, max_wait: float = None) -> bool:
+        """
+        Take one token, waiting for it as needed. With `max_wait`, returns
+        False instead of waiting longer than that in total (queue included).
+        """
+        deadline = None if max_wait is None else self.clock() + max_wait
+        try:
+            await asyncio.wait_for(self._lock.acquire(), max_wait)
+        except asyncio.TimeoutError:
+            return False
+        try:
+            while True:
+                now = self.clock()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._tokens = min(
+                        self.capacity, self._tokens + (now - self._updated) * self.rate
+                    )
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    delay = (1 - self._tokens) / self.rate
+                if deadline is not None and now + delay > deadline:
+                    return False
+                await asyncio.sleep(delay)
+        finally:
+            self._lock.release()
+
+    def backoff(self, retry_after: float = 5.0):
+        self._paused_until = max(self._paused_until, self.clock() + retry_after)
+        self._tokens = 0.0
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def recover(self):
+        self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+def _search_results(body) -> list:
+    """The `data` list of a search response; ValueError when the body has another shape."""
+    if not isinstance(body, dict):
+        raise ValueError(f"expected a JSON object, got {type(body).__name__}")
+    data = body.get("data") or []
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise ValueError("expected 'data' to be a list of objects")
+    return data
+
+
+class JikanClient:
+    """
+    Cached, rate-limited search against `/anime` or `/manga`.
+    `search()` returns the first result's raw JSON object, or None.
+    """
+
+    def __init__(
+        self,
+        base_url: str = JIKAN_BASE_URL,
+        *,
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        cache_size: int = 1024,
+        ttl: float = 6 * 3600.0,
+        negative_ttl: float = 600.0,
+        rate: float = JIKAN_RATE,
+        burst: int = 3,
+        max_wait: float = JIKAN_MAX_WAIT,
+        transport=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_wait = max_wait
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(maxsize=cache_size, ttl=ttl)
+        self.limiter = TokenBucket(rate=rate, capacity=burst)
+        self._inflight = {}
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            transport=transport,
+        )
+
+    @staticmethod
+    def cache_key(query: str, api_type: str):
+        return api_type, " ".join(query.lower().split())
+
+    async def search(self, query: str, api_type: str = "anime") -> Optional[dict]:
+        key = self.cache_key(query, api_type)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key) -> Optional[dict]:
+        api_type, query = key
+        if not await self.limiter.acquire(self.max_wait):
+            print(f"   ⚠ Jikan rate limit: no slot within {self.max_wait:.0f}s, skipping lookup")
+            UPSTREAM_ERRORS.inc("throttled")
+            return None
+        try:
+            response = await self._client.get(
+                f"{self.base_url}/{api_type}",
+                params={"q": query, "limit": 1},
+            )
+            if response.status_code == 429:
+                self.limiter.backoff(retry_after_seconds(response.headers.get("Retry-After")))
+            response.raise_for_status()
+            data = _search_results(response.json())
+        except (httpx.HTTPError, ValueError) as e:
+            # Upstream trouble is not an answer; don't cache it.
+            print(f"API Error: {e}")
+            UPSTREAM_ERRORS.inc(
+                "status" if isinstance(e, httpx.HTTPStatusError)
+                else "network" if isinstance(e, httpx.HTTPError)
+                else "decode"
+            )
+            return None
+
+        self.limiter.recover()
+        item = data[0] if data else None
+        self.cache.set(key, item, ttl=None if item is not None else self.negative_ttl)
+        return item
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -1,12 +1,7 @@
 from pathlib import Path
 
-from recommender import (
-    load_items,
-    build_tfidf_matrix,
-    resolve_title_to_index,
-    recommend_content,
-)
-
+# The engine modules (pandas / scipy) are imported once a dataset is picked,
+# so the menu shows up immediately.
 DATA_DIR = Path(__file__).parent / "data"
 
 
@@ -30,15 +25,15 @@ def choose_mode():
         print("Invalid choice, please try again.\n")
 
 
-def get_csv_for_mode(choice: str) -> Path:
-    if choice == "1":
-        return DATA_DIR / "anime.csv"
-    elif choice == "2":
-        return DATA_DIR / "manga.csv"
-    elif choice == "3":
-        return DATA_DIR / "manhwa.csv"
-    else:
+MODE_MEDIA = {"1": "anime", "2": "manga", "3": "manhwa"}
+
+
+def get_catalog_for_mode(choice: str) -> Path:
+    from catalog import catalog_path
+
+    if choice not in MODE_MEDIA:
         raise ValueError(f"Unknown mode: {choice}")
+    return catalog_path(DATA_DIR, MODE_MEDIA[choice])
 
 
 def choose_top_n(default: int = 5) -> int:
@@ -61,10 +56,13 @@ def choose_top_n(default: int = 5) -> int:
 # Core loop for one dataset
 # ----------------------------
 
-def run_recommender(csv_path: Path):
-    print(f"\nLoading dataset from: {csv_path} ...")
-    items = load_items(csv_path)
-    _, matrix = build_tfidf_matrix(items)
+def run_recommender(path: Path):
+    from index_store import load_or_build
+    from recommender import resolve_title_to_index, recommend_content
+
+    print(f"\nLoading dataset from: {path} ...")
+    engine = load_or_build(path.stem, path)
+    items, matrix, titles = engine.items, engine.matrix, engine.titles
 
     print(f"Loaded {len(items)} items.\n")
 
@@ -104,7 +102,7 @@ def run_recommender(csv_path: Path):
 
         # Case 2: treat as title query
         else:
-            idx, matched_title = resolve_title_to_index(items, raw)
+            idx, matched_title = resolve_title_to_index(items, raw, titles)
             if idx is None:
                 print("Could not find any title similar to that. Try again.")
                 continue
@@ -113,7 +111,9 @@ def run_recommender(csv_path: Path):
             print(f"Using best match: '{matched_title}' (item_id={item_id})")
 
         # Get recommendations
-        recs = recommend_content(items, matrix, item_index=idx, topn=topn)
+        recs = recommend_content(
+            items, matrix, item_index=idx, topn=topn, neighbours=engine.neighbours
+        )
 
         print(f"\nRecommendations for: {base_title} (item_id={item_id})")
         print("-" * 80)
@@ -131,8 +131,7 @@ def main():
             print("Goodbye!")
             break
 
-        csv_path = get_csv_for_mode(mode)
-        action = run_recommender(csv_path)
+        action = run_recommender(get_catalog_for_mode(mode))
 
         if action == "quit":
             print("Goodbye!")
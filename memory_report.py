@@ -0,0 +1,84 @@
+"""
+Memory / ranking-agreement report for the compact serving representation.
+
+For each catalog, compares the full float64 TF-IDF matrix and DataFrame
+(what a fresh fit produces) with the served form: a float32 matrix with
+int32 indices, optionally pruned to the top-N terms per item, and the slim
+item table without descriptions. Agreement is the mean overlap of each
+sampled item's top-k neighbours under the full vs compact matrix.
+
+    python memory_report.py                    # every catalog, prune 0 / 64 / 32
+    python memory_report.py anime --prune 0 16 --k 10
+"""
+
+import argparse
+
+import numpy as np
+
+from index_store import MEDIA_FILES, media_catalog
+from recommender import (
+    build_tfidf_matrix,
+    compact_matrix,
+    load_items,
+    serving_items,
+    top_k_indices,
+)
+
+
+def matrix_bytes(matrix) -> int:
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def frame_bytes(frame) -> int:
+    return int(frame.memory_usage(deep=True).sum())
+
+
+def agreement(full, compact, *, k: int = 10, n_queries: int = 200, seed: int = 0):
+    """(mean overlap@k, top-1 match rate) of compact vs full item-to-item rankings."""
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(full.shape[0], min(n_queries, full.shape[0]), replace=False)
+    full_scores = (full[queries] @ full.T).toarray()
+    compact_scores = (compact[queries] @ compact.T).toarray()
+
+    overlap = top1 = 0.0
+    for q, a, b in zip(queries, full_scores, compact_scores):
+        expected = top_k_indices(a, k, exclude=q)
+        found = top_k_indices(b, k, exclude=q)
+        overlap += len(set(expected.tolist()) & set(found.tolist())) / max(1, len(expected))
+        top1 += bool(len(found)) and found[0] == expected[0]
+    return overlap / len(queries), top1 / len(queries)
+
+
+def report(media: str, prunes=(0, 64, 32), k: int = 10):
+    items = load_items(media_catalog(media))
+    _, full = build_tfidf_matrix(items)
+    full = full.tocsr()
+
+    full_items, slim_items = frame_bytes(items), frame_bytes(serving_items(items))
+    print(f"\n{media}: {full.shape[0]} items x {full.shape[1]} features, nnz={full.nnz}")
+    print(f"  items table {full_items / 2**20:.2f} MB -> {slim_items / 2**20:.2f} MB (serving)")
+    print(f"  matrix {'float64':<16}{matrix_bytes(full) / 2**20:6.2f} MB")
+    for prune in prunes:
+        compact = compact_matrix(full, prune_terms=prune)
+        overlap, top1 = agreement(full, compact, k=k)
+        label = f"float32 top-{prune}" if prune else "float32"
+        print(f"  matrix {label:<16}{matrix_bytes(compact) / 2**20:6.2f} MB  "
+              f"overlap@{k}={overlap:.3f}  top1={top1:.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact index memory / agreement report.")
+    parser.add_argument("media", nargs="*", default=list(MEDIA_FILES))
+    parser.add_argument("--prune", type=int, nargs="+", default=[0, 64, 32])
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    for media in args.media:
+        if media not in MEDIA_FILES or not media_catalog(media).exists():
+            print(f"   ⚠ Skipping {media}, no catalog")
+            continue
+        report(media, args.prune, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Prometheus-format metrics and an opt-in sampling profiler.
+
+Counters and histograms are plain in-process objects rendered in the text
+exposition format by GET /metrics, so no client library is needed. Timing
+spans wrap the /recommend stages:
+
+    with span("score"):
+        ...
+
+METRICS=0 turns every span, counter and the request middleware into
+no-ops. PROFILE_SAMPLE_RATE=0.01 profiles 1% of requests with a stack
+sampler (every thread, so concurrent requests show up too) and writes
+collapsed stacks (flamegraph.pl / speedscope input) to PROFILE_DIR.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from pathlib import Path
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0") or 0)
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", "profiles"))
+PROFILE_INTERVAL = 0.001
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        # Snapshot under the lock: inc() may add label sets while we render
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labelnames + ("le",)
+        # Copy each series too, so its buckets, sum and count agree
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, labels + (f'{bound:g}',))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]:.6f}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}"
+
+
+class Registry:
+    """Metrics plus collectors: callables yielding (name, type, help, {labels: value})."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples.items():
+                    lines.append(f"{name}{_labels(*zip(*labels)) if labels else ''} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by endpoint function.",
+    ["handler", "status"],
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "recommend_stage_seconds",
+    "Time per /recommend stage (resolve, score, render, jikan, cache, engine_load).",
+    ["stage"],
+))
+BRANCH_TOTAL = REGISTRY.register(Counter(
+    "recommend_branch_total", "Which /recommend branch answered the query.", ["mode"]
+))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "jikan_errors_total", "Failed Jikan lookups.", ["kind"]
+))
+IMAGE_REQUESTS = REGISTRY.register(Counter(
+    "image_cache_requests_total", "Cover image lookups by result (hit, miss, error).", ["result"]
+))
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.stage)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    """Time a block into recommend_stage_seconds{stage=...}."""
+    return _Span(stage) if ENABLED else _NO_SPAN
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack every `interval` seconds until stopped."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = _Tally()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="profiler")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def write_collapsed(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+
+    def finish(self, path: Path):
+        """stop() and write_collapsed(path). Blocks; run it off the event loop."""
+        self.stop()
+        self.write_collapsed(path)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every request into http_request_duration_seconds,
+    and profiling a PROFILE_SAMPLE_RATE fraction of them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        profiler = None
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            profiler = SamplingProfiler().start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            # The router leaves the matched endpoint in the scope; its name
+            # keeps the label set small (unlike raw paths)
+            handler = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            REQUEST_SECONDS.observe(elapsed, handler, status["code"])
+            if profiler is not None:
+                # Joining the sampler and writing the file would stall every
+                # other request on this loop
+                stamp = time.strftime("%Y%m%d-%H%M%S")
+                await asyncio.to_thread(
+                    profiler.finish,
+                    PROFILE_DIR / f"{stamp}-{handler}-{int(elapsed * 1000)}ms-{os.getpid()}.collapsed",
+                )
@@ -0,0 +1,115 @@
+"""
+Multi-item "taste profile" recommendations.
+
+A profile is the weighted sum of the TF-IDF rows of the items a user liked
+(positive weights) and disliked (negative weights). It is kept as a sparse
+1 x n_features vector so adding or removing one item is a single sparse add,
+and the last catalog scoring is memoized until the profile changes.
+sync() recomputes the vector from the weights in one sparse product, so a
+long-lived cached profile doesn't accumulate float rounding from many
+add / subtract round trips.
+"""
+
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+from recommender import top_k_indices
+
+
+class TasteProfile:
+    """Incrementally updatable profile over one engine's TF-IDF matrix."""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.weights = {}  # row index -> weight
+        self.vector = sp.csr_matrix((1, matrix.shape[1]), dtype=np.float64)
+        self._scores = None
+        # Held by callers that share one profile across concurrent requests
+        self.lock = threading.Lock()
+
+    def add(self, row: int, weight: float = 1.0):
+        """Add `weight` x item row to the profile (accumulates if already present)."""
+        row = int(row)
+        new_weight = self.weights.get(row, 0.0) + weight
+        if new_weight == 0:
+            self.weights.pop(row, None)
+        else:
+            self.weights[row] = new_weight
+        if self.weights:
+            self.vector = self.vector + weight * self.matrix[row]
+            self.vector.eliminate_zeros()  # terms the subtraction cancelled
+        else:
+            self._recompute()
+        self._scores = None
+
+    def remove(self, row: int):
+        """Drop an item's whole contribution."""
+        weight = self.weights.get(int(row))
+        if weight is not None:
+            self.add(row, -weight)
+
+    def sync(self, target: dict) -> int:
+        """
+        Bring the profile to exactly `target` ({row: weight}). Returns the
+        number of rows whose weight changed; when any did, the vector is
+        recomputed from the new weights (no drift from earlier updates).
+        """
+        target = {int(row): float(weight) for row, weight in target.items() if weight != 0}
+        changed = sum(1 for row in self.weights if row not in target)
+        changed += sum(1 for row, weight in target.items() if self.weights.get(row) != weight)
+        if changed:
+            self.weights = target
+            self._recompute()
+            self._scores = None
+        return changed
+
+    def _recompute(self):
+        """Set the vector to the exact weighted sum of the profile's rows."""
+        rows = np.fromiter(self.weights, dtype=np.intp, count=len(self.weights))
+        weights = np.fromiter(self.weights.values(), dtype=np.float64, count=len(rows))
+        picker = sp.csr_matrix(
+            (weights, (np.zeros(len(rows), dtype=np.intp), rows)), shape=(1, self.matrix.shape[0])
+        )
+        self.vector = sp.csr_matrix(picker @ self.matrix, dtype=np.float64)
+        self.vector.eliminate_zeros()
+
+    @property
+    def seen(self) -> np.ndarray:
+        return np.fromiter(self.weights, dtype=np.intp, count=len(self.weights))
+
+    def scores(self) -> np.ndarray:
+        """Cosine similarity of every catalog row to the profile."""
+        if self._scores is None:
+            norm = np.sqrt(self.vector.multiply(self.vector).sum())
+            raw = (self.matrix @ self.vector.T).toarray().ravel()
+            self._scores = raw / norm if norm > 0 else np.zeros_like(raw)
+        return self._scores
+
+    def rank(self, topn: int = 5, *, memoize: bool = True):
+        """
+        Top matches as (indices, scores), never returning already-seen items.
+        memoize=False scores without keeping the dense n_items array around,
+        for profiles that sit in a long-lived cache.
+        """
+        if not self.weights:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        scores = self.scores()
+        if not memoize:
+            self._scores = None
+        indices = top_k_indices(scores, topn, exclude=self.seen)
+        return indices, scores[indices]
+
+
+def profile_weights(liked=(), disliked=(), *, dislike_weight: float = 1.0) -> dict:
+    """
+    Merge (row, weight) pairs into one {row: weight} target.
+    Disliked rows are subtracted with `dislike_weight` scaling.
+    """
+    target = {}
+    for row, weight in liked:
+        target[int(row)] = target.get(int(row), 0.0) + float(weight)
+    for row, weight in disliked:
+        target[int(row)] = target.get(int(row), 0.0) - dislike_weight * float(weight)
+    return {row: w for row, w in target.items() if w != 0}
@@ -1,21 +1,71 @@
 from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
+import scipy.sparse as sp
+
+from catalog import read_catalog
+from embeddings import EmbeddingIndex, get_embedder
+from genre_index import GenreIndex
+from serialization import ItemColumns
+from title_index import TitleIndex
+
+
+PLACEHOLDER_IMAGE = "https://placehold.co/400x600?text=No+Image"
+
+
+class NeighbourTable(NamedTuple):
+    """
+    Precomputed top-K neighbours of every item, best first.
+    `ids[i]` are row indices (int32), `scores[i]` their cosine scores (float32).
+    """
 
+    ids: np.ndarray
+    scores: np.ndarray
 
-def load_items(csv_path: Path) -> pd.DataFrame:
-    df = pd.read_csv(csv_path)
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1]
 
+
+class Engine(NamedTuple):
+    """Everything needed to serve one media type."""
+
+    items: pd.DataFrame
+    tfidf: object
+    matrix: object
+    titles: TitleIndex
+    columns: ItemColumns
+    neighbours: Optional[NeighbourTable] = None
+    embeddings: Optional[EmbeddingIndex] = None
+    ann: Optional[object] = None  # ann_index.IVFIndex for large catalogs
+    # Shared-vocabulary engine only: media type -> [start, stop) rows
+    ranges: Optional[Dict[str, Tuple[int, int]]] = None
+    genres: Optional[GenreIndex] = None
+    inverted: Optional[object] = None  # inverted_index.InvertedIndex for text queries
+
+
+def load_items(path: Path, columns=None) -> pd.DataFrame:
+    """Read a catalog (Parquet or CSV), decoding only `columns` if given, and prepare it."""
+    return prepare_items(read_catalog(path, columns))
+
+
+def prepare_items(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize raw catalog rows (from a catalog file or an API payload) and build
+    the 'content' text used for similarity.
+    """
     # Fill missing values safely
-    df["genres"] = df.get("genres", "").fillna("")
-    df["description"] = df.get("description", "").fillna("")
-    df["title"] = df.get("title", "").fillna("")
+    for col in ("genres", "description", "title"):
+        if col not in df.columns:
+            df[col] = ""
+        df[col] = df[col].fillna("")
 
     # Ensure image_url exists if missing
     if "image_url" not in df.columns:
-        df["image_url"] = "https://placehold.co/400x600?text=No+Image"
+        df["image_url"] = PLACEHOLDER_IMAGE
+    df["image_url"] = df["image_url"].fillna(PLACEHOLDER_IMAGE)
 
     # Text used for similarity
     df["content"] = (
@@ -28,39 +78,326 @@ def load_items(csv_path: Path) -> pd.DataFrame:
     return df
 
 
+# Vectorizer settings shared by the in-memory and streaming (stream_build.py) builds
+TFIDF_PARAMS = {"stop_words": "english", "ngram_range": (1, 2), "max_features": 50000}
+
+
 def build_tfidf_matrix(items: pd.DataFrame):
     """
     Build a TF-IDF matrix over the 'content' column.
     Returns both the vectorizer and the matrix.
     """
-    tfidf = TfidfVectorizer(
-        stop_words="english",
-        ngram_range=(1, 2),
-        max_features=50000,
-    )
+    # Only index builds fit a vectorizer; serving uses index_store.FrozenVectorizer
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    tfidf = TfidfVectorizer(**TFIDF_PARAMS)
     matrix = tfidf.fit_transform(items["content"])
     return tfidf, matrix
 
 
-def resolve_title_to_index(items: pd.DataFrame, query: str):
+# Item fields kept resident once the catalog is vectorized (descriptions and
+# the concatenated 'content' text are only needed to build vectors).
+SERVING_COLUMNS = ["item_id", "title", "genres", "image_url", "media_type"]
+
+
+def serving_items(items: pd.DataFrame) -> pd.DataFrame:
+    """The slim item table an Engine keeps in memory."""
+    return items[[c for c in SERVING_COLUMNS if c in items.columns]].reset_index(drop=True)
+
+
+def compact_matrix(matrix, *, prune_terms: int = 0, dtype=np.float32):
+    """
+    Serving copy of a TF-IDF matrix: `dtype` values and int32 indices.
+    With `prune_terms`, each row keeps only its highest-weighted terms and
+    is re-normalized, so dot products are still cosine similarities.
+    """
+    matrix = sp.csr_matrix(matrix)
+    if prune_terms and prune_terms > 0:
+        counts = np.diff(matrix.indptr)
+        keep = np.ones(matrix.nnz, dtype=bool)
+        for row in np.flatnonzero(counts > prune_terms):
+            start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+            weights = matrix.data[start:stop]
+            drop = np.argpartition(weights, len(weights) - prune_terms)[: len(weights) - prune_terms]
+            keep[start + drop] = False
+        row_ids = np.repeat(np.arange(matrix.shape[0]), counts)
+        lengths = np.bincount(row_ids[keep], minlength=matrix.shape[0])
+        matrix = sp.csr_matrix(
+            (matrix.data[keep], matrix.indices[keep],
+             np.concatenate([[0], np.cumsum(lengths)])),
+            shape=matrix.shape,
+        )
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        matrix = sp.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ matrix
+        matrix = matrix.tocsr()
+
+    matrix.sort_indices()
+    return sp.csr_matrix(
+        (matrix.data.astype(dtype), matrix.indices.astype(np.int32),
+         matrix.indptr.astype(np.int32 if matrix.nnz < 2**31 else np.int64)),
+        shape=matrix.shape,
+    )
+
+
+def top_k_indices(scores, k: int, *, exclude=None, allowed=None) -> np.ndarray:
+    """
+    Return the indices of the `k` highest scores, best first.
+
+    Uses partial selection (O(n)) and only sorts the winners. Ties are
+    broken by lower index so results are deterministic. `exclude` is an
+    index or list of indices that must never be returned (e.g. the query item);
+    `allowed` is an optional boolean mask (e.g. a genre filter) of eligible rows.
+    """
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    n_valid = len(scores)
+    if allowed is not None:
+        if exclude is not None:
+            allowed = np.array(allowed, dtype=bool)
+            allowed[np.atleast_1d(exclude)] = False
+        n_valid = int(np.count_nonzero(allowed))
+        scores = np.where(allowed, scores, -np.inf)
+    elif exclude is not None:
+        exclude = np.unique(np.atleast_1d(exclude))
+        n_valid -= len(exclude)
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+
+    k = min(int(k), n_valid)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # k-th best value; everything strictly above it wins, and ties at the
+    # boundary are filled in index order.
+    kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: k - len(above)]
+    winners = np.concatenate([above, ties])
+
+    order = np.lexsort((winners, -scores[winners]))
+    return winners[order]
+
+
+def resolve_title_to_index(
+    items: pd.DataFrame,
+    query: str,
+    titles: Optional[TitleIndex] = None,
+):
+    """
+    Match a user query to a title in the dataset.
+    Returns (row_index, title) of the best ranked candidate, or (None, None).
+
+    Pass the dataset's prebuilt `titles` index; without one, an index is
+    built on the fly (fine for one-off scripts, too slow for serving).
+    """
+    if titles is None:
+        titles = TitleIndex(items["title"])
+    return titles.resolve(query)
+
+
+RESULT_COLUMNS = ["item_id", "title", "genres", "image_url", "similarity_score"]
+
+
+def _to_frame(items: pd.DataFrame, indices, scores) -> pd.DataFrame:
+    result = items.iloc[indices].copy()
+    result["similarity_score"] = np.round(scores, 3)
+    return result[RESULT_COLUMNS]
+
+
+# Cap on one neighbour score block (rows x n_items, 16 MB dense as float32)
+NEIGHBOUR_BLOCK_CELLS = 2**22
+
+
+def neighbours_for_rows(matrix, rows, *, k: int, block_size: int = 512, matrix_t=None):
+    """
+    Top-k neighbours (ids int32, scores float32) of the given rows of
+    `matrix`, each excluding itself. Scored `block_size` rows at a time
+    (fewer when the catalog is so large that one dense block would pass
+    NEIGHBOUR_BLOCK_CELLS) with a sparse-times-sparse product. `matrix_t`
+    is the transpose to multiply by; pass the memory-mapped posting lists
+    (a CSR n_features x n_items matrix) to avoid transposing in memory.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    ids = np.zeros((len(rows), k), dtype=np.int32)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+    if matrix_t is None:
+        matrix_t = matrix.T.tocsc()
+    block_size = max(1, min(block_size, NEIGHBOUR_BLOCK_CELLS // max(1, matrix.shape[0])))
+
+    for start in range(0, len(rows), block_size):
+        chunk = rows[start : start + block_size]
+        block = (matrix[chunk] @ matrix_t).toarray()
+        for offset, (row, item_index) in enumerate(zip(block, chunk)):
+            top = top_k_indices(row, k, exclude=item_index)
+            ids[start + offset] = top
+            scores[start + offset] = row[top]
+
+    return ids, scores
+
+
+def build_neighbour_table(matrix, *, k: int = 50, block_size: int = 512,
+                          matrix_t=None) -> NeighbourTable:
+    """Top-k neighbours for every row of `matrix`, excluding the row itself."""
+    n_items = matrix.shape[0]
+    k = max(0, min(k, n_items - 1))
+    ids, scores = neighbours_for_rows(
+        matrix, np.arange(n_items), k=k, block_size=block_size, matrix_t=matrix_t
+    )
+    return NeighbourTable(ids, scores)
+
+
+def _sparse_row_scorer(matrix, query_vec):
+    return lambda rows: (matrix[rows] @ query_vec.T).toarray().ravel()
+
+
+def _filled(result, topn: int, allowed) -> bool:
+    # A filtered shortcut (neighbour table, ANN probe) can come up short;
+    # the caller then scores the whole catalog instead
+    return allowed is None or len(result[0]) >= topn
+
+
+def rank_content(matrix, *, item_index: int, topn: int = 5, neighbours=None, ann=None,
+                 allowed=None):
     """
-    Try to match a user query to a title in the dataset
-    using exact and then substring matching (case-insensitive).
+    Rank the catalog against an EXISTING item.
+    Returns (indices, scores) of the top matches, excluding the item itself
+    and, given an `allowed` mask, any row outside it.
+
+    Served straight from the precomputed `neighbours` table when it holds
+    at least `topn` (allowed) entries; otherwise scored live, through the
+    `ann` index when one is given.
     """
-    query = query.lower().strip()
-    titles = items["title"].str.lower().tolist()
+    topn = max(int(topn), 0)  # a negative slice below would count from the end
+    if neighbours is not None and topn <= neighbours.k:
+        ids, scores = neighbours.ids[item_index], neighbours.scores[item_index]
+        if allowed is None:
+            return ids[:topn], scores[:topn]
+        keep = np.flatnonzero(allowed[ids])[:topn]
+        if len(keep) == topn:
+            return ids[keep], scores[keep]
+
+    if ann is not None:
+        query_vec = matrix[item_index : item_index + 1]
+        result = ann.search(
+            query_vec, _sparse_row_scorer(matrix, query_vec), topn, exclude=item_index,
+            allowed=allowed,
+        )
+        if _filled(result, topn, allowed):
+            return result
+
+    cosine_sim = (matrix @ matrix[item_index].T).toarray().ravel()
+    indices = top_k_indices(cosine_sim, topn, exclude=item_index, allowed=allowed)
+    return indices, cosine_sim[indices]
+
+
+def rank_from_text(tfidf, matrix, *, text: str, topn: int = 5, ann=None, allowed=None,
+                   inverted=None):
+    """
+    Rank the catalog against arbitrary text.
+    Returns (indices, scores) of the top matches (within `allowed`, if given).
+
+    With an `inverted` index only the query terms' posting lists are read
+    and the result is exact, so it is preferred over `ann`.
+    """
+    query_vec = tfidf.transform([text])
+    if inverted is not None:
+        return inverted.search(query_vec, topn, allowed=allowed)
+    if ann is not None:
+        result = ann.search(query_vec, _sparse_row_scorer(matrix, query_vec), topn,
+                            allowed=allowed)
+        if _filled(result, topn, allowed):
+            return result
+    cosine_sim = (matrix @ query_vec.T).toarray().ravel()
+    indices = top_k_indices(cosine_sim, topn, allowed=allowed)
+    return indices, cosine_sim[indices]
+
+
+def rank_cross_media(matrix, query_vec, ranges, targets, *, topn: int = 5, exclude=None,
+                     allowed=None):
+    """
+    Score `query_vec` against a stacked multi-media matrix in one product and
+    take the top matches within each target's row range (and `allowed` mask).
+    Returns {media: (indices, scores)} with indices into the stacked matrix.
+    """
+    scores = (matrix @ query_vec.T).toarray().ravel()
+    exclude = np.atleast_1d(exclude) if exclude is not None else np.empty(0, dtype=np.intp)
+    results = {}
+    for media in targets:
+        start, stop = ranges[media]
+        local = exclude[(exclude >= start) & (exclude < stop)] - start
+        indices = top_k_indices(
+            scores[start:stop], topn, exclude=local if len(local) else None,
+            allowed=allowed[start:stop] if allowed is not None else None,
+        )
+        results[media] = (indices + start, scores[indices + start])
+    return results
+
+
+def rank_batch(
+    tfidf,
+    matrix,
+    *,
+    item_indices=(),
+    texts=(),
+    topn: int = 5,
+    block_size: int = 256,
+):
+    """
+    Rank the catalog for many queries at once.
+
+    Item queries come first, then text queries; all are stacked into one
+    query matrix and scored `block_size` rows at a time with a single
+    sparse matrix-matrix product per block, so memory stays at one
+    block_size x n_items dense block. Item queries exclude themselves.
+    Returns a list of (indices, scores), one per query, in that order.
+    """
+    item_indices = [int(i) for i in item_indices]
+    texts = list(texts)
+    parts = []
+    if item_indices:
+        parts.append(matrix[item_indices])
+    if texts:
+        parts.append(tfidf.transform(texts))
+    if not parts:
+        return []
+
+    queries = sp.vstack(parts, format="csr")
+    matrix_t = matrix.T.tocsc()
+    block_size = max(1, int(block_size))
 
-    # 1. Exact match
-    if query in titles:
-        idx = titles.index(query)
-        return idx, items.iloc[idx]["title"]
+    results = []
+    for start in range(0, queries.shape[0], block_size):
+        block = (queries[start : start + block_size] @ matrix_t).toarray()
+        for offset, row in enumerate(block):
+            q = start + offset
+            exclude = item_indices[q] if q < len(item_indices) else None
+            indices = top_k_indices(row, topn, exclude=exclude)
+            results.append((indices, row[indices]))
+    return results
 
-    # 2. Substring match
-    for idx, title in enumerate(titles):
-        if query in title:
-            return idx, items.iloc[idx]["title"]
 
-    return None, None
+def recommend_batch(
+    items: pd.DataFrame,
+    tfidf,
+    matrix,
+    *,
+    item_indices=(),
+    texts=(),
+    topn: int = 5,
+    block_size: int = 256,
+) -> list:
+    """
+    Batch version of recommend_content / recommend_from_text.
+    Returns one DataFrame per query (item queries first, then texts).
+    """
+    ranked = rank_batch(
+        tfidf,
+        matrix,
+        item_indices=item_indices,
+        texts=texts,
+        topn=topn,
+        block_size=block_size,
+    )
+    return [_to_frame(items, indices, scores) for indices, scores in ranked]
 
 
 def recommend_content(
@@ -69,19 +406,15 @@ def recommend_content(
     *,
     item_index: int,
     topn: int = 5,
+    neighbours: Optional[NeighbourTable] = None,
 ) -> pd.DataFrame:
     """
     TF-IDF cosine similarity recommendation based on an EXISTING item.
     """
-    cosine_sim = linear_kernel(matrix[item_index : item_index + 1], matrix).flatten()
-
-    indices = cosine_sim.argsort()[::-1]
-    indices = [i for i in indices if i != item_index][:topn]
-
-    result = items.iloc[indices].copy()
-    result["similarity_score"] = [round(float(cosine_sim[i]), 3) for i in indices]
-
-    return result[["item_id", "title", "genres", "image_url", "similarity_score"]]
+    indices, scores = rank_content(
+        matrix, item_index=item_index, topn=topn, neighbours=neighbours
+    )
+    return _to_frame(items, indices, scores)
 
 
 def recommend_from_text(
@@ -95,12 +428,45 @@ def recommend_from_text(
     """
     TF-IDF similarity using arbitrary text (used for live web search content).
     """
-    query_vec = tfidf.transform([text])
-    cosine_sim = linear_kernel(query_vec, matrix).flatten()
+    indices, scores = rank_from_text(tfidf, matrix, text=text, topn=topn)
+    return _to_frame(items, indices, scores)
 
-    indices = cosine_sim.argsort()[::-1][:topn]
 
-    result = items.iloc[indices].copy()
-    result["similarity_score"] = [round(float(cosine_sim[i]), 3) for i in indices]
+def build_embedding_matrix(items: pd.DataFrame, model: Optional[str] = None, dtype: str = "int8"):
+    """
+    Embed the 'content' column on CPU and quantize it.
+    Returns both the embedder and the EmbeddingIndex.
+    """
+    embedder = get_embedder(model)
+    vectors = embedder.encode(items["content"].tolist())
+    return embedder, EmbeddingIndex.from_vectors(vectors, embedder, dtype=dtype)
+
+
+def rank_content_embeddings(embeddings: EmbeddingIndex, *, item_index: int, topn: int = 5,
+                            allowed=None):
+    """Embedding-space counterpart of rank_content."""
+    scores = embeddings.scores(embeddings.vector(item_index))
+    indices = top_k_indices(scores, topn, exclude=item_index, allowed=allowed)
+    return indices, scores[indices]
+
+
+def rank_text_embeddings(embeddings: EmbeddingIndex, *, text: str, topn: int = 5,
+                         allowed=None):
+    """Embedding-space counterpart of rank_from_text."""
+    scores = embeddings.scores(embeddings.encode(text))
+    indices = top_k_indices(scores, topn, allowed=allowed)
+    return indices, scores[indices]
+
 
-    return result[["item_id", "title", "genres", "image_url", "similarity_score"]]
+def recommend_content_embeddings(
+    items: pd.DataFrame,
+    embeddings: EmbeddingIndex,
+    *,
+    item_index: int,
+    topn: int = 5,
+) -> pd.DataFrame:
+    """
+    Dense-embedding similarity recommendation based on an EXISTING item.
+    """
+    indices, scores = rank_content_embeddings(embeddings, item_index=item_index, topn=topn)
+    return _to_frame(items, indices, scores)
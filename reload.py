@@ -0,0 +1,134 @@
+"""
+Hot reload of serving engines.
+
+A reload builds (or opens) the engine for a media type's current CSV on a
+background thread while the old engine keeps serving, then swaps it into the
+shared state dict with a single assignment. Requests that already picked up
+the old Engine finish on it; there is never a moment without one.
+
+Reloads are triggered by POST /admin/reload (only when ADMIN_TOKEN is set)
+or, with DATA_WATCH_INTERVAL set (seconds), by a thread polling the CSVs'
+mtime/size (cheap; the content hash is only computed once a file actually
+changed).
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Poll period for the data/ watcher; unset or 0 disables it
+DATA_WATCH_INTERVAL = float(os.environ.get("DATA_WATCH_INTERVAL", "0") or 0)
+
+
+def _file_stamp(path):
+    if isinstance(path, (list, tuple)):
+        return tuple(_file_stamp(p) for p in path)
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class Reloader:
+    """
+    Rebuilds engines into `state` ({media: Engine}) off the request path.
+
+    `loader(media, path)` returns a ready Engine (`paths` values may
+    be lists for engines built from several catalogs); `locks` are the
+    per-media locks that also serialize incremental updates, so an upsert
+    can't be applied to an engine that is about to be replaced.
+    `on_swap(media)` runs after each swap (e.g. to drop cached results).
+    """
+
+    def __init__(self, state: Dict, loader: Callable, paths: Dict,
+                 locks: Dict[str, threading.Lock], on_swap: Optional[Callable] = None):
+        self.state = state
+        self.loader = loader
+        self.on_swap = on_swap
+        self.paths = paths
+        self.locks = locks
+        self.status = {media: {"state": "idle"} for media in paths}
+        self._stamps = {media: _file_stamp(path) for media, path in paths.items()}
+        self._running = set()
+        self._guard = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def reload(self, media: str, *, wait: bool = False) -> bool:
+        """
+        Start a background reload of `media`. Returns False if one is
+        already running (the running one will pick up the latest CSV).
+        """
+        with self._guard:
+            if media in self._running:
+                return False
+            self._running.add(media)
+        self.status[media] = {"state": "building", "started": time.time()}
+
+        worker = threading.Thread(target=self._run, args=(media,), daemon=True,
+                                  name=f"reload-{media}")
+        worker.start()
+        if wait:
+            worker.join()
+        return True
+
+    def _run(self, media: str):
+        path = self.paths[media]
+        start = time.perf_counter()
+        try:
+            stamp = _file_stamp(path)
+            with self.locks[media]:
+                engine = self.loader(media, path)
+                # Single dict assignment: readers see either the old or new Engine
+                self.state[media] = engine
+                if self.on_swap is not None:
+                    self.on_swap(media)
+            self._stamps[media] = stamp
+            self.status[media] = {
+                "state": "ready",
+                "items": len(engine.items),
+                "seconds": round(time.perf_counter() - start, 3),
+                "finished": time.time(),
+            }
+            print(f"   🔄 Reloaded {media} ({len(engine.items)} items, "
+                  f"{time.perf_counter() - start:.1f}s)")
+        except Exception as e:
+            # Keep serving the previous engine
+            self.status[media] = {"state": "failed", "error": str(e), "finished": time.time()}
+            print(f"   ❌ Reload of {media} failed: {e}")
+        finally:
+            with self._guard:
+                self._running.discard(media)
+
+    def changed(self):
+        """Loaded media types whose catalog changed on disk since it was last loaded."""
+        changed = []
+        for media, path in self.paths.items():
+            stamp = _file_stamp(path)
+            if stamp is None or stamp == self._stamps.get(media):
+                continue
+            if media in self.state:
+                changed.append(media)
+            else:
+                # Not loaded yet: its first request will read the new file anyway
+                self._stamps[media] = stamp
+        return changed
+
+    def start_watching(self, interval: float):
+        if self._watcher is not None or interval <= 0:
+            return
+        self._stop.clear()
+
+        def poll():
+            while not self._stop.wait(interval):
+                for media in self.changed():
+                    self.reload(media)
+
+        self._watcher = threading.Thread(target=poll, daemon=True, name="data-watcher")
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        self._watcher = None
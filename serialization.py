@@ -0,0 +1,207 @@
+"""
+Columnar, DataFrame-free rendering of /recommend responses.
+
+Item fields are pulled out of the DataFrame once at load time and every
+item's JSON is pre-rendered up to its score, so a response is a handful of
+byte concatenations indexed by the top-k row positions.
+"""
+
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional speedup, falls back to json
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _fragment(item_id, title, genres, image_url) -> bytes:
+    return (
+        dumps(
+            {
+                "item_id": int(item_id),
+                "title": title,
+                "genres": genres,
+                "image_url": image_url,
+            }
+        )[:-1]
+        + b',"similarity_score":'
+    )
+
+
+class FragmentTable:
+    """
+    Read-only sequence of pre-rendered fragments packed into one byte buffer.
+    Persisted with the index and memory-mapped, so every worker process
+    shares a single copy instead of holding its own list of bytes objects.
+    `blob` is bytes or an mmap.mmap (both slice straight to bytes).
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+        # Plain int64 view of the (possibly memory-mapped) offsets; indexing
+        # it skips np.memmap's per-access Python-level bookkeeping
+        self._offsets = memoryview(np.ascontiguousarray(offsets, dtype=np.int64)).cast("B").cast("q")
+
+    @classmethod
+    def pack(cls, fragments) -> "FragmentTable":
+        offsets = np.zeros(len(fragments) + 1, dtype=np.int64)
+        np.cumsum([len(f) for f in fragments], out=offsets[1:])
+        return cls(b"".join(fragments), offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        offsets = self._offsets
+        return self.blob[offsets[i] : offsets[i + 1]]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class ItemColumns:
+    """
+    Array-backed copy of the fields a recommendation returns.
+    `fragments[i]` is item i's JSON object without its score and closing brace;
+    pass a FragmentTable to reuse fragments rendered at index build time.
+    """
+
+    def __init__(self, items, fragments=None):
+        self.item_ids = items["item_id"].to_numpy(dtype=np.int64)
+        self.titles = items["title"].astype(str).to_numpy(dtype=object)
+        self.genres = items["genres"].astype(str).to_numpy(dtype=object)
+        self.image_urls = items["image_url"].astype(str).to_numpy(dtype=object)
+
+        # item_id -> row position (first row wins for duplicate ids)
+        self.row_of = {}
+        for row, item_id in enumerate(self.item_ids.tolist()):
+            self.row_of.setdefault(item_id, row)
+
+        if fragments is None:
+            fragments = [
+                _fragment(*fields)
+                for fields in zip(self.item_ids, self.titles, self.genres, self.image_urls)
+            ]
+        self.fragments = fragments
+
+    def with_updates(self, rows, items) -> "ItemColumns":
+        """
+        Copy with `items` (a DataFrame aligned with `rows`) written at those
+        row positions; rows past the end are appended. Untouched rows keep
+        their pre-rendered fragments.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        size = max(len(self), int(rows.max()) + 1 if len(rows) else 0)
+        new = ItemColumns.__new__(ItemColumns)
+
+        def grow(column, values):
+            out = np.empty(size, dtype=column.dtype)
+            out[: len(column)] = column
+            out[rows] = values
+            return out
+
+        new.item_ids = grow(self.item_ids, items["item_id"].to_numpy(dtype=np.int64))
+        new.titles = grow(self.titles, items["title"].astype(str).to_numpy(dtype=object))
+        new.genres = grow(self.genres, items["genres"].astype(str).to_numpy(dtype=object))
+        new.image_urls = grow(self.image_urls, items["image_url"].astype(str).to_numpy(dtype=object))
+
+        new.row_of = dict(self.row_of)
+        new.fragments = list(self.fragments) + [None] * (size - len(self))
+        for row in rows.tolist():
+            new.row_of.setdefault(int(new.item_ids[row]), row)
+            new.fragments[row] = _fragment(
+                new.item_ids[row], new.titles[row], new.genres[row], new.image_urls[row]
+            )
+        return new
+
+    def __len__(self):
+        return len(self.fragments)
+
+    def render(self, indices, scores) -> bytes:
+        """JSON array of recommendations for the given rows and scores."""
+        fragments = self.fragments
+        parts = [
+            fragments[i] + dumps(round(float(score), 3)) + b"}"
+            for i, score in zip(indices, scores)
+        ]
+        return b"[" + b",".join(parts) + b"]"
+
+
+def render_response(
+    columns: ItemColumns,
+    *,
+    media_type: str,
+    engine_used: str,
+    base_title: str,
+    topn: int,
+    indices,
+    scores,
+) -> bytes:
+    """Serialize a RecommendResponse-shaped body without building any models."""
+    head = dumps(
+        {
+            "media_type": media_type,
+            "engine_used": engine_used,
+            "base_title": base_title,
+            "topn": topn,
+        }
+    )
+    return head[:-1] + b',"recommendations":' + columns.render(indices, scores) + b"}"
+
+
+def render_cross_media_response(
+    columns: ItemColumns,
+    *,
+    media_type: str,
+    engine_used: str,
+    base_title: str,
+    topn: int,
+    results: dict,
+) -> bytes:
+    """
+    Serialize a CrossMediaResponse-shaped body.
+    `results` maps each target media type to (indices, scores).
+    """
+    head = dumps(
+        {
+            "media_type": media_type,
+            "engine_used": engine_used,
+            "base_title": base_title,
+            "topn": topn,
+            "target_media": list(results),
+        }
+    )
+    parts = [
+        dumps(media) + b":" + columns.render(indices, scores)
+        for media, (indices, scores) in results.items()
+    ]
+    return head[:-1] + b',"results":{' + b",".join(parts) + b"}}"
+
+
+def render_batch_response(
+    columns: ItemColumns,
+    *,
+    media_type: str,
+    engine_used: str,
+    topn: int,
+    results,
+) -> bytes:
+    """
+    Serialize a BatchResponse-shaped body.
+    `results` yields (query, base_title, indices, scores, error) tuples.
+    """
+    head = dumps({"media_type": media_type, "engine_used": engine_used, "topn": topn})
+    parts = []
+    for query, base_title, indices, scores, error in results:
+        meta = dumps({"query": query, "base_title": base_title, "error": error})
+        parts.append(meta[:-1] + b',"recommendations":' + columns.render(indices, scores) + b"}")
+    return head[:-1] + b',"results":[' + b",".join(parts) + b"]}"
@@ -0,0 +1,167 @@
+"""
+Multi-process serving over one shared copy of the engine state.
+
+    python serve.py --workers 4                  # every catalog in data/
+    python serve.py --workers 8 --media anime all --port 8080
+
+The parent process is the loader. It builds (or validates) each index in
+data/index/ and opens the engines: the CSR matrix, neighbour, embedding and
+response-fragment arrays are memory-mapped from those files, so their pages
+live once in the page cache. It then freezes the garbage collector, so the
+rest of the loaded objects are never rewritten by a collection, and forks
+the workers. Each worker runs its own event loop and threadpool on the
+shared listening socket and inherits the engines copy-on-write, so memory
+per host stays roughly flat as --workers grows while scoring runs on every
+core instead of behind one GIL.
+
+`uvicorn api:app --workers N` instead spawns fresh interpreters that each
+load a private copy of every engine.
+
+Workers that die are restarted after a delay that doubles with each recent
+crash; after MAX_RESTARTS crashes within RESTART_WINDOW seconds (a worker
+that can't start at all) the server shuts down with exit status 1 instead of
+fork-looping. SIGINT / SIGTERM stops them all. Each
+worker keeps its own result cache (set RESULT_CACHE_URL to share one) and
+its own /metrics. After POST /admin/items in one worker, the others pick up
+the rewritten catalog on their next DATA_WATCH_INTERVAL poll.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+from collections import deque
+
+import uvicorn
+
+import api
+from index_store import UNIFIED_MEDIA, available_catalogs
+
+# Crash-loop guard: give up after MAX_RESTARTS worker deaths within
+# RESTART_WINDOW seconds; restart delays double from RESTART_DELAY up to RESTART_MAX_DELAY
+MAX_RESTARTS = int(os.environ.get("MAX_RESTARTS", "5"))
+RESTART_WINDOW = 60.0
+RESTART_DELAY = 0.5
+RESTART_MAX_DELAY = 10.0
+
+
+def preload(media_types):
+    """Open every engine in `media_types` in this (the loader) process."""
+    available = available_catalogs()
+    for media in media_types:
+        if media == UNIFIED_MEDIA:
+            api._load_unified()
+        elif media in available:
+            api._load_engine(media)
+        else:
+            print(f"   ⚠ Skipping {media}, file not found")
+
+
+def restart_delay(crashes: deque, now: float):
+    """
+    Record a worker crash at `now` in `crashes` (recent crash times) and
+    return how long to wait before replacing it, or None to give up.
+    """
+    crashes.append(now)
+    while crashes and crashes[0] < now - RESTART_WINDOW:
+        crashes.popleft()
+    if len(crashes) > MAX_RESTARTS:
+        return None
+    return min(RESTART_MAX_DELAY, RESTART_DELAY * 2 ** (len(crashes) - 1))
+
+
+def _run_worker(config: uvicorn.Config, sock):
+    # Restore default signal handling; uvicorn installs its own for shutdown
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    uvicorn.Server(config).run(sockets=[sock])
+    os._exit(0)
+
+
+def serve(host: str, port: int, workers: int, media_types) -> bool:
+    """Run the workers until stopped. False when they kept crashing."""
+    preload(media_types)
+
+    config = uvicorn.Config(api.app, host=host, port=port, log_level="info")
+    sock = config.bind_socket()
+
+    # Everything loaded so far is long-lived; keep the collector from
+    # touching (and so un-sharing) those pages in the workers.
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    crashes = deque()
+    stopping = False
+    crash_looping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(config, sock)
+        children[pid] = True
+        print(f"   👷 Worker {pid} started")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        spawn()
+    print(f"🚀 Serving on http://{host}:{port} with {workers} workers")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.pop(pid, None)
+        if stopping:
+            continue
+        delay = restart_delay(crashes, time.monotonic())
+        if delay is None:
+            print(f"   ❌ Worker {pid} exited ({status}); {len(crashes)} crashes in "
+                  f"{RESTART_WINDOW:.0f}s, shutting down")
+            crash_looping = True
+            stop(None, None)
+            continue
+        print(f"   ⚠ Worker {pid} exited ({status}), restarting in {delay:.1f}s")
+        time.sleep(delay)
+        if not stopping:
+            spawn()
+    sock.close()
+    return not crash_looping
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-forked API workers sharing one engine load.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--media", nargs="*", default=None,
+                        help=f"engines to preload (default: every catalog; '{UNIFIED_MEDIA}' "
+                             "adds the cross-media index)")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork(); use `uvicorn api:app --workers N` on this platform")
+
+    media_types = args.media if args.media is not None else list(available_catalogs())
+    if not serve(args.host, args.port, max(1, args.workers), media_types):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+"""
+Out-of-core index builds for catalogs larger than memory.
+
+    python index_store.py --stream                        # every catalog, chunked
+    python index_store.py --stream --chunk-size 20000 --workers 4 anime manga
+
+build_index() fits TfidfVectorizer on the whole `content` column at once.
+Here the catalog is read in chunks (Parquet row groups or CSV blocks) twice:
+
+1. count: each chunk is tokenized and reduced to a sorted run of per-term
+   totals (term frequency, for the max_features cut, and document
+   frequency, for the IDF) on disk. The runs are then merged, keeping only
+   two int64 counts per distinct term in memory.
+2. vectorize: each chunk becomes L2-normalized TF-IDF rows over the chosen
+   vocabulary, plus its embeddings, written to disk as a shard.
+
+The shards are then concatenated into the index's .npy files and the
+posting lists are transposed out of them shard by shard. Peak memory
+follows the chunk size, not the catalog size; the only per-row state kept
+is the slim serving table that items.pkl holds anyway. The vocabulary is
+picked exactly as TfidfVectorizer picks it, so the result is the same index
+build_index writes, loaded through the same FrozenVectorizer.
+
+With `workers` > 1 chunks are tokenized / vectorized in a process pool, and
+index_store.py --stream builds its media types side by side over one shared
+pool. The neighbour table is scored from the finished, memory-mapped
+matrix and posting lists a bounded block of rows at a time
+(recommender.NEIGHBOUR_BLOCK_CELLS). The ANN index is not out of core (its
+SVD and k-means hold dense n_items x dim arrays), so streamed builds only
+make one when asked to with ann=True / --ann.
+"""
+
+import heapq
+import json
+import os
+import shutil
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+from scipy.sparse import csr_matrix
+
+from catalog import CATALOG_COLUMNS, iter_catalog
+from embeddings import get_embedder, quantize
+from index_store import (
+    INDEX_DIR,
+    NEIGHBOURS_K,
+    UNIFIED_MEDIA,
+    _ARRAYS,
+    _build_options,
+    _finish_index,
+    _reuse_existing,
+    _save_vectorizer,
+    _staging_dir,
+    catalog_fingerprint,
+    index_dir_for,
+    unified_fingerprint,
+)
+from recommender import TFIDF_PARAMS, compact_matrix, prepare_items, serving_items
+
+CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", "10000"))
+
+
+def _count_vectorizer(vocabulary=None):
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    return CountVectorizer(
+        stop_words=TFIDF_PARAMS["stop_words"],
+        ngram_range=TFIDF_PARAMS["ngram_range"],
+        vocabulary=vocabulary,
+    )
+
+
+# --- pass 1: vocabulary and IDF ---
+
+def count_chunk(texts, prefix: str) -> int:
+    """
+    Count one chunk of texts into a sorted run: `<prefix>terms.txt` (one
+    term per line, alphabetical) and `<prefix>counts.npy` (term and
+    document frequencies). Returns the number of documents.
+    """
+    counter = _count_vectorizer()
+    try:
+        counts = counter.fit_transform(texts)
+        terms = counter.get_feature_names_out().tolist()
+    except ValueError:  # only stop words / empty text
+        counts, terms = None, []
+    freqs = np.zeros((2, len(terms)), dtype=np.int64)
+    if counts is not None:
+        freqs[0] = np.asarray(counts.sum(axis=0)).ravel()
+        freqs[1] = np.bincount(counts.indices, minlength=len(terms))
+    with open(f"{prefix}terms.txt", "w", encoding="utf-8") as fh:
+        fh.writelines(f"{term}\n" for term in terms)
+    np.save(f"{prefix}counts.npy", freqs)
+    return len(texts)
+
+
+def _read_run(prefix: str, block: int = 1 << 16):
+    freqs = np.load(f"{prefix}counts.npy", mmap_mode="r")
+    with open(f"{prefix}terms.txt", encoding="utf-8") as fh:
+        for start in range(0, freqs.shape[1], block):
+            tf = freqs[0, start : start + block].tolist()
+            df = freqs[1, start : start + block].tolist()
+            # The file goes last: zip stops at the block's end before reading another line
+            for t, d, term in zip(tf, df, fh):
+                yield term[:-1], t, d
+
+
+def merge_runs(runs, terms_path: Path):
+    """
+    Merge the sorted per-chunk runs: every distinct term goes to
+    `terms_path` in alphabetical order and their summed (tf, df) come back
+    as int64 arrays, 16 bytes per term in memory.
+    """
+    tf, df = array("q"), array("q")
+    last = None
+    with open(terms_path, "w", encoding="utf-8") as out:
+        for term, t, d in heapq.merge(*(_read_run(run) for run in runs)):
+            if term == last:
+                tf[-1] += t
+                df[-1] += d
+            else:
+                out.write(f"{term}\n")
+                tf.append(t)
+                df.append(d)
+                last = term
+    return np.frombuffer(tf, dtype=np.int64), np.frombuffer(df, dtype=np.int64)
+
+
+def pick_vocabulary(terms_path: Path, tf, df, n_docs: int, max_features: int = None):
+    """
+    (terms, idf) as TfidfVectorizer fits them on the whole catalog: the
+    `max_features` most frequent of the alphabetical `terms_path` terms,
+    still in alphabetical order, with smoothed IDF weights.
+    """
+    if not len(tf):
+        raise ValueError("empty vocabulary; the catalog has no indexable text")
+    keep = np.arange(len(tf))
+    if max_features is not None and len(tf) > max_features:
+        # Same selection (and tie order) as CountVectorizer._limit_features
+        keep = np.sort((-tf).argsort()[:max_features])
+
+    terms, wanted = [], iter(keep.tolist())
+    target = next(wanted)
+    with open(terms_path, encoding="utf-8") as fh:
+        for i, term in enumerate(fh):
+            if i == target:
+                terms.append(term[:-1])
+                target = next(wanted, None)
+                if target is None:
+                    break
+
+    idf = np.full(len(keep), n_docs + 1, dtype=np.float64)
+    idf /= df[keep] + 1.0
+    np.log(idf, out=idf)
+    idf += 1.0
+    return terms, idf
+
+
+# --- pass 2: vectors ---
+
+@lru_cache(maxsize=8)
+def _load_vectorizer(vectorizer_dir: str, stamp: int):
+    # `stamp` (vocabulary.json's mtime) keeps a reused temp dir from hitting a stale entry
+    with open(Path(vectorizer_dir) / "vocabulary.json", encoding="utf-8") as fh:
+        vocabulary = json.load(fh)
+    idf = np.load(Path(vectorizer_dir) / "idf.npy")
+    return _count_vectorizer({term: i for i, term in enumerate(vocabulary)}), idf
+
+
+_embedder = lru_cache(maxsize=4)(get_embedder)
+
+
+def vectorize_chunk(vectorizer_dir: str, prefix: str, texts, *, prune_terms: int = 0,
+                    embed: bool = False, embedding_model: str = None):
+    """
+    TF-IDF rows (and, with `embed`, quantized embeddings) of one chunk,
+    saved as `<prefix>*.npy` shard files.
+    Returns (n_rows, nnz, embedding model name or None).
+    """
+    from sklearn.preprocessing import normalize
+
+    vocab_file = Path(vectorizer_dir) / "vocabulary.json"
+    counter, idf = _load_vectorizer(str(vectorizer_dir), vocab_file.stat().st_mtime_ns)
+    matrix = counter.transform(texts).astype(np.float64)
+    # TfidfTransformer.transform: raw counts * idf, then L2-normalize each row
+    matrix.data *= idf[matrix.indices]
+    matrix = compact_matrix(normalize(matrix, copy=False), prune_terms=prune_terms)
+
+    np.save(f"{prefix}data.npy", matrix.data)
+    np.save(f"{prefix}indices.npy", matrix.indices)
+    np.save(f"{prefix}lengths.npy", np.diff(matrix.indptr))
+
+    model = None
+    if embed:
+        embedder = _embedder(embedding_model)
+        codes, scales = quantize(embedder.encode(list(texts)))
+        np.save(f"{prefix}codes.npy", codes)
+        np.save(f"{prefix}scales.npy", scales)
+        model = embedder.name
+    return matrix.shape[0], matrix.nnz, model
+
+
+# --- driving the passes ---
+
+def _ordered(pool, window: int, fn, calls):
+    """
+    Run fn(*args, **kwargs) for every (args, kwargs) in `calls`, in the pool
+    when there is one, yielding results in order with at most `window`
+    chunks in flight.
+    """
+    if pool is None:
+        for args, kwargs in calls:
+            yield fn(*args, **kwargs)
+        return
+    pending = deque()
+    for args, kwargs in calls:
+        pending.append(pool.submit(fn, *args, **kwargs))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+@contextmanager
+def _pool_for(workers: int, pool=None):
+    if pool is not None or workers <= 1:
+        yield pool
+        return
+    with ProcessPoolExecutor(max_workers=workers) as own:
+        yield own
+
+
+def _chunks(sources, chunk_size: int):
+    """Prepared item chunks of every (media or None, catalog path) in `sources`."""
+    for media, path in sources:
+        for chunk in iter_catalog(path, CATALOG_COLUMNS, chunk_size):
+            chunk = prepare_items(chunk.reset_index(drop=True))
+            if media is not None:
+                chunk["media_type"] = media
+            yield media, chunk
+
+
+def _concat_shards(parts, target: Path, length: int):
+    """Write the 1-d / 2-d shard files `parts` end to end into one .npy at `target`."""
+    first = np.load(parts[0], mmap_mode="r")
+    out = open_memmap(target, mode="w+", dtype=first.dtype, shape=(length,) + first.shape[1:])
+    pos = 0
+    for part in parts:
+        values = np.load(part)
+        out[pos : pos + len(values)] = values
+        pos += len(values)
+    out.flush()
+    del out
+
+
+def _write_matrix(tmp: Path, shards, n_rows: int, nnz: int, n_terms: int):
+    """Assemble the CSR arrays and the posting lists from the shards."""
+    _concat_shards([f"{s}data.npy" for s in shards], tmp / "data.npy", nnz)
+    _concat_shards([f"{s}indices.npy" for s in shards], tmp / "indices.npy", nnz)
+
+    # Same index dtypes compact_matrix / InvertedIndex.from_matrix pick in memory
+    idx_dtype = np.int32 if max(nnz, n_rows) < 2**31 else np.int64
+    indptr = open_memmap(tmp / "indptr.npy", mode="w+",
+                         dtype=np.int32 if nnz < 2**31 else np.int64, shape=(n_rows + 1,))
+    indptr[0] = 0
+    doc_freq = np.zeros(n_terms, dtype=np.int64)
+    row = 0
+    for shard in shards:
+        lengths = np.load(f"{shard}lengths.npy")
+        indptr[row + 1 : row + 1 + len(lengths)] = indptr[row] + np.cumsum(lengths)
+        row += len(lengths)
+        doc_freq += np.bincount(np.load(f"{shard}indices.npy"), minlength=n_terms)
+    indptr.flush()
+    del indptr
+
+    # Posting lists: scatter each shard's entries into its terms' slots. Shards
+    # arrive in row order, so every list ends up sorted by row.
+    post_indptr = np.concatenate([[0], np.cumsum(doc_freq)]).astype(idx_dtype)
+    np.save(tmp / "postings_indptr.npy", post_indptr)
+    post_rows = open_memmap(tmp / "postings_rows.npy", mode="w+", dtype=idx_dtype, shape=(nnz,))
+    post_weights = open_memmap(tmp / "postings_weights.npy", mode="w+", dtype=np.float32,
+                               shape=(nnz,))
+    max_weight = np.zeros(n_terms, dtype=np.float32)
+    cursor = post_indptr[:-1].astype(np.int64)
+    row = 0
+    for shard in shards:
+        cols = np.load(f"{shard}indices.npy")
+        weights = np.load(f"{shard}data.npy")
+        lengths = np.load(f"{shard}lengths.npy")
+        rows = np.repeat(np.arange(row, row + len(lengths), dtype=idx_dtype), lengths)
+        row += len(lengths)
+
+        order = np.argsort(cols, kind="stable")
+        cols, rows, weights = cols[order], rows[order], weights[order]
+        counts = np.bincount(cols, minlength=n_terms)
+        starts = np.cumsum(counts) - counts
+        dest = cursor[cols] + (np.arange(len(cols)) - starts[cols])
+        post_rows[dest] = rows
+        post_weights[dest] = weights
+        cursor += counts
+
+        present = np.flatnonzero(counts)
+        if len(present):
+            shard_max = np.maximum.reduceat(weights, starts[present])
+            max_weight[present] = np.maximum(max_weight[present], shard_max)
+    post_rows.flush()
+    post_weights.flush()
+    del post_rows, post_weights
+    np.save(tmp / "postings_max_weight.npy", max_weight)
+
+
+def _stream_index(media: str, sources, target: Path, source: dict, *, chunk_size: int,
+                  workers: int, pool, neighbours_k: int, embeddings: bool,
+                  embedding_model: str = None, ann: bool = None, prune_terms: int = 0,
+                  ranges: bool = False, rebuild: bool = False) -> Path:
+    tmp = _staging_dir(target)
+    try:
+        shard_dir = tmp / "shards"
+        shard_dir.mkdir()
+        window = 2 * max(1, workers)
+
+        with _pool_for(workers, pool) as pool:
+            runs, rows_per_media = [], {}
+
+            def count_calls():
+                for chunk_media, chunk in _chunks(sources, chunk_size):
+                    rows_per_media.setdefault(chunk_media, 0)
+                    rows_per_media[chunk_media] += len(chunk)
+                    runs.append(f"{shard_dir / f'run{len(runs):06d}'}_")
+                    yield (chunk["content"].tolist(), runs[-1]), {}
+
+            n_docs = sum(_ordered(pool, window, count_chunk, count_calls()))
+            if not n_docs:
+                raise ValueError(f"No items in {', '.join(str(p) for _, p in sources)}")
+
+            tf, df = merge_runs(runs, shard_dir / "terms.txt")
+            vocabulary, idf = pick_vocabulary(
+                shard_dir / "terms.txt", tf, df, n_docs, TFIDF_PARAMS["max_features"]
+            )
+            _save_vectorizer(tmp, vocabulary, idf, _count_vectorizer().get_stop_words())
+            del tf, df
+            for path in shard_dir.iterdir():
+                path.unlink()
+
+            slims, shards = [], []
+
+            def vectorize_calls():
+                for _, chunk in _chunks(sources, chunk_size):
+                    prefix = f"{shard_dir / f'{len(shards):06d}'}_"
+                    shards.append(prefix)
+                    slims.append(serving_items(chunk))
+                    yield (str(tmp), prefix, chunk["content"].tolist()), {
+                        "prune_terms": prune_terms, "embed": embeddings,
+                        "embedding_model": embedding_model,
+                    }
+
+            n_rows = nnz = 0
+            model = None
+            for chunk_rows, chunk_nnz, model in _ordered(pool, window, vectorize_chunk,
+                                                         vectorize_calls()):
+                n_rows += chunk_rows
+                nnz += chunk_nnz
+
+        _write_matrix(tmp, shards, n_rows, nnz, len(vocabulary))
+        embedding_meta = None
+        if embeddings:
+            for part, name in (("codes", "embeddings"), ("scales", "embedding_scales")):
+                _concat_shards([f"{s}{part}.npy" for s in shards], tmp / f"{name}.npy", n_rows)
+            embedding_meta = {"model": model, "dtype": "int8"}
+        shutil.rmtree(shard_dir)
+
+        if ranges:
+            start, source["ranges"] = 0, {}
+            for chunk_media, count in rows_per_media.items():
+                source["ranges"][chunk_media] = [start, start + count]
+                start += count
+
+        data, indices, indptr = (np.load(tmp / f"{name}.npy", mmap_mode="r") for name in _ARRAYS)
+        matrix = csr_matrix((data, indices, indptr), shape=(n_rows, len(vocabulary)), copy=False)
+        matrix.has_sorted_indices = True
+        matrix.has_canonical_format = True
+
+        return _finish_index(
+            media, tmp, target, source, matrix, pd.concat(slims, ignore_index=True),
+            ngram_range=TFIDF_PARAMS["ngram_range"], neighbours_k=neighbours_k,
+            embedding_meta=embedding_meta, ann=bool(ann), prune_terms=prune_terms,
+            rebuild=rebuild,
+        )
+    except BaseException:
+        # Shards of a big catalog are big; don't leave them behind
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def build_index_streaming(
+    media: str,
+    path: Path,
+    index_dir: Path = INDEX_DIR,
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = 1,
+    pool=None,
+    neighbours_k: int = NEIGHBOURS_K,
+    embeddings: bool = True,
+    embedding_model: str = None,
+    ann: bool = None,
+    prune_terms: int = 0,
+    rebuild: bool = False,
+) -> Path:
+    """
+    build_index() for one catalog, read `chunk_size` rows at a time and
+    vectorized in `workers` processes (or in the given executor `pool`).
+    """
+    path = Path(path)
+    fingerprint = catalog_fingerprint(path)
+    target = index_dir_for(media, fingerprint, index_dir)
+    source = {
+        "source": path.name,
+        "source_sha256": fingerprint,
+        # ANN only on request: its build is not bounded by the chunk size
+        "build_options": _build_options(neighbours_k=neighbours_k, embeddings=embeddings,
+                                        embedding_model=embedding_model, ann=bool(ann),
+                                        prune_terms=prune_terms),
+    }
+    if _reuse_existing(target, source, rebuild):
+        return target
+    return _stream_index(
+        media,
+        [(None, path)],
+        target,
+        source,
+        chunk_size=chunk_size,
+        workers=workers,
+        pool=pool,
+        neighbours_k=neighbours_k,
+        embeddings=embeddings,
+        embedding_model=embedding_model,
+        ann=ann,
+        prune_terms=prune_terms,
+        rebuild=rebuild,
+    )
+
+
+def build_unified_index_streaming(paths: Dict[str, Path], index_dir: Path = INDEX_DIR, *,
+                                  chunk_size: int = CHUNK_SIZE, workers: int = 1, pool=None,
+                                  ann: bool = None, prune_terms: int = 0,
+                                  rebuild: bool = False) -> Path:
+    """build_unified_index() over chunks of every catalog in `paths`."""
+    fingerprint = unified_fingerprint(paths)
+    target = index_dir_for(UNIFIED_MEDIA, fingerprint, index_dir)
+    source = {
+        "sources": {media: Path(path).name for media, path in paths.items()},
+        "source_sha256": fingerprint,
+        "build_options": _build_options(ann=bool(ann), prune_terms=prune_terms),
+    }
+    if _reuse_existing(target, source, rebuild):
+        return target
+    return _stream_index(
+        UNIFIED_MEDIA,
+        list(paths.items()),
+        target,
+        source,
+        chunk_size=chunk_size,
+        workers=workers,
+        pool=pool,
+        neighbours_k=0,
+        embeddings=False,
+        ann=ann,
+        prune_terms=prune_terms,
+        ranges=True,
+        rebuild=rebuild,
+    )
+
+
+def build_indexes_streaming(paths: Dict[str, Path], index_dir: Path = INDEX_DIR, *,
+                            unified_paths: Dict[str, Path] = None, workers: int = 1,
+                            chunk_size: int = CHUNK_SIZE, **options) -> Dict[str, Path]:
+    """
+    Stream-build every {media: catalog} in `paths` (plus the shared-vocabulary
+    index over `unified_paths`). With `workers` > 1 the builds run side by
+    side, feeding their chunks to one process pool of that size.
+    """
+    jobs = {
+        media: (build_index_streaming, (media, path, index_dir), options)
+        for media, path in paths.items()
+    }
+    if unified_paths:
+        unified_options = {
+            k: v for k, v in options.items() if k in ("ann", "prune_terms", "rebuild")
+        }
+        jobs[UNIFIED_MEDIA] = (build_unified_index_streaming, (unified_paths, index_dir),
+                               unified_options)
+
+    def run(media, pool):
+        build, args, kwargs = jobs[media]
+        start = time.perf_counter()
+        target = build(*args, chunk_size=chunk_size, workers=workers, pool=pool, **kwargs)
+        print(f"✅ {media}: {target} ({time.perf_counter() - start:.1f}s)")
+        return target
+
+    with _pool_for(workers) as pool:
+        if pool is None or len(jobs) < 2:
+            return {media: run(media, pool) for media in jobs}
+        with ThreadPoolExecutor(max_workers=len(jobs)) as threads:
+            futures = {media: threads.submit(run, media, pool) for media in jobs}
+            return {media: future.result() for media, future in futures.items()}
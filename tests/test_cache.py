@@ -0,0 +1,15 @@
+from cache import ResponseCache
+
+
+def test_set_after_invalidate_is_dropped():
+    cache = ResponseCache(max_bytes=2**20)
+    stale = cache.key("anime", "similar", 1)
+    cache.invalidate("anime")  # engine swapped while the response was computed
+    cache.set(stale, b"old")
+    assert cache.stats()["entries"] == 0 and cache.nbytes == 0
+
+    fresh = cache.key("anime", "similar", 1)
+    cache.set(fresh, b"new")
+    assert cache.get(fresh) == b"new"
+    cache.set(cache.key("manga", "similar", 1), b"other media")
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,53 @@
+import json
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from index_store import build_index, load_index
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """An index whose embeddings claim a model this host doesn't have."""
+    catalog = tmp_path / "anime.csv"
+    pd.DataFrame({
+        "item_id": range(1, 13),
+        "title": [f"Show {i}" for i in range(1, 13)],
+        "genres": ["Action|Drama", "Comedy|Romance", "Sports"] * 4,
+        "description": [f"pirates sail the sea looking for treasure {i % 3}" if i % 2 else
+                        f"students fall in love at school festival {i % 3}" for i in range(12)],
+        "image_url": ["https://placehold.co/400x600"] * 12,
+    }).to_csv(catalog, index=False)
+    target = build_index("anime", catalog, tmp_path / "index", neighbours_k=0,
+                         embedding_model="hashing-384", ann=False)
+    manifest = json.loads((target / "manifest.json").read_text())
+    manifest["embedding"]["model"] = "not-installed-model"
+    (target / "manifest.json").write_text(json.dumps(manifest))
+    return load_index(target)
+
+
+def test_missing_model_is_detected_at_load(engine, capsys):
+    assert not engine.embeddings.can_encode
+    with pytest.raises(RuntimeError):
+        engine.embeddings.encode("pirates")
+    # Item-to-item scoring only needs the stored vectors
+    assert engine.embeddings.scores(engine.embeddings.vector(0)).shape == (12,)
+
+
+def test_text_queries_fall_back_to_tfidf(engine, monkeypatch):
+    monkeypatch.setitem(api.ENGINE_STATE, "anime", engine)
+    client = TestClient(api.app)
+    response = client.get("/recommend", params={
+        "query": "a crew of pirates sailing the sea looking for buried treasure",
+        "engine": "embedding", "topn": 3,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["engine_used"].startswith("TF-IDF")
+    assert len(body["recommendations"]) == 3
+
+    by_item = client.get("/recommend", params={"query": "Show 1", "engine": "embedding"})
+    assert by_item.status_code == 200
+    assert by_item.json()["engine_used"].startswith("Embedding")
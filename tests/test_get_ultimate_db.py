@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import httpx
+
+import get_ultimate_db
+from catalog import catalog_path, read_catalog
+
+
+def _item(stem, page, i):
+    return {"mal_id": page * 100 + i, "title": f"{stem} {page}.{i}", "synopsis": "Text\nhere",
+            "genres": [{"name": "Action"}], "images": {"jpg": {"image_url": "http://img/x.jpg"}}}
+
+
+class FakeJikan:
+    """Serves three pages per category; failures are queued per (stem, page)."""
+
+    def __init__(self):
+        self.requests = []
+        self.failures = {}
+
+    def __call__(self, request):
+        params = request.url.params
+        stem = params.get("type", "anime")
+        page = int(params["page"])
+        self.requests.append((stem, page))
+        queued = self.failures.get((stem, page))
+        if queued:
+            return queued.pop(0)
+        items = [_item(stem, page, i) for i in range(int(params["limit"]))]
+        if stem == "manhwa" and page == 1:
+            del items[0]["mal_id"]  # malformed item: skipped, not fatal
+        return httpx.Response(200, json={"data": items, "pagination": {"has_next_page": page < 3}})
+
+    def pages(self, stem):
+        return [page for s, page in self.requests if s == stem]
+
+
+def test_failed_category_resumes_from_its_checkpoint(tmp_path):
+    jikan = FakeJikan()
+    jikan.failures = {
+        ("anime", 3): [httpx.Response(404)],
+        ("manga", 1): [httpx.Response(429, headers={"Retry-After": "0"})] * 2,
+        ("manhwa", 2): [httpx.Response(200, content=b"<html>bad gateway</html>")],
+    }
+
+    def run():
+        return asyncio.run(get_ultimate_db.run(
+            target=1000, base_url="http://jikan.test/v4", data_dir=tmp_path,
+            rate=1000.0, burst=10, transport=httpx.MockTransport(jikan),
+        ))
+
+    assert run() == [False, True, True]
+    assert jikan.pages("manga") == [1, 1, 1, 2, 3]  # 429s retried, not counted as failures
+    assert jikan.pages("manhwa") == [1, 2, 2, 3]  # unreadable page retried
+    progress = tmp_path / (catalog_path(tmp_path, "anime").name + ".progress.json")
+    assert json.loads(progress.read_text())["next_page"] == 3
+
+    jikan.requests.clear()
+    assert run() == [True, True, True]
+    assert jikan.pages("anime") == [3]
+    anime = read_catalog(catalog_path(tmp_path, "anime"))
+    assert len(anime) == 3 * get_ultimate_db.PAGE_SIZE
+    assert anime["item_id"].is_unique
+    manhwa = read_catalog(catalog_path(tmp_path, "manhwa"))
+    assert len(manhwa) == 3 * get_ultimate_db.PAGE_SIZE - 1
+
+
+def test_a_page_gives_up_after_the_rate_limit_budget(monkeypatch):
+    monkeypatch.setattr(get_ultimate_db, "MAX_RATE_LIMIT_WAIT", 0.2)
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(429, headers={"Retry-After": "0.05"})
+
+    async def main():
+        limiter = get_ultimate_db.TokenBucket(rate=1000.0, capacity=10)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await get_ultimate_db.fetch_page(client, limiter, "http://jikan.test/v4/top/anime", {})
+
+    assert asyncio.run(main()) is None
+    assert len(calls) == 5
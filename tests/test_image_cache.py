@@ -0,0 +1,148 @@
+import asyncio
+import socket
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import image_cache
+from image_cache import ImageCache, ImageFetchError
+
+COVER = "https://cdn.myanimelist.net/images/anime/1.jpg"
+GIF = b"GIF89a not really decodable"  # cached as-is when Pillow can't read it
+
+
+@pytest.fixture
+def dns(monkeypatch):
+    """Hostname -> address table standing in for the resolver."""
+    table = {"cdn.myanimelist.net": "93.184.216.34", "placehold.co": "93.184.216.35"}
+
+    async def getaddrinfo(self, host, port, **kwargs):
+        address = table[host]
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        return [(family, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", getaddrinfo)
+    return table
+
+
+def _fetch(tmp_path, handler, url=COVER):
+    async def main():
+        cache = ImageCache(tmp_path, max_bytes=2**20, origin="",
+                           transport=httpx.MockTransport(handler))
+        try:
+            return await cache.get(url)
+        finally:
+            await cache.aclose()
+
+    return asyncio.run(main())
+
+
+def test_connects_to_the_checked_address(tmp_path, dns):
+    seen = []
+
+    def handler(request):
+        seen.append((request.url.host, request.headers["host"], request.extensions.get("sni_hostname")))
+        return httpx.Response(200, content=GIF, headers={"content-type": "image/gif"})
+
+    assert _fetch(tmp_path, handler).data == GIF
+    assert seen == [("93.184.216.34", "cdn.myanimelist.net", "cdn.myanimelist.net")]
+
+
+@pytest.mark.parametrize("address", ["10.0.0.5", "127.0.0.1", "169.254.169.254", "::ffff:127.0.0.1", "fd00::1"])
+def test_private_addresses_are_refused(tmp_path, dns, address):
+    dns["cdn.myanimelist.net"] = address
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, content=GIF, headers={"content-type": "image/gif"})
+
+    with pytest.raises(ImageFetchError, match="non-public"):
+        _fetch(tmp_path, handler)
+    assert calls == []
+
+
+def test_redirect_hops_are_checked_and_limited(tmp_path, dns):
+    dns["placehold.co"] = "192.168.1.1"
+    calls = []
+
+    def to_private(request):
+        calls.append(request.url.host)
+        return httpx.Response(302, headers={"location": "https://placehold.co/x.png"})
+
+    with pytest.raises(ImageFetchError, match="non-public"):
+        _fetch(tmp_path, to_private)
+    assert calls == ["93.184.216.34"]
+
+    def off_hosts(request):
+        return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data"})
+
+    with pytest.raises(ImageFetchError, match="off the allowed hosts"):
+        _fetch(tmp_path, off_hosts)
+
+    calls.clear()
+
+    def loop(request):
+        calls.append(request.url.path)
+        return httpx.Response(302, headers={"location": f"/hop{len(calls)}.jpg"})
+
+    with pytest.raises(ImageFetchError, match="redirects"):
+        _fetch(tmp_path, loop)
+    assert len(calls) == image_cache.MAX_REDIRECTS + 1
+    assert calls[1] == "/hop1.jpg"  # relative Location joined to the original host
+
+
+def test_oversized_sources_are_refused(tmp_path, dns, monkeypatch):
+    monkeypatch.setattr(image_cache, "MAX_SOURCE_BYTES", 100)
+
+    def declared(request):
+        return httpx.Response(200, content=b"x" * 101, headers={"content-type": "image/gif"})
+
+    with pytest.raises(ImageFetchError, match="larger than"):
+        _fetch(tmp_path, declared)
+
+    async def chunks():
+        for _ in range(5):
+            yield b"x" * 30
+
+    def streamed(request):
+        return httpx.Response(200, content=chunks(), headers={"content-type": "image/gif"})
+
+    with pytest.raises(ImageFetchError, match="larger than"):
+        _fetch(tmp_path, streamed)
+
+    def not_an_image(request):
+        return httpx.Response(200, content=b"<html>", headers={"content-type": "text/html"})
+
+    with pytest.raises(ImageFetchError, match="not an image"):
+        _fetch(tmp_path, not_an_image)
+
+
+def test_images_endpoint_serves_etags_and_304s(tmp_path, dns, monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(200, content=GIF, headers={"content-type": "image/gif"})
+
+    columns = SimpleNamespace(row_of={1: 0, 2: 1}, image_urls=[COVER, "file:///etc/passwd"])
+    monkeypatch.setitem(api.ENGINE_STATE, "anime", SimpleNamespace(columns=columns))
+    monkeypatch.setattr(api, "IMAGES", ImageCache(tmp_path, max_bytes=2**20, origin="",
+                                                  transport=httpx.MockTransport(handler)))
+    client = TestClient(api.app)
+
+    first = client.get("/images/anime/1")
+    assert first.status_code == 200 and first.content == GIF
+    etag = first.headers["etag"]
+
+    again = client.get("/images/anime/1", headers={"If-None-Match": f'"other", {etag}'})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+    assert client.get("/images/anime/1", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert calls == [1]  # later requests are served from the disk cache
+
+    assert client.get("/images/anime/2").status_code == 404
+    assert client.get("/images/anime/3").status_code == 404
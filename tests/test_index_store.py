@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+import index_store
+from index_store import build_index, read_manifest
+
+GENRES = ["Action|Adventure", "Comedy|Romance", "Drama|Action", "Romance|Drama", "Comedy|Slice of Life"]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "anime.csv"
+    pd.DataFrame({
+        "item_id": range(1, 21),
+        "title": [f"Show {i}" for i in range(1, 21)],
+        "genres": [GENRES[i % len(GENRES)] for i in range(20)],
+        "description": [f"A story about heroes {i % 4} and friends {i % 3} on a journey" for i in range(20)],
+        "image_url": ["https://placehold.co/400x600"] * 20,
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_existing_index_is_reused_only_for_the_same_options(tmp_path, catalog, monkeypatch):
+    options = dict(neighbours_k=3, embeddings=False, ann=False)
+    target = build_index("anime", catalog, tmp_path / "index", **options)
+    assert read_manifest(target)["build_options"]["neighbours_k"] == 3
+
+    fits = []
+    fit = index_store.build_tfidf_matrix
+    monkeypatch.setattr(index_store, "build_tfidf_matrix", lambda items: fits.append(1) or fit(items))
+
+    assert build_index("anime", catalog, tmp_path / "index", **options) == target
+    assert fits == []  # same catalog, same options: not even refitted
+
+    build_index("anime", catalog, tmp_path / "index", **options, prune_terms=4)
+    assert fits == [1]
+    assert read_manifest(target)["prune_terms"] == 4
+
+    build_index("anime", catalog, tmp_path / "index", **options, prune_terms=4, rebuild=True)
+    assert fits == [1, 1]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import linear_kernel
+
+from inverted_index import InvertedIndex
+from test_top_k import reference_top_k
+
+
+def _matrix(rng, n_rows, n_terms):
+    # Weights from {0.5, 1} keep every dot product exact, so tied rows tie
+    # bit-for-bit in both scoring orders
+    matrix = sp.random(n_rows, n_terms, density=0.05, format="csr", random_state=rng,
+                       data_rvs=lambda size: rng.choice([0.5, 1.0], size))
+    return matrix.astype(np.float32)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_maxscore_search_matches_full_scoring(seed):
+    rng = np.random.default_rng(seed)
+    matrix = _matrix(rng, 400, 60)
+    index = InvertedIndex.from_matrix(matrix)
+    for _ in range(10):
+        query = sp.random(1, 60, density=0.1, format="csr", random_state=rng,
+                          data_rvs=lambda size: rng.choice([0.5, 1.0], size))
+        query.sort_indices()
+        scores = linear_kernel(query, matrix).ravel()
+        k = int(rng.integers(1, 30))
+        exclude = int(rng.integers(0, 400))
+        allowed = rng.random(400) < 0.3
+
+        for kwargs in ({}, {"exclude": exclude}, {"allowed": allowed},
+                       {"exclude": [exclude, (exclude + 1) % 400], "allowed": allowed}):
+            indices, got = index.search(query, k, **kwargs)
+            expected = reference_top_k(scores, k, **kwargs)
+            assert np.array_equal(indices, expected), kwargs
+            assert np.allclose(got, scores[expected])
+
+
+def test_maxscore_search_pads_with_unmatched_rows():
+    matrix = sp.csr_matrix(np.array([[0, 1], [1, 0], [0, 0], [0, 1]], dtype=np.float32))
+    index = InvertedIndex.from_matrix(matrix)
+    indices, scores = index.search(sp.csr_matrix([[0.0, 1.0]]), 4, exclude=3)
+    assert indices.tolist() == [0, 1, 2]
+    assert scores.tolist() == [1.0, 0.0, 0.0]
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+
+from jikan_client import JikanClient, retry_after_seconds
+
+
+def _client(handler, **kwargs):
+    kwargs.setdefault("rate", 1000.0)
+    kwargs.setdefault("burst", 100)
+    return JikanClient("http://jikan.test/v4", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_results_are_cached_per_normalized_query():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params["q"])
+        return httpx.Response(200, json={"data": [{"title": "Naruto"}]})
+
+    async def main():
+        client = _client(handler)
+        first = await client.search("Naruto")
+        second = await client.search("  naruto ")
+        await client.aclose()
+        return first, second
+
+    first, second = _run(main())
+    assert first == second == {"title": "Naruto"}
+    assert calls == ["naruto"]
+
+
+def test_empty_results_are_cached_for_negative_ttl():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(200, json={"data": []})
+
+    async def main(negative_ttl):
+        client = _client(handler, negative_ttl=negative_ttl)
+        results = [await client.search("nothing"), await client.search("nothing")]
+        await client.aclose()
+        return results
+
+    assert _run(main(600.0)) == [None, None]
+    assert len(calls) == 1
+    _run(main(0.0))
+    assert len(calls) == 3  # expired straight away, so asked again
+
+
+def test_upstream_errors_and_bad_payloads_are_not_cached():
+    bodies = [
+        httpx.Response(500),
+        httpx.Response(200, json=["not", "an", "object"]),
+        httpx.Response(200, json="text"),
+        httpx.Response(200, json={"data": {"title": "dict, not list"}}),
+        httpx.Response(200, json={"data": ["not an object"]}),
+        httpx.Response(200, content=b"{not json", headers={"content-type": "application/json"}),
+        httpx.Response(200, json={"data": [{"title": "Finally"}]}),
+    ]
+
+    def handler(request):
+        return bodies.pop(0)
+
+    async def main():
+        client = _client(handler)
+        results = [await client.search("q") for _ in range(7)]
+        await client.aclose()
+        return results
+
+    assert _run(main()) == [None] * 6 + [{"title": "Finally"}]
+
+
+def test_concurrent_identical_lookups_share_one_request():
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"data": [{"title": "One"}]})
+
+    async def main():
+        client = _client(handler)
+        results = await asyncio.gather(*(client.search("one") for _ in range(10)))
+        await client.aclose()
+        return results
+
+    assert _run(main()) == [{"title": "One"}] * 10
+    assert len(calls) == 1
+
+
+def test_429_backs_off_for_retry_after():
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.3"})
+        return httpx.Response(200, json={"data": [{"title": "Later"}]})
+
+    async def main():
+        client = _client(handler, rate=10.0, burst=5)
+        first = await client.search("q")
+        slowed_rate = client.limiter.rate
+        second = await client.search("q")
+        await client.aclose()
+        return first, slowed_rate, second
+
+    first, slowed_rate, second = _run(main())
+    assert first is None  # the 429 itself is not cached as "no result"
+    assert slowed_rate == 5.0
+    assert second == {"title": "Later"}
+    assert calls[1] - calls[0] >= 0.25
+
+
+def test_lookups_give_up_instead_of_queueing_past_max_wait():
+    def handler(request):
+        return httpx.Response(200, json={"data": [{"title": request.url.params["q"]}]})
+
+    async def main():
+        client = _client(handler, rate=1.0, burst=1, max_wait=0.1)
+        start = time.monotonic()
+        results = await asyncio.gather(client.search("a"), client.search("b"))
+        elapsed = time.monotonic() - start
+        await client.aclose()
+        return results, elapsed
+
+    results, elapsed = _run(main())
+    assert results == [{"title": "a"}, None]
+    assert elapsed < 0.5
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert retry_after_seconds("7") == 7.0
+    assert 8 <= retry_after_seconds(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert retry_after_seconds(formatdate(time.time() - 60, usegmt=True)) == 0.0
+    assert retry_after_seconds("soon") == 5.0
+    assert retry_after_seconds(None) == 5.0
@@ -0,0 +1,27 @@
+import asyncio
+
+import metrics
+
+
+def test_sampled_requests_write_a_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", tmp_path)
+
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def app(scope, receive, send):
+        scope["endpoint"] = endpoint
+        await asyncio.sleep(0.02)
+        await endpoint(scope, receive, send)
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(metrics.MetricsMiddleware(app)({"type": "http"}, None, send))
+    assert sent[0]["status"] == 204
+    [profile] = tmp_path.glob("*-endpoint-*.collapsed")
+    assert profile.read_text().strip()
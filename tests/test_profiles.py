@@ -0,0 +1,41 @@
+import numpy as np
+import scipy.sparse as sp
+
+from profiles import TasteProfile
+
+
+def _matrix(seed=0):
+    rng = np.random.default_rng(seed)
+    return sp.random(50, 200, density=0.1, format="csr", random_state=rng, dtype=np.float32)
+
+
+def test_add_then_remove_round_trips():
+    matrix = _matrix()
+    profile = TasteProfile(matrix)
+    profile.add(3, 0.3)
+    profile.add(7, 0.7)
+    profile.remove(7)
+    assert profile.weights == {3: 0.3}
+    assert profile.vector.nnz == matrix[3].nnz  # no cancelled terms left behind
+    assert np.allclose(profile.vector.toarray(), 0.3 * matrix[3].toarray())
+
+    profile.remove(3)
+    assert profile.vector.nnz == 0 and not profile.weights
+
+
+def test_sync_recomputes_without_drift():
+    matrix = _matrix(1)
+    rng = np.random.default_rng(2)
+    profile = TasteProfile(matrix)
+    for _ in range(200):
+        rows = rng.choice(50, 8, replace=False)
+        profile.sync({int(r): float(w) for r, w in zip(rows, rng.normal(size=8))})
+    final = {1: 0.1, 2: 0.2, 4: -0.3}
+    assert profile.sync(final) > 0
+
+    fresh = TasteProfile(matrix)
+    fresh.sync(final)
+    assert profile.weights == fresh.weights
+    assert np.array_equal(profile.vector.toarray(), fresh.vector.toarray())
+    assert np.array_equal(profile.rank(10)[0], fresh.rank(10)[0])
+    assert profile.sync(final) == 0
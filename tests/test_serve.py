@@ -0,0 +1,19 @@
+from collections import deque
+
+import serve
+
+
+def test_restart_delay_backs_off_then_gives_up_on_a_crash_loop(monkeypatch):
+    monkeypatch.setattr(serve, "MAX_RESTARTS", 4)
+    crashes = deque()
+    delays = [serve.restart_delay(crashes, t) for t in (0.0, 1.0, 2.0, 3.0)]
+    assert delays == [0.5, 1.0, 2.0, 4.0]
+    assert serve.restart_delay(crashes, 4.0) is None
+
+
+def test_old_crashes_fall_out_of_the_window():
+    crashes = deque()
+    for t in range(serve.MAX_RESTARTS):
+        assert serve.restart_delay(crashes, float(t)) is not None
+    later = serve.RESTART_WINDOW + serve.MAX_RESTARTS + 1
+    assert serve.restart_delay(crashes, later) == serve.RESTART_DELAY
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+
+from catalog import catalog_path, read_catalog
+from title_index import TitleIndex
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+@pytest.mark.parametrize("media", ["anime", "manga", "manhwa"])
+def test_every_catalog_title_resolves_to_its_own_row(media):
+    path = catalog_path(DATA_DIR, media)
+    if not path.exists():
+        pytest.skip(f"{path} not found")
+    titles = read_catalog(path, ["title"])["title"].astype(str).tolist()
+    index = TitleIndex(titles)
+
+    first_row = {}
+    for row, title in enumerate(titles):
+        first_row.setdefault(title.lower().strip(), row)
+    for title in titles:
+        expected = first_row[title.lower().strip()]
+        assert index.lookup(title) == expected, title
+        assert index.search(title, limit=1)[0][0] == expected, title
+
+
+def test_punctuation_variants_stay_distinct():
+    index = TitleIndex(["K-On!", "K-On!!", "Gintama", "Gintama'", "Gintama°"])
+    assert [index.lookup(t) for t in index.titles] == [0, 1, 2, 3, 4]
+    assert index.lookup("k-on") == 0  # still found through the normalized tier
+
+    updated = index.with_updates({0: "Clannad", 5: "K-On!!"})
+    assert updated.lookup("Clannad") == 0
+    assert updated.lookup("K-On!") == 1  # raw key gone, normalized tier falls back
+    assert updated.lookup("K-On!!") == 1
+    assert index.lookup("K-On!") == 0
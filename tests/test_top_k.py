@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from recommender import top_k_indices
+
+
+def reference_top_k(scores, k, exclude=None, allowed=None):
+    """Full stable sort: best first, ties by lower index."""
+    eligible = np.ones(len(scores), dtype=bool) if allowed is None else np.array(allowed, dtype=bool)
+    if exclude is not None:
+        eligible[np.atleast_1d(exclude)] = False
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind="stable")
+    return order[eligible[order]][: max(k, 0)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_k_matches_a_stable_full_sort_on_ties(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 200))
+    scores = rng.integers(0, 5, n).astype(np.float32)  # heavy ties
+    for k in (0, 1, 5, n // 2, n, n + 3, -1):
+        assert np.array_equal(top_k_indices(scores, k), reference_top_k(scores, k))
+        exclude = rng.integers(0, n, 3).tolist()  # may repeat
+        assert np.array_equal(top_k_indices(scores, k, exclude=exclude),
+                              reference_top_k(scores, k, exclude=exclude))
+        allowed = rng.random(n) < 0.5
+        assert np.array_equal(top_k_indices(scores, k, exclude=exclude[0], allowed=allowed),
+                              reference_top_k(scores, k, exclude=exclude[0], allowed=allowed))
@@ -0,0 +1,294 @@
+"""
+Prebuilt title lookup for one dataset.
+
+Built once when a dataset is loaded so resolving a user query never scans the
+whole catalog:
+
+- exact lookups go through dicts keyed on the lowercased title as written, then on
+  normalized / romanization-folded titles (which can merge "K-On!" and "K-On!!")
+- prefix lookups bisect a sorted list of normalized titles
+- substring lookups intersect trigram posting lists and verify the survivors
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# Common alternative spellings of long vowels / particles in romanized titles
+# ("Kyoujin" vs "Kyojin", "Shippuuden" vs "Shippuden", "wo" vs "o").
+_ROMANIZATION = [
+    (re.compile(r"ou"), "o"),
+    (re.compile(r"oo"), "o"),
+    (re.compile(r"uu"), "u"),
+    (re.compile(r"aa"), "a"),
+    (re.compile(r"ii"), "i"),
+    (re.compile(r"ee"), "e"),
+    (re.compile(r"\bwo\b"), "o"),
+]
+
+# Match quality tiers, best first.
+EXACT, FOLDED, PREFIX, WORD, SUBSTRING = range(5)
+
+
+def normalize_title(text: str) -> str:
+    """Lowercase, strip accents/macrons and collapse punctuation to single spaces."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def raw_title(text: str) -> str:
+    """Lowercased title as written, so punctuation-only variants stay distinct."""
+    return str(text).lower().strip()
+
+
+def fold_romanization(normalized: str) -> str:
+    for pattern, repl in _ROMANIZATION:
+        normalized = pattern.sub(repl, normalized)
+    return normalized
+
+
+def _trigrams(text: str):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class TitleIndex:
+    """
+    Title -> row index lookup over a fixed list of titles.
+    Row indices are positions in the list (i.e. `items.iloc` positions).
+    """
+
+    def __init__(self, titles):
+        self.titles = [str(t) for t in titles]
+        self.raw = [raw_title(t) for t in self.titles]
+        self.normalized = [normalize_title(t) for t in self.titles]
+        self.folded = [fold_romanization(n) for n in self.normalized]
+
+        self._raw = {}
+        self._exact = {}
+        self._folded = {}
+        for idx, (raw, norm, folded) in enumerate(zip(self.raw, self.normalized, self.folded)):
+            # Keep the first (most popular) row for duplicate titles
+            self._raw.setdefault(raw, idx)
+            self._exact.setdefault(norm, idx)
+            self._folded.setdefault(folded, idx)
+
+        order = sorted(range(len(self.normalized)), key=lambda i: (self.normalized[i], i))
+        self._sorted_keys = [self.normalized[i] for i in order]
+        self._sorted_rows = order
+
+        self._postings = self._build_postings(self.normalized)
+        self._folded_postings = self._build_postings(self.folded)
+
+    @staticmethod
+    def _build_postings(keys):
+        postings = {}
+        for idx, key in enumerate(keys):
+            for gram in _trigrams(key):
+                postings.setdefault(gram, []).append(idx)
+        return {g: np.asarray(rows, dtype=np.int32) for g, rows in postings.items()}
+
+    def __len__(self):
+        return len(self.titles)
+
+    def with_updates(self, updates: dict) -> "TitleIndex":
+        """
+        Copy of this index with {row: title} applied. Rows past the end are
+        appended (they must be contiguous); existing rows are retitled. Only
+        the affected dict keys, sorted positions and posting lists are
+        touched, and the original index stays valid for in-flight readers.
+        """
+        new = TitleIndex.__new__(TitleIndex)
+        new.titles = list(self.titles)
+        new.raw = list(self.raw)
+        new.normalized = list(self.normalized)
+        new.folded = list(self.folded)
+        new._raw = dict(self._raw)
+        new._exact = dict(self._exact)
+        new._folded = dict(self._folded)
+        new._sorted_keys = list(self._sorted_keys)
+        new._sorted_rows = list(self._sorted_rows)
+        new._postings = dict(self._postings)
+        new._folded_postings = dict(self._folded_postings)
+
+        for row, title in sorted(updates.items()):
+            if row < len(new.titles):
+                new._remove(row)
+            else:
+                new.titles.append(None)
+                new.raw.append(None)
+                new.normalized.append(None)
+                new.folded.append(None)
+            new._insert(row, str(title))
+        return new
+
+    def _remove(self, row: int):
+        raw, norm, folded = self.raw[row], self.normalized[row], self.folded[row]
+
+        pos = bisect_left(self._sorted_keys, norm)
+        while self._sorted_rows[pos] != row:
+            pos += 1
+        del self._sorted_keys[pos]
+        del self._sorted_rows[pos]
+
+        # If this row owned a lookup key, hand it to the next row sharing it
+        if self._raw.get(raw) == row:
+            others = [i for i, key in enumerate(self.raw) if key == raw and i != row]
+            if others:
+                self._raw[raw] = others[0]
+            else:
+                del self._raw[raw]
+        if self._exact.get(norm) == row:
+            others = list(self._rows_with_norm(norm))
+            if others:
+                self._exact[norm] = min(others)
+            else:
+                del self._exact[norm]
+        if self._folded.get(folded) == row:
+            others = [i for i, key in enumerate(self.folded) if key == folded and i != row]
+            if others:
+                self._folded[folded] = others[0]
+            else:
+                del self._folded[folded]
+
+        for postings, key in ((self._postings, norm), (self._folded_postings, folded)):
+            for gram in _trigrams(key):
+                rows = postings[gram]
+                rows = rows[rows != row]
+                if len(rows):
+                    postings[gram] = rows
+                else:
+                    del postings[gram]
+
+    def _rows_with_norm(self, norm: str):
+        pos = bisect_left(self._sorted_keys, norm)
+        while pos < len(self._sorted_keys) and self._sorted_keys[pos] == norm:
+            yield self._sorted_rows[pos]
+            pos += 1
+
+    def _insert(self, row: int, title: str):
+        raw = raw_title(title)
+        norm = normalize_title(title)
+        folded = fold_romanization(norm)
+        self.titles[row], self.raw[row] = title, raw
+        self.normalized[row], self.folded[row] = norm, folded
+
+        if self._raw.get(raw, row) >= row:
+            self._raw[raw] = row
+        if self._exact.get(norm, row) >= row:
+            self._exact[norm] = row
+        if self._folded.get(folded, row) >= row:
+            self._folded[folded] = row
+
+        pos = bisect_left(self._sorted_keys, norm)
+        while (
+            pos < len(self._sorted_keys)
+            and self._sorted_keys[pos] == norm
+            and self._sorted_rows[pos] < row
+        ):
+            pos += 1
+        self._sorted_keys.insert(pos, norm)
+        self._sorted_rows.insert(pos, row)
+
+        for postings, key in ((self._postings, norm), (self._folded_postings, folded)):
+            for gram in _trigrams(key):
+                rows = postings.get(gram)
+                if rows is None:
+                    postings[gram] = np.array([row], dtype=np.int32)
+                else:
+                    postings[gram] = np.insert(rows, np.searchsorted(rows, row), row).astype(np.int32)
+
+    def lookup(self, query: str):
+        """O(1) exact match on the title as written, then normalized, then romanization-folded."""
+        idx = self._raw.get(raw_title(query))
+        if idx is not None:
+            return idx
+        norm = normalize_title(query)
+        if not norm:
+            return None
+        idx = self._exact.get(norm)
+        if idx is None:
+            idx = self._folded.get(fold_romanization(norm))
+        return idx
+
+    def _prefix_rows(self, norm: str, limit: int):
+        rows = []
+        pos = bisect_left(self._sorted_keys, norm)
+        while pos < len(self._sorted_keys) and len(rows) < limit:
+            if not self._sorted_keys[pos].startswith(norm):
+                break
+            rows.append(self._sorted_rows[pos])
+            pos += 1
+        return rows
+
+    @staticmethod
+    def _substring_rows(norm: str, keys, postings):
+        grams = _trigrams(norm)
+        if not grams:
+            return []
+        lists = []
+        for gram in grams:
+            rows = postings.get(gram)
+            if rows is None:
+                return []
+            lists.append(rows)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for rows in lists[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if not len(candidates):
+                return []
+        return [int(i) for i in candidates if norm in keys[i]]
+
+    def search(self, query: str, limit: int = 5):
+        """
+        Ranked candidates for a query as a list of (row_index, title, tier).
+        Lower tiers are better; within a tier, catalog order wins (the CSVs
+        are sorted by popularity).
+        """
+        norm = normalize_title(query)
+        if not norm:
+            return []
+
+        tiers = {}
+
+        def add(idx, tier):
+            if idx is not None and tier < tiers.get(idx, SUBSTRING + 1):
+                tiers[idx] = tier
+
+        raw_idx = self._raw.get(raw_title(query))
+        add(raw_idx, EXACT)
+        if raw_idx is None:
+            add(self._exact.get(norm), EXACT)
+        add(self._folded.get(fold_romanization(norm)), FOLDED)
+        for idx in self._prefix_rows(norm, max(limit, 64)):
+            add(idx, PREFIX)
+
+        if len(norm) >= 3:
+            padded = f" {norm} "
+            for idx in self._substring_rows(norm, self.normalized, self._postings):
+                tier = WORD if padded in f" {self.normalized[idx]} " else SUBSTRING
+                add(idx, tier)
+
+        if not tiers:
+            folded = fold_romanization(norm)
+            if len(folded) >= 3:
+                for idx in self._substring_rows(folded, self.folded, self._folded_postings):
+                    add(idx, SUBSTRING)
+
+        ranked = sorted(tiers.items(), key=lambda kv: (kv[1], kv[0]))
+        return [(idx, self.titles[idx], tier) for idx, tier in ranked[:limit]]
+
+    def resolve(self, query: str):
+        """Best single match as (row_index, title), or (None, None)."""
+        idx = self.lookup(query)
+        if idx is None:
+            hits = self.search(query, limit=1)
+            if not hits:
+                return None, None
+            idx = hits[0][0]
+        return idx, self.titles[idx]